@@ -0,0 +1,324 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import commands_iss
+import errorhandling_iss as bot
+import fallback_iss
+import history_iss
+import scheduler_iss
+import store_iss
+import tracing_iss
+
+# -------------------------------------------------------------------
+# Async multi-room monitor
+# Watches many Webex rooms at once from a single asyncio event loop.
+# Every room gets its own polling task, and every "/N" command becomes
+# its own delayed task, so a room that is waiting on a command never
+# holds up polling (or replies) in any other room. The blocking helpers
+# from errorhandling_iss.py run on a shared thread pool and share the
+# pooled HTTP client from http_client_iss.py.
+# -------------------------------------------------------------------
+
+MAX_DELAY = 5
+
+
+def new_stats():
+    """Create an empty stats dict for a monitor run."""
+    return {"polls": 0, "commands": 0, "lookups": 0, "replies": 0, "errors": 0, "latencies": []}
+
+
+async def run_blocking(func, *args):
+    """Run one of the blocking API helpers on the shared thread pool."""
+    loop = asyncio.get_running_loop()
+    # Carry the current trace over to the worker thread.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, context.run, func, *args)
+
+
+def use_thread_pool(max_workers):
+    """Give the running event loop a thread pool of this size for the blocking helpers."""
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    asyncio.get_running_loop().set_default_executor(executor)
+    return executor
+
+
+async def lookup_after(seconds, maps_api_key):
+    """Build the ISS reply for a position `seconds` from now (None if there is no position at all)."""
+    # With a local TLE the position at "now + N" is computed right away.
+    iss = bot.predict_iss_location(seconds)
+    if iss is None:
+        # Otherwise the delay is just a timer on the event loop, nothing is blocked.
+        with tracing_iss.span("wait"):
+            await asyncio.sleep(seconds)
+        iss = await run_blocking(bot.iss_fallback.get)
+    if not iss:
+        print("Could not get ISS location.")
+        return None
+
+    addr = await run_blocking(bot.reverse_geocode, iss["lat"], iss["lon"], maps_api_key)
+    if addr is None:
+        print("Could not reverse geocode location, sending the coordinates only.")
+    return bot.format_iss_message(iss["lat"], iss["lon"], iss["timestamp"], addr) + fallback_iss.staleness_note(iss)
+
+
+async def delayed_lookup(seconds, context):
+    """'/N' handler: the ISS reply for N seconds after the batch was polled."""
+    return await lookup_after(max(0.0, seconds - (time.monotonic() - context.seen)), context.maps_api_key)
+
+
+# The bot's commands, with '/N' swapped for a version that waits on the event loop.
+registry = bot.command_registry.copy()
+registry.register("/", delayed_lookup, usage="/<number>", parse=commands_iss.delay_argument(MAX_DELAY),
+                  batchable=True, due=lambda seconds: seconds)
+
+
+async def handle_batch(room_id, texts, access_token, maps_api_key, stats, poll_seconds=0.0):
+    """Answer a batch of commands from one room.
+
+    Identical commands (e.g. '/N' with the same delay) share one handler
+    call, and all calls run at once. Replies are queued as soon as they are
+    ready, so a '/5' doesn't hold up an '/over' sent after it; replies that
+    are ready together keep the order their commands came in.
+    Every command is traced from the poll that found it to its reply being posted.
+    """
+    context = commands_iss.Context(room_id, access_token, maps_api_key)
+    tasks = {}      # call -> task
+    waiting = {}    # call -> traces of the commands it answers
+    for text, call in registry.plan(texts):
+        trace = tracing_iss.Trace("command", room=room_id, command=text)
+        trace.add_span("poll", poll_seconds)
+        if call is None:
+            print(registry.invalid_message())
+            trace.finish("invalid")
+            continue
+        stats["commands"] += 1
+        if call not in tasks:
+            tasks[call] = asyncio.ensure_future(registry.run_async(call, context))
+        waiting.setdefault(call, []).append(trace)
+    stats["lookups"] += len(tasks)
+
+    order = {task: i for i, task in enumerate(tasks.values())}
+    calls = {task: call for call, task in tasks.items()}
+    pending = set(tasks.values())
+    sending = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=order.get):
+                call = calls[task]
+                msg = task.result()
+                for trace in waiting[call]:
+                    trace.include(call.trace)
+                    if not msg:
+                        stats["errors"] += 1
+                        trace.finish("error")
+                        continue
+                    print(f"Sending message: {msg}")
+                    sending.append((call.due, trace, queue_reply(room_id, msg, access_token, trace)))
+    finally:
+        # Cancelled (e.g. at shutdown): don't leave the handler calls running on their own.
+        for task in pending:
+            task.cancel()
+
+    for seconds, trace, sent in sending:
+        status, posted = await sent
+        trace.finish("ok" if status == 200 else "error")
+        if status != 200:
+            stats["errors"] += 1
+            continue
+        stats["replies"] += 1
+        # Reply latency is measured from the moment the requested delay ends.
+        stats["latencies"].append(max(0.0, posted - context.seen - seconds))
+
+
+def queue_reply(room_id, text, access_token, trace):
+    """Put a reply on the outbox. Returns a future for (status, time it was posted)."""
+    loop = asyncio.get_running_loop()
+    sent = loop.create_future()
+
+    def done(status):
+        posted = time.monotonic()
+        loop.call_soon_threadsafe(lambda: sent.done() or sent.set_result((status, posted)))
+
+    with tracing_iss.use(trace):
+        bot.outbox.submit(room_id, text, access_token, on_done=done)
+    return sent
+
+
+async def handle_command(room_id, text, access_token, maps_api_key, stats):
+    """Handle one command: '/N' posts the ISS location in N seconds, '/at' and '/pass' predict."""
+    await handle_batch(room_id, [text], access_token, maps_api_key, stats)
+
+
+async def pause(seconds, stop=None):
+    """Sleep for `seconds`, waking early if the `stop` event is set."""
+    if stop is None:
+        await asyncio.sleep(seconds)
+        return
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def watch_room(room_id, access_token, maps_api_key, stats, poll_interval=1.0, cursors=None,
+                     scheduler=None, stop=None):
+    """Poll one room and answer every new command since the last poll as a batch.
+
+    Runs forever, or until the `stop` event is set. Stopping that way lets the
+    batches already running finish; cancelling the task drops them.
+    """
+    pending = set()
+    cursors = {} if cursors is None else cursors
+    scheduler = scheduler_iss.scheduler if scheduler is None else scheduler
+    poller = scheduler.poller(min_interval=poll_interval)
+    await run_blocking(bot.tracker.resume, room_id, access_token, maps_api_key)
+
+    try:
+        while stop is None or not stop.is_set():
+            await scheduler.acquire_async()
+            polled = time.perf_counter()
+            messages, cursor = await run_blocking(bot.get_new_messages, room_id, access_token, cursors.get(room_id))
+            poll_seconds = time.perf_counter() - polled
+            cursors[room_id] = cursor
+            stats["polls"] += 1
+            if messages is None:
+                poller.on_error()
+                tracing_iss.note_retry()  # the poll is tried again after backing off
+            else:
+                commands = [m.get("text", "") for m in messages if m.get("text", "").startswith("/")]
+                if commands:
+                    poller.on_activity()
+                    print(f"New commands: {commands}")
+                    task = asyncio.create_task(handle_batch(room_id, commands, access_token, maps_api_key, stats,
+                                                            poll_seconds))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                else:
+                    poller.on_idle()
+            await pause(poller.next_delay(), stop)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        # Batches still waiting on a lookup are dropped along with the poller.
+        for task in pending:
+            task.cancel()
+
+
+async def monitor_rooms(room_ids, access_token, maps_api_key, poll_interval=1.0,
+                        duration=None, stats=None, max_workers=None, cursors=None, scheduler=None):
+    """Watch all the given rooms at once, optionally stopping after `duration` seconds.
+
+    `cursors` maps room id -> the newest message already seen there, and is
+    kept up to date while running so a restart can carry on from it.
+    All rooms share `scheduler` (default: the bot-wide one) for their poll budget.
+    """
+    if stats is None:
+        stats = new_stats()
+
+    # Enough threads for every room to have a poll and a reply in flight.
+    executor = use_thread_pool(max_workers or max(8, len(room_ids) * 2))
+
+    print(f"\nMonitoring {len(room_ids)} room(s) for messages like '/5'...\n")
+    cursors = {} if cursors is None else cursors
+    scheduler = scheduler_iss.scheduler if scheduler is None else scheduler
+    scheduler.attach(bot.client)
+    bot.outbox.attach(bot.client)
+    tracing_iss.start_from_env(bot.client)
+    history_iss.start_from_env(lambda: bot.sample_position(maps_api_key))
+    tasks = [asyncio.create_task(watch_room(room_id, access_token, maps_api_key, stats, poll_interval,
+                                            cursors, scheduler))
+             for room_id in room_ids]
+    try:
+        if duration is None:
+            await asyncio.gather(*tasks)
+        else:
+            await asyncio.sleep(duration)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await run_blocking(bot.outbox.flush, 5)
+        executor.shutdown(wait=False, cancel_futures=True)
+    return stats
+
+
+def select_rooms(rooms):
+    """Ask the user for a comma separated list of room names to monitor."""
+    if not rooms:
+        print("No rooms to choose from.")
+        return []
+
+    while True:
+        names = input("\nEnter parts of the room names to monitor (comma separated): ").strip()
+        wanted = [name.strip().lower() for name in names.split(",") if name.strip()]
+        if not wanted:
+            print("Please enter at least one room name.")
+            continue
+
+        selected = [room["id"] for room in rooms
+                    if any(name in room.get("title", "").lower() for name in wanted)]
+        if selected:
+            print(f"Found {len(selected)} room(s).")
+            return selected
+
+        print("No matching rooms found. Try again.")
+
+
+def main():
+    """Main program flow for the multi-room monitor."""
+    token = bot.get_access_token()
+    if not token:
+        print("No access token. Exiting.")
+        return
+
+    store = store_iss.get_store()
+    bot.geocode_cache.use_store(store)
+    bot.tracker.use_store(store)
+    room_ids = [room_id for room_id, _ in bot.resume_selection(token, store)]
+    if not room_ids:
+        rooms = bot.get_rooms_cached(token, store)
+        if not rooms:
+            print("No rooms available. Exiting.")
+            return
+
+        room_ids = select_rooms(rooms)
+        if not room_ids:
+            print("No rooms selected. Exiting.")
+            return
+        if store is not None:
+            titles = {room["id"]: room.get("title", "") for room in rooms}
+            store.save_selection(token, [(room_id, titles[room_id]) for room_id in room_ids])
+
+    api_key = input("\nEnter your LocationIQ API key: ").strip()
+    if not api_key:
+        print("No API key provided. Exiting.")
+        return
+
+    # Carry on from the last message seen in each room, and save where we got to.
+    cursors = store.load_cursors(room_ids) if store is not None else {}
+    try:
+        asyncio.run(monitor_rooms(room_ids, token, api_key, cursors=cursors))
+    except KeyboardInterrupt:
+        print("\nStopped monitoring.")
+        bot.client.print_report()
+        scheduler_iss.scheduler.print_metrics()
+        bot.outbox.print_metrics()
+        bot.iss_flight.print_report()
+        bot.geocode_flight.print_report()
+        bot.geocode_cache.print_report()
+        bot.geocoders.print_report()
+        bot.iss_fallback.print_report()
+        bot.geocode_fallback.print_report()
+        registry.print_report()
+        bot.tracker.print_report()
+        tracing_iss.registry.print_summary()
+    finally:
+        if store is not None:
+            store.save_cursors(cursors)
+
+
+if __name__ == "__main__":
+    main()
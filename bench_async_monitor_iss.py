@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+import time
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+from bench_common_iss import percentile, print_table, quiet
+from scheduler_iss import PollScheduler
+
+# -------------------------------------------------------------------
+# Benchmark for the async multi-room monitor.
+# The Webex, ISS and LocationIQ helpers are swapped for fakes that just
+# sleep for a typical network round trip, then every room sends a
+# steady stream of "/0" and "/1" commands. We report how many commands
+# per second the monitor answers and the p99 reply latency as the
+# number of rooms grows.
+# -------------------------------------------------------------------
+
+NETWORK_DELAY = 0.05
+POLL_INTERVAL = 0.1
+DURATION = 5
+ROOM_COUNTS = [1, 5, 10, 25, 50, 100]
+
+
+def install_fakes():
+    """Replace the network helpers with fakes that only sleep."""
+    counters = {}
+
+    def fake_new_messages(room_id, access_token, cursor=None):
+        time.sleep(NETWORK_DELAY)
+        n = counters.setdefault(room_id, itertools.count())
+        # A new command every third poll.
+        step = next(n)
+        if step % 3:
+            return [], cursor
+        return [{"id": f"{room_id}-{step}", "text": f"/{(step // 3) % 2}"}], {"id": f"{room_id}-{step}"}
+
+    def fake_iss_location():
+        time.sleep(NETWORK_DELAY)
+        return {"lat": "12.3456", "lon": "-45.6789", "timestamp": int(time.time())}
+
+    def fake_reverse_geocode(lat, lon, api_key):
+        time.sleep(NETWORK_DELAY)
+        return {"country_code": "us", "state": "Texas", "city": "Austin"}
+
+    def fake_post_message(room_id, text, access_token):
+        time.sleep(NETWORK_DELAY)
+        return 200
+
+    bot.get_new_messages = fake_new_messages
+    bot.get_iss_location = fake_iss_location
+    bot.reverse_geocode = fake_reverse_geocode
+    bot.post_message = fake_post_message
+
+
+def run(room_count):
+    """Run the monitor against `room_count` fake rooms and return its stats."""
+    room_ids = [f"room-{i}" for i in range(room_count)]
+    with quiet():
+        # A budget big enough that the token bucket never holds the benchmark back.
+        scheduler = PollScheduler(rate=10000, burst=10000)
+        return asyncio.run(monitor.monitor_rooms(room_ids, "Bearer fake", "fake-key",
+                                                 poll_interval=POLL_INTERVAL, duration=DURATION,
+                                                 scheduler=scheduler))
+
+
+def main():
+    install_fakes()
+    rows = []
+    for room_count in ROOM_COUNTS:
+        stats = run(room_count)
+        latencies = stats["latencies"]
+        rows.append([
+            room_count,
+            stats["replies"],
+            f"{stats['replies'] / DURATION:.1f}",
+            f"{percentile(latencies, 50) * 1000:.0f}",
+            f"{percentile(latencies, 99) * 1000:.0f}",
+        ])
+    print(f"Fake network delay {NETWORK_DELAY * 1000:.0f} ms, poll every {POLL_INTERVAL}s, {DURATION}s per run\n")
+    print_table(["rooms", "replies", "cmd/s", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
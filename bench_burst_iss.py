@@ -0,0 +1,99 @@
+import asyncio
+import random
+import threading
+import time
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+from bench_common_iss import print_table, quiet
+from fake_servers_iss import FakeWebex
+
+# -------------------------------------------------------------------
+# Burst benchmark for cursor-based fetching
+# 100 "/N" commands (N = 0, 1 or 2) land in one room within 2 seconds.
+# The old "latest message only" poll (max=1, skip if same text as last
+# time) is compared with the cursor-based batch fetch. ISS and geocode
+# lookups are stubbed with a 50 ms delay and counted, so the table shows
+# how many commands got answered and how many upstream lookups it took.
+# -------------------------------------------------------------------
+
+COMMANDS = 100
+BURST_SECONDS = 2.0
+RUN_SECONDS = 7
+LOOKUP_DELAY = 0.05
+
+
+def install_stubs(calls):
+    def fake_iss_location():
+        calls["iss"] += 1
+        time.sleep(LOOKUP_DELAY)
+        return {"lat": "10.0", "lon": "20.0", "timestamp": int(time.time())}
+
+    def fake_reverse_geocode(lat, lon, api_key):
+        calls["geocode"] += 1
+        time.sleep(LOOKUP_DELAY)
+        return {"country_code": "fr", "state": "Brittany"}
+
+    bot.get_iss_location = fake_iss_location
+    bot.reverse_geocode = fake_reverse_geocode
+
+
+def burst(fake, room_id):
+    rng = random.Random(1)
+    gap = BURST_SECONDS / COMMANDS
+    for _ in range(COMMANDS):
+        fake.add_message(room_id, f"/{rng.randint(0, 2)}")
+        time.sleep(gap)
+
+
+async def latest_only(room_id, stats):
+    """The old way: look at the newest message once a second."""
+    last = await monitor.run_blocking(bot.get_latest_message, room_id, "Bearer fake")
+    pending = set()
+    while True:
+        await asyncio.sleep(1)
+        msg = await monitor.run_blocking(bot.get_latest_message, room_id, "Bearer fake")
+        if msg and msg != last and msg.startswith("/"):
+            task = asyncio.create_task(monitor.handle_command(room_id, msg, "Bearer fake", "key", stats))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        last = msg
+
+
+def run(mode):
+    calls = {"iss": 0, "geocode": 0}
+    install_stubs(calls)
+    fake = FakeWebex().start()
+    bot.WEBEX_API = fake.url
+    room_id = fake.add_room("Burst room")
+    stats = monitor.new_stats()
+
+    async def go():
+        if mode == "latest only":
+            monitor.use_thread_pool(16)
+            task = asyncio.create_task(latest_only(room_id, stats))
+            await asyncio.sleep(0.2)
+            threading.Thread(target=burst, args=(fake, room_id), daemon=True).start()
+            await asyncio.sleep(RUN_SECONDS)
+            task.cancel()
+        else:
+            threading.Timer(0.2, burst, args=(fake, room_id)).start()
+            await monitor.monitor_rooms([room_id], "Bearer fake", "key", duration=RUN_SECONDS, stats=stats)
+
+    start = time.perf_counter()
+    with quiet():
+        asyncio.run(go())
+    elapsed = time.perf_counter() - start
+    fake.stop()
+    return [mode, COMMANDS, len(fake.posted), calls["iss"], calls["geocode"],
+            fake.calls.get("list_messages", 0), f"{elapsed:.1f}"]
+
+
+def main():
+    rows = [run("latest only"), run("cursor batch")]
+    print(f"{COMMANDS} commands in {BURST_SECONDS}s, {RUN_SECONDS}s per run against FakeWebex\n")
+    print_table(["mode", "sent", "answered", "ISS calls", "geocode calls", "list calls", "secs"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import contextlib
+import io
+import math
+
+# -------------------------------------------------------------------
+# Small helpers shared by the bench_*.py scripts.
+# -------------------------------------------------------------------
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (0-100) of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide the print() chatter from the bot while a benchmark runs."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def print_table(headers, rows):
+    """Print benchmark results as a simple aligned table."""
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,149 @@
+import contextlib
+import io
+import math
+import random
+import threading
+import time
+
+import errorhandling_iss as bot
+import fallback_iss
+import geoproviders_iss
+from bench_common_iss import percentile, print_table, quiet
+from bench_harness_iss import reset_bot, start_fakes
+from fake_servers_iss import FakeOpenNotify
+
+# -------------------------------------------------------------------
+# Upstream incident benchmark
+# A few rooms ask for the ISS position ('/0') every half second while
+# the fake open-notify and LocationIQ go through three phases:
+#   healthy    both answer in 20 ms,
+#   incident   open-notify hangs for 6 s per request and LocationIQ
+#              fails every request,
+#   recovered  both are back.
+# "before" is the lookup as it was without the fallbacks (a reply only
+# when both upstreams answer); "fallback" is lookup_message() with the
+# stale-while-revalidate layer. The table shows, per phase, how many
+# lookups got a reply, how many of those were estimated / old
+# positions or coordinates-only, and the reply latency.
+#
+# The phases last seconds rather than minutes, so the geocode circuit
+# breakers' cool-down is scaled down with them (BREAKER_COOLDOWN).
+#
+# The second table checks the estimates themselves: two fixes 5 s apart
+# on the fake orbit, moved forward by `age` seconds, against where the
+# ISS really is then.
+# -------------------------------------------------------------------
+
+PHASES = [("healthy", 4.0, {}),
+          ("incident", 10.0, {"iss": {"latency": 6.0}, "geocode": {"error_rate": 1.0}}),
+          ("recovered", 4.0, {})]
+CLIENTS = 4
+INTERVAL = 0.5
+LATENCY = 0.02
+AGES = [10, 30, 60, 120, 300, 600]
+BREAKER_COOLDOWN = 2.0
+EARTH_RADIUS_KM = 6371.0
+
+
+def lookup_before():
+    """The '/0' reply the way it was built without the fallbacks."""
+    iss = bot.get_iss_location()
+    if not iss:
+        return None
+    address = bot.geocode_cache.get(iss["lat"], iss["lon"])
+    if address is None:
+        address = bot.lookup_address(iss["lat"], iss["lon"], "key")
+    if address is None:
+        return None
+    return bot.format_iss_message(iss["lat"], iss["lon"], iss["timestamp"], address)
+
+
+def lookup_fallback():
+    return bot.lookup_message(0, "key")
+
+
+def client(lookup, results, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        text = lookup()
+        results.append((start, time.perf_counter() - start, text))
+        stop.wait(max(0.0, INTERVAL - (time.perf_counter() - start)))
+
+
+def run(label, lookup):
+    fakes = start_fakes({"latency": LATENCY})
+    reset_bot(fakes)
+    for provider in bot.geocoders.providers:
+        provider.breaker = geoproviders_iss.CircuitBreaker(cooldown=BREAKER_COOLDOWN)
+    results = []
+    stop = threading.Event()
+    threads = [threading.Thread(target=client, args=(lookup, results, stop), daemon=True) for _ in range(CLIENTS)]
+    phases = []
+    # stderr too: the fakes complain when a client gives up on a hanging request.
+    with quiet(), contextlib.redirect_stderr(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for name, seconds, faults in PHASES:
+            for fake in fakes.values():
+                fake.latency, fake.error_rate = LATENCY, 0.0
+            for fake_name, settings in faults.items():
+                for key, value in settings.items():
+                    setattr(fakes[fake_name], key, value)
+            phases.append((name, time.perf_counter()))
+            time.sleep(seconds)
+        stop.set()
+        end = time.perf_counter()
+        # Lookups still hanging on the old path are counted when they finish.
+        for thread in threads:
+            thread.join(8.0)
+    for fake in fakes.values():
+        fake.stop()
+
+    rows = []
+    for i, (name, started) in enumerate(phases):
+        finished = phases[i + 1][1] if i + 1 < len(phases) else end
+        mine = [r for r in results if started <= r[0] < finished]
+        answered = [r for r in mine if r[2]]
+        old = sum(1 for r in answered if "(Estimated" in r[2] or "(Last known" in r[2])
+        bare = sum(1 for r in answered if "address lookup" in r[2])
+        latencies = [r[1] for r in answered]
+        rows.append([label, name, len(mine), len(answered), old, bare,
+                     f"{percentile(latencies, 50) * 1000:.0f}", f"{percentile(latencies, 99) * 1000:.0f}"])
+    return rows
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def estimate_errors(samples=200, seed=1):
+    orbit = FakeOpenNotify()
+    rng = random.Random(seed)
+    errors = {age: [] for age in AGES}
+    for _ in range(samples):
+        t = rng.uniform(0, orbit.PERIOD * 16)
+        fallback = fallback_iss.PositionFallback(None, max_extrapolate=max(AGES))
+        for fix_time in (t, t + 5):
+            lat, lon = orbit.position(fix_time)
+            fallback.fixes.append((fix_time, lat, lon))
+        for age in AGES:
+            estimate = fallback.extrapolate(age)
+            true_lat, true_lon = orbit.position(t + 5 + age)
+            errors[age].append(distance_km(float(estimate["lat"]), float(estimate["lon"]), true_lat, true_lon))
+    return [[age, f"{percentile(errors[age], 50):.0f}", f"{percentile(errors[age], 95):.0f}",
+             f"{max(errors[age]):.0f}"] for age in AGES]
+
+
+def main():
+    rows = run("before", lookup_before) + run("fallback", lookup_fallback)
+    print(f"{CLIENTS} clients asking every {INTERVAL}s; incident: open-notify hangs 6 s, LocationIQ fails\n")
+    print_table(["lookup", "phase", "asked", "answered", "old/estimated", "coords only", "p50 ms", "p99 ms"], rows)
+    print("\nEstimated positions against the true orbit (km)\n")
+    print_table(["age s", "p50", "p95", "max"], estimate_errors())
+
+
+if __name__ == "__main__":
+    main()
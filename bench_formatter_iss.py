@@ -0,0 +1,76 @@
+import random
+import time
+
+from iso3166 import countries
+
+import formatter_iss
+from bench_common_iss import print_table
+from fake_servers_iss import LAND_AREAS
+
+# -------------------------------------------------------------------
+# Formatting micro-benchmark
+# Per-message cost of building the reply for 20000 replies spread over
+# 500 distinct ISS fixes (a mix of ocean, city and region answers):
+# the old per-call iso3166 lookup + time.ctime + f-string, the formatter
+# one message at a time for each view, and format_many() for a batch.
+# -------------------------------------------------------------------
+
+MESSAGES = 20000
+FIXES = 500
+
+
+def old_format(lat, lon, timestamp, address):
+    """The previous format_iss_message, kept here for comparison."""
+    time_str = time.ctime(timestamp)
+    country_code = address.get("country_code", "XZ").upper()
+    state = address.get("state", "Unknown")
+    city = address.get("city", address.get("town", "Unknown"))
+    try:
+        country_name = countries.get(country_code).name
+    except KeyError:
+        country_name = "Unknown Country"
+    if country_code == "XZ":
+        return f"On {time_str}, the ISS was over the ocean at ({lat}°, {lon}°)."
+    elif city != "Unknown":
+        return f"On {time_str}, the ISS was above {city}, {state}, {country_name}.\nCoordinates: ({lat}°, {lon}°)"
+    else:
+        return f"On {time_str}, the ISS was above {state}, {country_name}.\nCoordinates: ({lat}°, {lon}°)"
+
+
+def make_items(seed=1):
+    rng = random.Random(seed)
+    now = int(time.time())
+    fixes = []
+    for i in range(FIXES):
+        address = {} if i % 3 == 0 else dict(rng.choice(LAND_AREAS)[4])
+        fixes.append((f"{rng.uniform(-51.6, 51.6):.4f}", f"{rng.uniform(-180, 180):.4f}", now + i, address))
+    return [fixes[rng.randrange(FIXES)] for _ in range(MESSAGES)]
+
+
+def timed(label, run, items):
+    formatter_iss.ctime.cache_clear()
+    start = time.perf_counter()
+    results = run(items)
+    elapsed = time.perf_counter() - start
+    assert len(results) == len(items)
+    return [label, f"{elapsed / len(items) * 1e6:.2f}", f"{len(items) / elapsed:,.0f}"]
+
+
+def main():
+    items = make_items()
+    assert [old_format(*item) for item in items[:200]] == \
+        [formatter_iss.format_text(*item) for item in items[:200]]
+    rows = [
+        timed("old inline (text)", lambda xs: [old_format(*x) for x in xs], items),
+        timed("formatter text", lambda xs: [formatter_iss.format_text(*x) for x in xs], items),
+        timed("formatter markdown", lambda xs: [formatter_iss.format_markdown(*x) for x in xs], items),
+        timed("formatter card", lambda xs: [formatter_iss.format_card(*x) for x in xs], items),
+        timed("format_many text", formatter_iss.format_many, items),
+        timed("format_many card", lambda xs: formatter_iss.format_many(xs, view="card"), items),
+    ]
+    print(f"{MESSAGES} replies over {FIXES} distinct ISS fixes\n")
+    print_table(["formatter", "us/message", "messages/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import errorhandling_iss as bot
+from bench_common_iss import percentile, print_table, quiet
+from fake_servers_iss import FakeLocationIQ, FakeOpenNotify, FakeWebex
+from geocode_cache_iss import GeoCache
+from scheduler_iss import PollScheduler
+from singleflight_iss import SingleFlight
+
+# -------------------------------------------------------------------
+# Offline benchmark harness
+# Runs the bot end to end against local stand-ins for Webex, open-notify
+# and LocationIQ, so nothing touches the live services. Each scenario
+# sends a scripted load of "/0" and "/1" commands into the fake rooms
+# and measures:
+#   * replies per second and how many commands got an answer,
+#   * end-to-end latency (message posted -> reply posted, minus the
+#     requested delay) as p50/p90/p99,
+#   * requests served by each fake, plus the injected 500s and 429s,
+#   * peak resident memory of the process running the bot.
+# monitor_room() runs in this process, one thread per room. space_iss.py
+# runs as a child process, driven through stdin and pointed at the
+# fakes with WEBEX_API_URL / ISS_API_URL / LOCATIONIQ_API_URL.
+# Faults are switched on once the bot is up, so startup always works.
+#
+#   python bench_harness_iss.py                  all scenarios
+#   python bench_harness_iss.py space_iss        only names containing "space_iss"
+# -------------------------------------------------------------------
+
+LOAD_SECONDS = 8
+DRAIN_SECONDS = 6
+WARMUP_SECONDS = 1.5
+COMMAND_MIX = ["/0", "/0", "/1"]
+
+CLEAN = {}
+FAULTY = {
+    "webex": {"error_rate": 0.05, "rate_limit_rate": 0.02},
+    "iss": {"error_rate": 0.05},
+    "geocode": {"error_rate": 0.02, "rate_limit_rate": 0.05},
+}
+
+SCENARIOS = [
+    {"name": "monitor_room clean", "driver": "monitor_room", "rooms": 1, "rate": 1.0, "latency": 0.02,
+     "faults": CLEAN},
+    {"name": "monitor_room 3 rooms", "driver": "monitor_room", "rooms": 3, "rate": 3.0, "latency": 0.02,
+     "faults": CLEAN},
+    {"name": "monitor_room faults", "driver": "monitor_room", "rooms": 3, "rate": 3.0, "latency": 0.05,
+     "faults": FAULTY},
+    {"name": "space_iss clean", "driver": "space_iss", "rooms": 1, "rate": 0.5, "latency": 0.02,
+     "faults": CLEAN},
+    {"name": "space_iss faults", "driver": "space_iss", "rooms": 1, "rate": 0.5, "latency": 0.05,
+     "faults": FAULTY},
+]
+
+
+class MemorySampler:
+    """Tracks the peak resident set size of a process by sampling /proc."""
+
+    def __init__(self, pid=None, interval=0.05):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def sample(self):
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                self.peak = max(self.peak, int(f.read().split()[1]) * self.page_size)
+        except (OSError, ValueError, IndexError):
+            pass
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.sample()
+        self.stopped.set()
+        return self.peak / 2 ** 20 if self.peak else None
+
+
+def send_load(webex, room_ids, rate, seconds, seed=1):
+    """Post commands into random rooms at `rate` per second. Returns [(time, room, delay)]."""
+    rng = random.Random(seed)
+    sent = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        room_id = rng.choice(room_ids)
+        text = rng.choice(COMMAND_MIX)
+        webex.add_message(room_id, text)
+        sent.append((time.time(), room_id, int(text[1:])))
+        time.sleep(rng.expovariate(rate))
+    return sent
+
+
+def match_replies(sent, posted):
+    """Pair each reply with the newest unanswered command it could be answering.
+
+    Returns the reply latencies in seconds, with the requested delay taken off.
+    """
+    latencies = []
+    unanswered = sorted(sent)
+    for posted_at, room_id, _text in sorted(posted):
+        candidates = [c for c in unanswered if c[1] == room_id and c[0] + c[2] <= posted_at]
+        if not candidates:
+            continue
+        command = candidates[-1]
+        unanswered.remove(command)
+        latencies.append(posted_at - command[0] - command[2])
+    return latencies
+
+
+def start_fakes(scenario):
+    fakes = {"webex": FakeWebex(scenario["latency"], seed=1),
+             "iss": FakeOpenNotify(scenario["latency"], seed=2),
+             "geocode": FakeLocationIQ(scenario["latency"], seed=3)}
+    for fake in fakes.values():
+        fake.start()
+    return fakes
+
+
+def enable_faults(fakes, faults):
+    for name, settings in faults.items():
+        for key, value in settings.items():
+            setattr(fakes[name], key, value)
+
+
+def reset_bot(fakes):
+    """Point the library at the fakes and give it fresh shared state."""
+    bot.WEBEX_API = fakes["webex"].url
+    bot.ISS_API = fakes["iss"].url
+    bot.LOCATIONIQ_API = f"{fakes['geocode'].url}/v1"
+    bot.scheduler = PollScheduler()
+    bot.geocode_cache = GeoCache()
+    bot.iss_flight = SingleFlight("ISS position", fresh_for=1.0)
+    bot.geocode_flight = SingleFlight("Reverse geocode")
+    bot.iss_fallback.clear()
+    bot.geocode_fallback.clear()
+
+
+def drive_monitor_room(scenario, fakes, faults, room_ids):
+    reset_bot(fakes)
+    stop = threading.Event()
+    memory = MemorySampler().start()
+    threads = [threading.Thread(target=bot.monitor_room, args=(room_id, "Bearer fake", "key"),
+                                kwargs={"stop": stop}, daemon=True)
+               for room_id in room_ids]
+    with quiet():
+        for thread in threads:
+            thread.start()
+        time.sleep(WARMUP_SECONDS)
+        enable_faults(fakes, faults)
+        sent = send_load(fakes["webex"], room_ids, scenario["rate"], LOAD_SECONDS)
+        time.sleep(DRAIN_SECONDS)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=15)
+        bot.outbox.flush(timeout=10)
+    return sent, memory.stop()
+
+
+def drive_space_iss(scenario, fakes, faults, room_ids):
+    env = dict(os.environ, WEBEX_API_URL=fakes["webex"].url, ISS_API_URL=fakes["iss"].url,
+               LOCATIONIQ_API_URL=f"{fakes['geocode'].url}/v1", PYTHONUNBUFFERED="1")
+    here = os.path.dirname(os.path.abspath(__file__))
+    child = subprocess.Popen([sys.executable, os.path.join(here, "space_iss.py")], cwd=here, env=env,
+                             stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             text=True)
+    memory = MemorySampler(child.pid).start()
+    try:
+        # Use the hard-coded token, then pick the first bench room by name.
+        child.stdin.write("y\nBench room 1\n")
+        child.stdin.flush()
+        time.sleep(WARMUP_SECONDS)
+        enable_faults(fakes, faults)
+        sent = send_load(fakes["webex"], room_ids, scenario["rate"], LOAD_SECONDS)
+        time.sleep(DRAIN_SECONDS)
+    finally:
+        peak = memory.stop()
+        child.kill()
+        child.wait()
+    return sent, peak
+
+
+DRIVERS = {"monitor_room": drive_monitor_room, "space_iss": drive_space_iss}
+
+
+def run(scenario):
+    fakes = start_fakes(scenario)
+    webex = fakes["webex"]
+    room_ids = [webex.add_room(f"Bench room {i + 1}") for i in range(scenario["rooms"])]
+    try:
+        start = time.perf_counter()
+        sent, peak = DRIVERS[scenario["driver"]](scenario, fakes, scenario["faults"], room_ids)
+        elapsed = time.perf_counter() - start
+    finally:
+        for fake in fakes.values():
+            fake.stop()
+
+    latencies = [s * 1000 for s in match_replies(sent, webex.posted)]
+    injected = sum(fake.calls.get("injected_500", 0) + fake.calls.get("injected_429", 0)
+                   for fake in fakes.values())
+    return [scenario["name"], len(sent), len(latencies), f"{len(latencies) / elapsed:.2f}",
+            f"{percentile(latencies, 50):.0f}", f"{percentile(latencies, 90):.0f}",
+            f"{percentile(latencies, 99):.0f}",
+            webex.total_calls(), fakes["iss"].total_calls(), fakes["geocode"].total_calls(), injected,
+            f"{peak:.1f}" if peak else "n/a"]
+
+
+def main(argv):
+    scenarios = [s for s in SCENARIOS if not argv or any(a in s["name"] for a in argv)]
+    rows = [run(scenario) for scenario in scenarios]
+    print(f"{LOAD_SECONDS}s of scripted commands, {DRAIN_SECONDS}s to drain, against local fakes\n")
+    print_table(["scenario", "sent", "answered", "replies/s", "p50 ms", "p90 ms", "p99 ms",
+                 "webex reqs", "iss reqs", "geocode reqs", "injected", "peak RSS MB"], rows)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
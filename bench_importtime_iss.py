@@ -0,0 +1,106 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_common_iss import print_table
+
+# -------------------------------------------------------------------
+# Import time / cold start benchmark
+# Every worker process (workers_iss spawns them) starts a fresh
+# interpreter and imports the bot before it can poll anything, so
+# import time is start-up latency, paid again on every restart. Each
+# entry module is imported in a new interpreter with -X importtime a
+# few times; the table shows the median import time and the median
+# wall time of the whole process. The heaviest imports of the worker
+# entry point are listed below it, and it is checked against the
+# cold-start budget. Modules that should only load on demand (NumPy,
+# http.server, iso3166) must not show up in the bot's imports at all.
+# requests is deliberately eager: http_client_iss builds the shared
+# pooled Session when it is imported, and every entry point makes a
+# Webex call straight after start-up, so deferring it would only move
+# the cost, not save it.
+# -------------------------------------------------------------------
+
+ENTRY_MODULES = ["spacebot", "space_iss", "functionsspace_iss", "errorhandling_iss", "async_monitor_iss",
+                 "service_iss", "webhook_iss", "workers_iss"]
+WORKER_MODULE = "workers_iss"
+WORKER_BUDGET_MS = 250
+DEFERRED = ["numpy", "http.server", "iso3166"]
+RUNS = 7
+TOP = 10
+
+
+def import_once(module):
+    """(wall seconds, {import: cumulative µs}, {import made by our code: cumulative µs}) for one interpreter.
+
+    The second dict holds the modules that one of ours (a *_iss module or
+    spacebot) imports itself, e.g. requests or asyncio, with everything
+    they pull in.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    lines = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((depth, name.strip(), int(cumulative)))
+    # -X importtime prints a module after its children, so walk the lines backwards to see parents first.
+    imported, direct = {}, {}
+    parents = []
+    for depth, name, cumulative in reversed(lines):
+        del parents[depth:]
+        imported[name] = cumulative
+        if parents and _ours(parents[-1]) and not _ours(name):
+            direct[name] = cumulative
+        parents.append(name)
+    return wall, imported, direct
+
+
+def _ours(name):
+    return name.endswith("_iss") or name.split(".")[0] == "spacebot"
+
+
+def measure(module):
+    walls, totals, direct = [], [], {}
+    names = set()
+    for _ in range(RUNS):
+        wall, imported, made = import_once(module)
+        walls.append(wall)
+        totals.append(imported.get(module, 0))
+        names |= set(imported)
+        for name, cumulative in made.items():
+            direct.setdefault(name, []).append(cumulative)
+    heaviest = sorted(((statistics.median(v) / 1000, name) for name, v in direct.items()), reverse=True)
+    return statistics.median(totals) / 1000, statistics.median(walls) * 1000, heaviest[:TOP], names
+
+
+def main():
+    rows = []
+    results = {}
+    for module in ENTRY_MODULES:
+        import_ms, wall_ms, heaviest, names = measure(module)
+        results[module] = (import_ms, heaviest)
+        loaded = [name for name in DEFERRED if name in names]
+        rows.append([module, f"{import_ms:.1f}", f"{wall_ms:.1f}", ", ".join(loaded) or "-"])
+    print(f"Median of {RUNS} fresh interpreters per module ({sys.executable})\n")
+    print_table(["module", "import ms", "process ms", "loads on import"], rows)
+
+    import_ms, heaviest = results[WORKER_MODULE]
+    print(f"\nHeaviest imports made by the bot's modules in a {WORKER_MODULE} process:\n")
+    print_table(["import", "ms"], [[name, f"{ms:.1f}"] for ms, name in heaviest])
+
+    verdict = "PASS" if import_ms <= WORKER_BUDGET_MS else "FAIL"
+    print(f"\nWorker cold start: {import_ms:.1f} ms to import {WORKER_MODULE} "
+          f"(budget {WORKER_BUDGET_MS} ms) -> {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+import webhook_iss
+from bench_common_iss import percentile, print_table, quiet
+from fake_servers_iss import FakeWebex
+
+# -------------------------------------------------------------------
+# Polling vs webhook latency benchmark
+# Runs the bot against the local FakeWebex server twice with the same
+# scripted load: once polling GET /messages every second, once in
+# webhook mode. Commands include bursts (two in quick succession) and
+# repeats of the same text.
+# ISS and geocode lookups are stubbed so only message ingestion is
+# being compared. Reports latency from the moment a command is posted
+# to the moment the bot's reply lands, plus how many were never answered.
+# -------------------------------------------------------------------
+
+ROOMS = 5
+DURATION = 12
+SETTLE = 3
+SEED = 7
+
+
+def stub_lookups():
+    bot.get_iss_location = lambda: {"lat": "10.0", "lon": "20.0", "timestamp": int(time.time())}
+    bot.reverse_geocode = lambda lat, lon, api_key: {}
+
+
+def schedule():
+    """The same list of (offset seconds, room index, text) for both runs."""
+    rng = random.Random(SEED)
+    events = []
+    for room in range(ROOMS):
+        t = rng.uniform(0.5, 1.5)
+        while t < DURATION - SETTLE:
+            events.append((t, room, "/0"))
+            if rng.random() < 0.3:
+                # A burst: someone else sends the same command right after.
+                events.append((t + rng.uniform(0.05, 0.3), room, "/0"))
+            t += rng.uniform(0.8, 2.5)
+    return sorted(events)
+
+
+def drive(fake, room_ids, events, sent):
+    start = time.time()
+    for offset, room, text in events:
+        delay = start + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        message = fake.add_message(room_ids[room], text)
+        sent.append((time.time(), message["roomId"]))
+
+
+def match(sent, fake):
+    """Pair every reply with the oldest unanswered command in its room."""
+    latencies = []
+    waiting = {}
+    events = [(t, room, "cmd") for t, room in sent] + [(t, room, "reply") for t, room, _ in fake.posted]
+    for t, room, kind in sorted(events):
+        if kind == "cmd":
+            waiting.setdefault(room, []).append(t)
+        elif waiting.get(room):
+            latencies.append(t - waiting[room].pop(0))
+    missed = sum(len(v) for v in waiting.values())
+    return latencies, missed
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run(mode):
+    fake = FakeWebex().start()
+    bot.WEBEX_API = webhook_iss.WEBEX_API = fake.url
+    room_ids = [fake.add_room(f"Room {i}") for i in range(ROOMS)]
+    sent = []
+    driver = threading.Thread(target=drive, args=(fake, room_ids, schedule(), sent), daemon=True)
+
+    async def go():
+        driver.start()
+        if mode == "polling":
+            return await monitor.monitor_rooms(room_ids, "Bearer fake", "key", poll_interval=1.0,
+                                               duration=DURATION)
+        port = free_port()
+        return await webhook_iss.monitor_webhooks(room_ids, "Bearer fake", "key",
+                                                  f"http://127.0.0.1:{port}/webhook", port=port,
+                                                  duration=DURATION)
+
+    with quiet():
+        asyncio.run(go())
+    driver.join()
+    fake.stop()
+    latencies, missed = match(sent, fake)
+    return [mode, len(sent), len(latencies), missed,
+            f"{percentile(latencies, 50) * 1000:.0f}", f"{percentile(latencies, 99) * 1000:.0f}",
+            fake.calls.get("list_messages", 0) + fake.calls.get("get_message", 0)]
+
+
+def main():
+    stub_lookups()
+    rows = [run("polling"), run("webhook")]
+    print(f"{ROOMS} rooms, {DURATION}s per run against FakeWebex\n")
+    print_table(["mode", "commands", "answered", "missed", "p50 ms", "p99 ms", "GETs"], rows)
+
+
+if __name__ == "__main__":
+    main()
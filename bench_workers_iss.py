@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+
+from bench_common_iss import percentile, print_table, quiet
+from bench_harness_iss import match_replies, send_load
+from fake_servers_iss import FakeLocationIQ, FakeOpenNotify, FakeWebex
+from workers_iss import Supervisor
+
+# -------------------------------------------------------------------
+# Worker mode scaling benchmark
+# The supervisor runs 1, 2, 4 and 8 worker processes over the same 96
+# fake rooms (polled every 0.2 s) while commands arrive at a steady
+# rate, all against the local fake Webex / open-notify / LocationIQ.
+# Each run gets a fresh SQLite store. The table shows the polls the
+# workers managed, commands answered and reply latency.
+# -------------------------------------------------------------------
+
+WORKER_COUNTS = [1, 2, 4, 8]
+ROOMS = 96
+POLL_INTERVAL = 0.2
+COMMAND_RATE = 20.0
+WARMUP_SECONDS = 4.0
+LOAD_SECONDS = 8
+DRAIN_SECONDS = 4
+LATENCY = 0.01
+
+
+def run(workers):
+    fakes = {"webex": FakeWebex(LATENCY, seed=1).start(), "iss": FakeOpenNotify(LATENCY, seed=2).start(),
+             "geocode": FakeLocationIQ(LATENCY, seed=3).start()}
+    webex = fakes["webex"]
+    room_ids = [webex.add_room(f"Bench room {i}") for i in range(ROOMS)]
+    directory = tempfile.mkdtemp(prefix="spacebot-workers-")
+    # The workers are fresh processes: they find the fakes and the store through the environment.
+    os.environ.update(WEBEX_API_URL=webex.url, ISS_API_URL=fakes["iss"].url,
+                      LOCATIONIQ_API_URL=f"{fakes['geocode'].url}/v1",
+                      SPACEBOT_STORE=os.path.join(directory, "spacebot.db"))
+
+    supervisor = Supervisor(room_ids, "Bearer fake", "key", workers=workers, poll_interval=POLL_INTERVAL,
+                            rate=10000, quiet=True)
+    with quiet():
+        supervisor.start()
+        supervisor.run(WARMUP_SECONDS)
+        start = time.time()
+        sent = send_load(webex, room_ids, COMMAND_RATE, LOAD_SECONDS)
+        supervisor.run(DRAIN_SECONDS)
+        polls = webex.calls.get("list_messages", 0)
+        elapsed = time.time() - start
+        stats = supervisor.stop()
+    for fake in fakes.values():
+        fake.stop()
+
+    latencies = match_replies(sent, webex.posted)
+    return [workers, len(supervisor.shards), f"{polls / elapsed:.0f}", len(sent), len(latencies),
+            f"{percentile(latencies, 50) * 1000:.0f}", f"{percentile(latencies, 99) * 1000:.0f}",
+            stats["restarts"]]
+
+
+def main():
+    rows = [run(workers) for workers in WORKER_COUNTS]
+    print(f"{ROOMS} rooms polled every {POLL_INTERVAL}s, {COMMAND_RATE:.0f} commands/s for {LOAD_SECONDS}s, "
+          f"fake latency {LATENCY * 1000:.0f} ms\n")
+    print_table(["workers", "busy", "polls/s", "sent", "answered", "p50 ms", "p99 ms", "restarts"], rows)
+
+
+if __name__ == "__main__":
+    main()
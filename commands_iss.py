@@ -0,0 +1,279 @@
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing_iss
+
+# -------------------------------------------------------------------
+# Command registry and dispatcher
+# Bot commands are registered by name with a handler instead of being
+# picked apart with startswith() / isdigit() in every script. Names are
+# kept in a trie, and a message is matched against the longest name it
+# starts with: "/at 90" -> "/at" with "90", "/5" -> "/" with "5". A name
+# ending in a letter or digit must be followed by a space or the end of
+# the message, so "/attack" is not "/at".
+#
+# A handler is handler(argument, context) and returns the reply text,
+# or None if it could not answer. It can be a plain function or an
+# async def (the async dispatcher runs plain ones on the thread pool).
+# A handler that raises is logged and counted, and its call gets no
+# reply (None), like one that could not answer.
+# When registering, a command can say that it is:
+#   * batchable: identical commands in one polling batch share a single
+#     handler call and every one of them gets the result,
+#   * cacheable: its reply can be reused for cache_ttl seconds.
+# parse turns the text after the name into the handler's argument (and
+# the batching / cache key); raising ValueError marks the command as
+# invalid.
+#
+#   commands = Registry()
+#   commands.register("/over", over, usage="/over <country>", batchable=True, cacheable=True)
+#   for text, call in commands.plan(texts):
+#       reply = commands.run(call, context) if call else None
+# -------------------------------------------------------------------
+
+
+def delay_argument(max_seconds):
+    """parse= for '/N' commands: the digits after the slash, capped at max_seconds."""
+    def parse(args):
+        if not args.isdigit():
+            raise ValueError(args)
+        return min(int(args), max_seconds)
+    return parse
+
+
+def _run_coroutine(handler, argument, context):
+    """Run an async handler to completion from plain code."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(handler(argument, context))
+    # Already inside an event loop (asyncio.run would refuse): give it a loop of its own on another thread.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        run = contextvars.copy_context().run
+        return pool.submit(run, lambda: asyncio.run(handler(argument, context))).result()
+
+
+def _boundary(text, end):
+    return end == len(text) or text[end].isspace() or not text[end - 1].isalnum()
+
+
+class CommandTrie:
+    """Command names -> values, matched by the longest name a message starts with."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, name, value):
+        node = self.root
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[None] = value
+
+    def remove(self, name):
+        node = self.root
+        for ch in name:
+            node = node.get(ch)
+            if node is None:
+                return
+        node.pop(None, None)
+
+    def match(self, text):
+        """Return (value, rest of the message) for the longest matching name, or None."""
+        node = self.root
+        best = None
+        for i, ch in enumerate(text):
+            node = node.get(ch)
+            if node is None:
+                break
+            if None in node and _boundary(text, i + 1):
+                best = (node[None], i + 1)
+        if best is None:
+            return None
+        return best[0], text[best[1]:].strip()
+
+
+class Command:
+    def __init__(self, name, handler, usage=None, parse=None, batchable=False, cacheable=False,
+                 cache_ttl=30.0, due=None):
+        self.name = name
+        self.handler = handler
+        self.usage = usage or name
+        self.parse = parse or str.strip
+        self.batchable = batchable
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        # Seconds after the poll the reply is meant for (a '/N' delay), for latency stats.
+        self.due = due
+        self.is_async = inspect.iscoroutinefunction(handler)
+
+
+class Context:
+    """What a handler may need besides its argument. `seen` is when the batch was polled."""
+
+    def __init__(self, room_id=None, access_token=None, maps_api_key=None, seen=None):
+        self.room_id = room_id
+        self.access_token = access_token
+        self.maps_api_key = maps_api_key
+        self.seen = time.monotonic() if seen is None else seen
+
+
+class Call:
+    """One handler call, shared by every identical batchable command in a batch."""
+
+    def __init__(self, command, argument):
+        self.command = command
+        self.argument = argument
+        self.due = command.due(argument) if command.due else 0
+        self.trace = tracing_iss.Trace("lookup")
+        self.done = False
+        self.reply = None
+
+
+class Registry:
+    """Registered commands plus the parse / batch / cache logic around calling them."""
+
+    def __init__(self):
+        self.commands = {}
+        self.trie = CommandTrie()
+        self.cache = {}     # (name, argument) -> (expires, reply)
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "batched": 0, "cached": 0, "invalid": 0, "errors": 0}
+
+    def register(self, name, handler=None, **options):
+        """Add (or replace) a command. Without a handler, returns a decorator."""
+        if handler is None:
+            return lambda fn: self.register(name, fn, **options) or fn
+        command = Command(name, handler, **options)
+        with self.lock:
+            self.commands[name] = command
+            self.trie.insert(name, command)
+        return command
+
+    def unregister(self, name):
+        with self.lock:
+            if self.commands.pop(name, None) is not None:
+                self.trie.remove(name)
+
+    def copy(self):
+        """A registry with the same commands, to override some of them without touching this one."""
+        other = Registry()
+        for command in self.commands.values():
+            other.commands[command.name] = command
+            other.trie.insert(command.name, command)
+        return other
+
+    def invalid_message(self):
+        usages = [c.usage for c in self.commands.values()]
+        listed = usages[0] if len(usages) == 1 else f"{', '.join(usages[:-1])} or {usages[-1]}"
+        return f"Invalid command. Please use {listed}."
+
+    def parse(self, text):
+        """(Command, argument) for a message, or None if it isn't a valid command."""
+        match = self.trie.match(text.strip())
+        if match is None:
+            return None
+        command, args = match
+        try:
+            return command, command.parse(args)
+        except ValueError:
+            return None
+
+    def plan(self, texts):
+        """Pair each message with its Call (None if invalid); identical batchable commands share one."""
+        shared = {}
+        planned = []
+        for text in texts:
+            parsed = self.parse(text)
+            if parsed is None:
+                self._count("invalid")
+                planned.append((text, None))
+                continue
+            command, argument = parsed
+            key = (command.name, argument)
+            if command.batchable and key in shared:
+                self._count("batched")
+                planned.append((text, shared[key]))
+                continue
+            call = Call(command, argument)
+            if command.batchable:
+                shared[key] = call
+            planned.append((text, call))
+        return planned
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _cached(self, call):
+        if not call.command.cacheable:
+            return None
+        with self.lock:
+            entry = self.cache.get((call.command.name, call.argument))
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self.stats["cached"] += 1
+            return entry[1]
+
+    def _finish(self, call, reply):
+        call.reply = reply
+        call.done = True
+        if reply and call.command.cacheable:
+            with self.lock:
+                self.cache[(call.command.name, call.argument)] = (time.monotonic() + call.command.cache_ttl, reply)
+                if len(self.cache) > 1024:
+                    now = time.monotonic()
+                    self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+        return reply
+
+    def run(self, call, context):
+        """Get the call's reply on this thread (once; later calls return the same reply)."""
+        if call.done:
+            return call.reply
+        reply = self._cached(call)
+        if reply is not None:
+            return self._finish(call, reply)
+        self._count("calls")
+        with tracing_iss.use(call.trace):
+            try:
+                if call.command.is_async:
+                    reply = _run_coroutine(call.command.handler, call.argument, context)
+                else:
+                    reply = call.command.handler(call.argument, context)
+            except Exception as e:
+                reply = self._failed(call, e)
+        return self._finish(call, reply)
+
+    async def run_async(self, call, context):
+        """Like run(), on the event loop; plain handlers go to the default executor."""
+        if call.done:
+            return call.reply
+        reply = self._cached(call)
+        if reply is not None:
+            return self._finish(call, reply)
+        self._count("calls")
+        with tracing_iss.use(call.trace):
+            try:
+                if call.command.is_async:
+                    reply = await call.command.handler(call.argument, context)
+                else:
+                    run = contextvars.copy_context().run
+                    reply = await asyncio.get_running_loop().run_in_executor(
+                        None, run, call.command.handler, call.argument, context)
+            except Exception as e:
+                reply = self._failed(call, e)
+        return self._finish(call, reply)
+
+    def _failed(self, call, error):
+        print(f"Error in {call.command.name} handler: {error!r}")
+        self._count("errors")
+        return None
+
+    def print_report(self):
+        with self.lock:
+            s = dict(self.stats)
+        print(f"Commands: {s['calls']} handler calls, {s['batched']} shared in a batch, "
+              f"{s['cached']} from cache, {s['invalid']} invalid, {s['errors']} failed")
@@ -1,9 +1,27 @@
 import requests
 import json
+import os
+import threading
 import time
 import requests
 from requests.exceptions import RequestException, Timeout, ConnectionError
-from iso3166 import countries
+from http_client_iss import client, WEBEX_API, ISS_API, LOCATIONIQ_API
+from geocode_cache_iss import geocode_cache
+import commands_iss
+import fallback_iss
+import formatter_iss
+import offline_geocode_iss
+import geoproviders_iss
+import propagator_iss
+import groundtrack_iss
+import history_iss
+import livetrack_iss
+from scheduler_iss import scheduler
+from singleflight_iss import iss_flight, geocode_flight
+from outbox_iss import Outbox
+import store_iss
+import tracing_iss
+from tracing_iss import traced
 
 # -------------------------------------------------------------------
 # Webex + ISS Tracker
@@ -12,8 +30,16 @@ from iso3166 import countries
 # (up to 5), fetches the ISS location, and posts where it is.
 # -------------------------------------------------------------------
 
+def bearer(token):
+    """Return the token as an Authorization header value."""
+    token = token.strip()
+    return token if token.startswith("Bearer ") else f"Bearer {token}"
+
+
 def get_access_token():
-    """Ask the user for a Webex token or use the default one."""
+    """Use WEBEX_TOKEN from the environment, or ask the user for a token (or use the default one)."""
+    if os.environ.get("WEBEX_TOKEN"):
+        return bearer(os.environ["WEBEX_TOKEN"])
     try:
         choice = input("Do you want to use the hard-coded Webex token? (y/n): ").strip().lower()
         if choice == 'n':
@@ -29,24 +55,14 @@ def get_access_token():
         print(f"Error getting access token: {e}")
         return None
 
-def get_rooms(access_token):
-    """Get a list of Webex rooms for this account."""
+def fetch_rooms(access_token):
+    """Get the list of Webex rooms for this account without printing it."""
     try:
-        response = requests.get("https://webexapis.com/v1/rooms", headers={"Authorization": access_token}, timeout=10)
+        response = client.get(f"{WEBEX_API}/rooms", endpoint="rooms", headers={"Authorization": access_token})
         if response.status_code != 200:
             print(f"Failed to get rooms. Status code: {response.status_code}")
             return []
-
-        data = response.json()
-        rooms = data.get("items", [])
-        if not rooms:
-            print("No rooms found.")
-            return []
-
-        print("\nAvailable Rooms:")
-        for room in rooms:
-            print(f"- {room.get('title', 'Unnamed Room')} ({room.get('type', 'Unknown Type')})")
-        return rooms
+        return response.json().get("items", [])
 
     except (ConnectionError, Timeout):
         print("Network issue while trying to reach Webex.")
@@ -57,31 +73,100 @@ def get_rooms(access_token):
     return []
 
 
-def select_room(rooms):
-    """Ask the user to choose a room by typing part of its name."""
+def print_rooms(rooms):
+    print("\nAvailable Rooms:")
+    for room in rooms:
+        print(f"- {room.get('title', 'Unnamed Room')} ({room.get('type', 'Unknown Type')})")
+
+
+def get_rooms(access_token):
+    """Get a list of Webex rooms for this account."""
+    rooms = fetch_rooms(access_token)
+    if not rooms:
+        print("No rooms found.")
+        return []
+    print_rooms(rooms)
+    return rooms
+
+
+def get_rooms_cached(access_token, store=None):
+    """Like get_rooms(), but use the room list saved in the store if there is one.
+
+    The saved list is shown straight away and refreshed from Webex in the
+    background for next time.
+    """
+    rooms = store.load_rooms(access_token) if store is not None else None
+    if not rooms:
+        rooms = get_rooms(access_token)
+        if rooms and store is not None:
+            store.save_rooms(access_token, rooms)
+        return rooms
+
+    def refresh():
+        fresh = fetch_rooms(access_token)
+        if fresh:
+            store.save_rooms(access_token, fresh)
+
+    threading.Thread(target=refresh, daemon=True).start()
+    print_rooms(rooms)
+    return rooms
+
+
+def resume_selection(access_token, store=None):
+    """Offer to go straight back to the rooms monitored last time. Returns [(id, title)] or []."""
+    saved = store.last_selection(access_token) if store is not None else []
+    if not saved:
+        return []
+    titles = ", ".join(title for _, title in saved)
+    if input(f"\nResume monitoring {titles}? (y/n): ").strip().lower() == "n":
+        return []
+    return saved
+
+
+def find_room(rooms, name):
+    """Return the room whose id is `name` or whose title contains it, or None."""
+    for room in rooms:
+        if room.get("id") == name or name.lower() in room.get("title", "").lower():
+            return room
+    return None
+
+
+def select_room(rooms, name=None):
+    """Ask the user to choose a room by typing part of its name.
+
+    With `name` given (e.g. from SPACEBOT_ROOM) nobody is asked; (None, None)
+    is returned if no room matches it.
+    """
     if not rooms:
         print("No rooms to choose from.")
         return None, None
 
     while True:
-        name = input("\nEnter part of the room name you want to monitor: ").strip()
-        if not name:
+        if name is None:
+            typed = input("\nEnter part of the room name you want to monitor: ").strip()
+        else:
+            typed = name.strip()
+        if not typed:
             print("Please enter a valid room name.")
+            if name is not None:
+                return None, None
             continue
 
-        for room in rooms:
-            if name.lower() in room.get("title", "").lower():
-                print(f"Found room: {room['title']}")
-                return room["id"], room["title"]
+        room = find_room(rooms, typed)
+        if room:
+            print(f"Found room: {room['title']}")
+            return room["id"], room["title"]
 
         print("No matching room found. Try again.")
+        if name is not None:
+            return None, None
 
 def get_latest_message(room_id, access_token):
     """Get the most recent message from the specified Webex room."""
     try:
         params = {"roomId": room_id, "max": 1}
-        response = requests.get("https://webexapis.com/v1/messages", params=params,
-                                headers={"Authorization": access_token}, timeout=10)
+        response = client.get(f"{WEBEX_API}/messages", endpoint="messages", params=params,
+                              headers={"Authorization": access_token})
         if response.status_code != 200:
             print(f"Failed to get messages (status {response.status_code}).")
             return None
@@ -97,10 +182,85 @@ def get_latest_message(room_id, access_token):
         return None
 
 
+def get_new_messages(room_id, access_token, cursor=None, page_size=50, max_pages=5):
+    """Get every message posted after `cursor`, oldest first.
+
+    The cursor is the newest message seen so far ({"id", "created"}).
+    Returns (messages, new_cursor). On the first call (no cursor) nothing is
+    returned and the cursor is just set to the newest message. On an error
+    the messages are None and the old cursor is kept.
+    """
+    params = {"roomId": room_id, "max": 1 if cursor is None else page_size}
+    new = []
+    try:
+        for _ in range(max_pages):
+            response = client.get(f"{WEBEX_API}/messages", endpoint="messages", params=params,
+                                  headers={"Authorization": access_token})
+            if response.status_code != 200:
+                print(f"Failed to get messages (status {response.status_code}).")
+                return None, cursor
+
+            items = response.json().get("items", [])
+            reached = False
+            for message in items:
+                # Newest first, so stop at the first message we've already seen.
+                if cursor and (message["id"] == cursor["id"] or message.get("created", "") < cursor["created"]):
+                    reached = True
+                    break
+                new.append(message)
+            if reached or cursor is None or len(items) < params["max"]:
+                break
+            params["beforeMessage"] = items[-1]["id"]
+    except RequestException as e:
+        print(f"Error getting new messages: {e}")
+        return None, cursor
+    except (ValueError, KeyError):
+        print("Could not decode messages from Webex.")
+        return None, cursor
+
+    if new:
+        cursor = {"id": new[0]["id"], "created": new[0].get("created", "")}
+    elif cursor is None:
+        # Empty room: anything that turns up later is new.
+        cursor = {"id": None, "created": ""}
+        return [], cursor
+
+    if params["max"] == 1:
+        # First call: the current newest message is not a new command.
+        return [], cursor
+    return new[::-1], cursor
+
+
+def get_message(message_id, access_token):
+    """Get one message by its id (webhook events only carry the id, not the text)."""
+    try:
+        response = client.get(f"{WEBEX_API}/messages/{message_id}", endpoint="messages",
+                              headers={"Authorization": access_token})
+        if response.status_code != 200:
+            print(f"Failed to get message {message_id} (status {response.status_code}).")
+            return None
+        return response.json()
+    except RequestException as e:
+        print(f"Error getting message: {e}")
+        return None
+    except ValueError:
+        print("Could not decode JSON response from Webex.")
+        return None
+
+
+@traced("iss")
 def get_iss_location():
+    """Get the current ISS location, sharing one open-notify call between concurrent callers.
+
+    A position fetched less than a second ago is reused as well.
+    """
+    return iss_flight.do("iss", fetch_iss_location)
+
+
+def fetch_iss_location():
     """Get the current ISS location using the open-notify API."""
     try:
-        response = requests.get("http://api.open-notify.org/iss-now.json", timeout=10)
+        response = client.get(f"{ISS_API}/iss-now.json", endpoint="iss")
         if response.status_code != 200:
             print("Could not get ISS location.")
             return None
@@ -111,101 +271,289 @@ def get_iss_location():
             return None
 
         pos = data.get("iss_position", {})
-        return {
+        iss = {
             "lat": pos.get("latitude"),
             "lon": pos.get("longitude"),
             "timestamp": data.get("timestamp")
         }
+        record_fix(iss)
+        return iss
     except RequestException as e:
         print(f"Error contacting ISS API: {e}")
         return None
 
-def reverse_geocode(lat, lon, api_key):
-    """Convert coordinates to a readable address using LocationIQ."""
+def record_fix(iss):
+    """Add a fix to the position history (if it's on), tagged with whatever country we already know.
+
+    A fix we can't place yet is stored as unknown; tag_fix() fills it in
+    once the reverse geocode for it comes back.
+    """
+    recorder = history_iss.get_recorder()
+    if recorder is None:
+        return
     try:
-        params = {"pk.1af4b5d6f1cf9d29dfdfc6ab5c545fe5": api_key, "lat": lat, "lon": lon, "format": "json"}
-        response = requests.get("https://us1.locationiq.com/v1/reverse.php", params=params, timeout=10)
-        if response.status_code != 200:
-            print(f"Reverse geocoding failed ({response.status_code}).")
-            return None
-        return response.json().get("address", {})
-    except RequestException as e:
-        print(f"Error in reverse geocoding: {e}")
+        lat, lon = float(iss["lat"]), float(iss["lon"])
+    except (KeyError, TypeError, ValueError):
+        return
+    # No upstream call here: use the offline index, or the cache if it has this cell.
+    offline = offline_geocode_iss.get_geocoder()
+    address = offline.lookup(lat, lon) if offline is not None else geocode_cache.peek(lat, lon)
+    country_code = history_iss.UNKNOWN if address is None else address.get("country_code", "")
+    recorder.record(iss["timestamp"], lat, lon, country_code)
+
+
+def tag_fix(iss, address):
+    """Give a recorded fix the country its reverse geocode found (ocean when there is none)."""
+    recorder = history_iss.get_recorder()
+    if recorder is None or address is None or iss.get("age") or iss.get("timestamp") is None:
+        return
+    recorder.tag(iss["timestamp"], address.get("country_code", ""))
+
+
+def sample_position(api_key):
+    """Fetch and place the current position, for the history sampler (SPACEBOT_HISTORY_SAMPLE)."""
+    iss = get_iss_location()
+    if iss:
+        tag_fix(iss, reverse_geocode(iss["lat"], iss["lon"], api_key))
+    return iss
+
+
+@traced("iss_predict")
+def predict_iss_location(seconds_ahead=0):
+    """Work out where the ISS will be in `seconds_ahead` seconds from the local TLE.
+
+    Returns None when no TLE file is available, so the caller can wait and
+    ask the open-notify API instead.
+    """
+    propagator = propagator_iss.get_propagator()
+    if propagator is None:
         return None
+    return propagator.position(time.time() + seconds_ahead)
+
+
+# When open-notify is down or slow, replies use the last fix (moved on along
+# its track) instead of not going out at all; see fallback_iss.py.
+# get_iss_location is looked up on each use so it can be swapped out (e.g. in benchmarks).
+iss_fallback = fallback_iss.PositionFallback(lambda: get_iss_location(), **fallback_iss.bounds_from_env(
+    "ISS", timeout=2.0, max_stale=1800.0, max_extrapolate=300.0, retry_every=5.0))
+
 
+def locationiq_reverse(lat, lon, api_key):
+    """Ask LocationIQ for the address at these coordinates ({} means ocean, None an error)."""
+    return geoproviders_iss.locationiq_request(LOCATIONIQ_API, lat, lon, api_key)
 
+
+# Remote lookups go through the provider router (GEOCODE_PROVIDERS); by
+# default that is just the LocationIQ endpoint above.
+geocoders = geoproviders_iss.from_env(lambda: LOCATIONIQ_API, offline_geocode_iss.get_geocoder)
+
+# Addresses found for a cell are kept well past the cache TTL, to answer from
+# while the providers are down or slow. Lookups for the same cell that are
+# already running are shared, not repeated.
+geocode_fallback = fallback_iss.Revalidator(
+    "Reverse geocode", lambda key, lat, lon, api_key: geocode_flight.do(key, lookup_address, lat, lon, api_key),
+    **fallback_iss.bounds_from_env("GEOCODE", timeout=3.0, max_stale=7 * 86400.0, retry_every=5.0))
+
+
+@traced("geocode")
+def reverse_geocode(lat, lon, api_key):
+    """Convert coordinates to a readable address (cached per grid cell).
+
+    Uses the local offline index when one is configured, and only calls
+    LocationIQ to fill in the city name if enrichment is switched on.
+    """
+    cached = geocode_cache.get(lat, lon)
+    if cached is not None:
+        return cached
+    key = geocode_cache.key(lat, lon)
+    answer = geocode_fallback.get(key, key, lat, lon, api_key)
+    return None if answer is None else dict(answer[0])
+
+
+def lookup_address(lat, lon, api_key):
+    """Look an address up offline or with the geocode providers and store it in the cache."""
+    offline = offline_geocode_iss.get_geocoder()
+    if offline is not None:
+        remote = (lambda la, lo: geocoders.lookup(la, lo, api_key)) if api_key else None
+        address = offline.address(lat, lon, remote)
+    else:
+        address = geocoders.lookup(lat, lon, api_key)
+        if address is None:
+            return None
+
+    geocode_cache.put(lat, lon, address)
+    return address
+
+
+@traced("format")
 def format_iss_message(lat, lon, timestamp, address):
     """Turn ISS data into a readable message."""
-    time_str = time.ctime(timestamp)
-    country_code = address.get("country_code", "XZ").upper()
-    state = address.get("state", "Unknown")
-    city = address.get("city", address.get("town", "Unknown"))
+    return formatter_iss.format_text(lat, lon, timestamp, address)
 
-    try:
-        country_name = countries.get(country_code).name
-    except KeyError:
-        country_name = "Unknown Country"
-
-    if country_code == "XZ":
-        return f"On {time_str}, the ISS was over the ocean at ({lat}°, {lon}°)."
-    elif city != "Unknown":
-        return f"On {time_str}, the ISS was above {city}, {state}, {country_name}.\nCoordinates: ({lat}°, {lon}°)"
-    else:
-        return f"On {time_str}, the ISS was above {state}, {country_name}.\nCoordinates: ({lat}°, {lon}°)"
 
+def describe_position(lat, lon, timestamp, api_key):
+    """Reverse geocode a (predicted) position and turn it into the usual message."""
+    addr = reverse_geocode(lat, lon, api_key)
+    if addr is None:
+        return f"On {formatter_iss.ctime(timestamp)}, the ISS will be at ({lat}°, {lon}°)."
+    return format_iss_message(lat, lon, timestamp, addr)
 
+
+@traced("post")
 def post_message(room_id, text, access_token):
-    """Post a message to the selected Webex room."""
+    """Post a message to the selected Webex room. Returns the HTTP status, or None on a network error."""
     try:
         headers = {"Authorization": access_token, "Content-Type": "application/json"}
         data = {"roomId": room_id, "text": text}
-        response = requests.post("https://webexapis.com/v1/messages",
-                                 data=json.dumps(data), headers=headers, timeout=10)
+        response = client.post(f"{WEBEX_API}/messages", endpoint="post_message",
+                               data=json.dumps(data), headers=headers)
         if response.status_code == 200:
             print("Message posted successfully.")
         else:
             print(f"Failed to post message. {response.text}")
+        return response.status_code
     except RequestException as e:
         print(f"Error sending message: {e}")
+        return None
 
 
-def monitor_room(room_id, access_token, maps_api_key):
-    """Watch the selected room for '/seconds' commands."""
-    print("\nMonitoring the room for messages like '/5'...\n")
+# Replies are sent from here so a slow POST never delays the next poll.
+# post_message is looked up on each send so it can be swapped out (e.g. in benchmarks).
+outbox = Outbox(lambda room_id, text, access_token: post_message(room_id, text, access_token))
+
+
+def queue_reply(room_id, text, access_token, trace=None):
+    """Hand a reply to the outbox; the command's trace is finished once it has been posted."""
+    def sent(status):
+        if trace is not None:
+            trace.finish("ok" if status == 200 else "error")
+    # The outbox sends in the context it is handed the reply in, so the post span lands on this trace.
+    with tracing_iss.use(trace):
+        return outbox.submit(room_id, text, access_token, on_done=sent)
+
+
+def lookup_message(seconds, maps_api_key, since=None):
+    """Build the ISS reply for `seconds` after `since` (a time.monotonic() value, default now)."""
+    since = time.monotonic() if since is None else since
+    remaining = max(0.0, seconds - (time.monotonic() - since))
+    # With a local TLE we can compute "now + N" straight away.
+    iss = predict_iss_location(remaining)
+    if iss is None:
+        print(f"Waiting {remaining:.0f} seconds...")
+        with tracing_iss.span("wait"):
+            time.sleep(remaining)
+        iss = iss_fallback.get()
+    if not iss:
+        print("Could not get ISS location.")
+        return None
 
-    while True:
-        time.sleep(1)
-        msg = get_latest_message(room_id, access_token)
-        if not msg:
+    addr = reverse_geocode(iss["lat"], iss["lon"], maps_api_key)
+    if addr is None:
+        print("Could not reverse geocode location, sending the coordinates only.")
+    tag_fix(iss, addr)
+    return format_iss_message(iss["lat"], iss["lon"], iss["timestamp"], addr) + fallback_iss.staleness_note(iss)
+
+
+def current_position():
+    """Where the ISS is now: from the local TLE if there is one, otherwise open-notify."""
+    return predict_iss_location(0) or iss_fallback.get()
+
+
+# One shared position stream for every room that has sent /subscribe.
+# The helpers are looked up on each use so they can be swapped out (e.g. in benchmarks).
+tracker = livetrack_iss.Tracker(locate=lambda: current_position(),
+                                geocode=lambda lat, lon, key: reverse_geocode(lat, lon, key),
+                                format_message=lambda *fix: format_iss_message(*fix),
+                                send=lambda room_id, text, access_token: queue_reply(room_id, text, access_token))
+
+
+def track_command(name):
+    """Handler for /at or /pass, answered from the precomputed ground track."""
+    def handle(args, context):
+        return groundtrack_iss.handle_track_command(
+            f"{name} {args}", describe=lambda lat, lon, ts: describe_position(lat, lon, ts, context.maps_api_key))
+    return handle
+
+
+# Commands the bot understands. Other modules can add their own or override these.
+command_registry = commands_iss.Registry()
+command_registry.register("/", lambda seconds, context: lookup_message(seconds, context.maps_api_key,
+                                                                       since=context.seen),
+                          usage="/<number>", parse=commands_iss.delay_argument(5), batchable=True,
+                          due=lambda seconds: seconds)
+command_registry.register("/at", track_command("/at"), usage="/at <minutes>", batchable=True)
+command_registry.register("/pass", track_command("/pass"), usage="/pass <lat> <lon>", batchable=True,
+                          cacheable=True, cache_ttl=60.0)
+command_registry.register("/over", lambda args, context: history_iss.handle_history_command(f"/over {args}"),
+                          usage="/over <country>", batchable=True, cacheable=True, cache_ttl=30.0)
+command_registry.register("/subscribe", lambda args, context: tracker.handle_command(f"/subscribe {args}", context),
+                          usage="/subscribe [minutes|country]")
+command_registry.register("/unsubscribe", lambda args, context: tracker.handle_command("/unsubscribe", context),
+                          usage="/unsubscribe")
+
+
+def handle_commands(room_id, texts, access_token, maps_api_key, poll_seconds=0.0):
+    """Answer a batch of commands in order; identical commands share one handler call.
+
+    Every command is traced from the poll that found it to its reply being posted.
+    """
+    context = commands_iss.Context(room_id, access_token, maps_api_key)
+    for text, call in command_registry.plan(texts):
+        trace = tracing_iss.Trace("command", room=room_id, command=text)
+        trace.add_span("poll", poll_seconds)
+        if call is None:
+            print(command_registry.invalid_message())
+            trace.finish("invalid")
             continue
-
-        print(f"Last message: {msg}")
-
-        if not msg.startswith("/"):
+        msg = command_registry.run(call, context)
+        trace.include(call.trace)
+        if not msg:
+            trace.finish("error")
             continue
+        print(f"Sending message: {msg}")
+        queue_reply(room_id, msg, access_token, trace)
 
-        cmd = msg[1:]
-        if not cmd.isdigit():
-            print("Invalid command. Please use /<number> (e.g. /5).")
-            continue
 
-        seconds = min(int(cmd), 5)
-        print(f"Waiting {seconds} seconds...")
-        time.sleep(seconds)
+def monitor_room(room_id, access_token, maps_api_key, cursor=None, stop=None, store=None):
+    """Watch the selected room for '/seconds', '/at', '/pass' and '/over' commands.
 
-        iss = get_iss_location()
-        if not iss:
-            print("Could not get ISS location.")
-            continue
-
-        addr = reverse_geocode(iss["lat"], iss["lon"], maps_api_key)
-        if not addr:
-            print("Could not reverse geocode location.")
-            continue
-
-        msg = format_iss_message(iss["lat"], iss["lon"], iss["timestamp"], addr)
-        print(f"Sending message: {msg}")
-        post_message(room_id, msg, access_token)
+    Runs until `stop` (a threading.Event) is set, or forever without one.
+    With a store, polling carries on from the last message seen before a
+    restart and the new high-water mark is saved after every poll.
+    """
+    print("\nMonitoring the room for messages like '/5'...\n")
+    scheduler.attach(client)
+    outbox.attach(client)
+    tracing_iss.start_from_env(client)
+    history_iss.start_from_env(lambda: sample_position(maps_api_key))
+    poller = scheduler.poller()
+    stop = stop or threading.Event()
+    if cursor is None and store is not None:
+        cursor = store.get_cursor(room_id)
+    tracker.resume(room_id, access_token, maps_api_key)
+
+    while not stop.is_set():
+        scheduler.acquire()
+        polled = time.perf_counter()
+        messages, new_cursor = get_new_messages(room_id, access_token, cursor)
+        poll_seconds = time.perf_counter() - polled
+        if store is not None and new_cursor != cursor:
+            store.save_cursor(room_id, new_cursor)
+        cursor = new_cursor
+        if messages is None:
+            poller.on_error()
+            tracing_iss.note_retry()  # the poll is tried again after backing off
+        else:
+            for message in messages:
+                print(f"New message: {message.get('text', '')}")
+            commands = [m.get("text", "") for m in messages if m.get("text", "").startswith("/")]
+            if commands:
+                poller.on_activity()
+                handle_commands(room_id, commands, access_token, maps_api_key, poll_seconds)
+            else:
+                poller.on_idle()
+        # Poll faster right after a command, slower when idle, back off on errors.
+        stop.wait(poller.next_delay())
 
 def main():
     """Main program flow."""
@@ -214,22 +562,51 @@ def main():
         print("No access token. Exiting.")
         return
 
-    rooms = get_rooms(token)
-    if not rooms:
-        print("No rooms available. Exiting.")
-        return
+    # Saved rooms, cursors and geocode cells let a restart skip straight to monitoring.
+    # SPACEBOT_ROOM and LOCATIONIQ_KEY let it start without any prompts.
+    store = store_iss.get_store()
+    geocode_cache.use_store(store)
+    tracker.use_store(store)
+    room_name = os.environ.get("SPACEBOT_ROOM")
+    saved = [] if room_name else resume_selection(token, store)
+    if saved:
+        room_id, room_title = saved[0]
+    else:
+        rooms = get_rooms_cached(token, store)
+        if not rooms:
+            print("No rooms available. Exiting.")
+            return
 
-    room_id, room_title = select_room(rooms)
-    if not room_id:
-        print("No room selected. Exiting.")
-        return
+        room_id, room_title = select_room(rooms, room_name)
+        if not room_id:
+            print("No room selected. Exiting.")
+            return
+        if store is not None:
+            store.save_selection(token, [(room_id, room_title)])
 
-    api_key = input("\nEnter your LocationIQ API key: ").strip()
+    api_key = os.environ.get("LOCATIONIQ_KEY") or input("\nEnter your LocationIQ API key: ").strip()
     if not api_key:
         print("No API key provided. Exiting.")
         return
 
-    monitor_room(room_id, token, api_key)
+    try:
+        monitor_room(room_id, token, api_key, store=store)
+    except KeyboardInterrupt:
+        print("\nStopped monitoring.")
+        # Give replies that are still queued a moment to go out.
+        outbox.flush(timeout=5)
+        client.print_report()
+        scheduler.print_metrics()
+        outbox.print_metrics()
+        iss_flight.print_report()
+        geocode_flight.print_report()
+        geocode_cache.print_report()
+        geocoders.print_report()
+        iss_fallback.print_report()
+        geocode_fallback.print_report()
+        command_registry.print_report()
+        tracker.print_report()
+        tracing_iss.registry.print_summary()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,321 @@
+import hashlib
+import hmac
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+# -------------------------------------------------------------------
+# Local stand-in servers for testing and benchmarks
+# FakeWebex mimics the parts of the Webex API the bot uses: /v1/rooms,
+# /v1/messages (list, get one, post), /v1/people/me and /v1/webhooks.
+# It also delivers "messages created" webhooks to registered targets,
+# just like the real thing. FakeOpenNotify serves /iss-now.json with a
+# position that moves like the real ISS, and FakeLocationIQ answers
+# /v1/reverse(.php) from a small table of land areas (404 "Unable to
+# geocode" everywhere else, like over the ocean). Everything lives in
+# memory, runs on 127.0.0.1 on a free port and is torn down with stop().
+#
+# Every fake can add latency (with a slow_rate share of requests taking
+# slow_latency instead) and fail a share of requests with a 500
+# (error_rate) or a 429 with Retry-After (rate_limit_rate).
+#
+#   fake = FakeWebex().start()
+#   fake.add_room("Space Bot")
+#   fake.add_message(room_id, "/5")
+#   ... point WEBEX_API at fake.url ...
+#   fake.stop()
+# -------------------------------------------------------------------
+
+BOT_PERSON_ID = "bot-person"
+USER_PERSON_ID = "user-person"
+
+
+def iso_time(unix_time):
+    """Format a timestamp the way Webex does, e.g. 2024-01-01T12:00:00.123Z."""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(unix_time)) + f".{int(unix_time % 1 * 1000):03d}Z"
+
+
+class FakeServer:
+    """Base class: a threaded HTTP server that routes to do_<METHOD>(handler, path, query, body)."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=None,
+                 slow_rate=0.0, slow_latency=1.0):
+        self.latency = latency
+        # A slow_rate share of requests take slow_latency instead, for tail-latency tests.
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def total_calls(self):
+        """Requests served, not counting injected failures or webhook deliveries."""
+        with self.lock:
+            return sum(n for name, n in self.calls.items()
+                       if name not in ("injected_500", "injected_429") and not name.startswith("webhook_"))
+
+    def delay(self):
+        if not self.slow_rate:
+            return self.latency
+        with self.lock:
+            slow = self.rng.random() < self.slow_rate
+        return self.slow_latency if slow else self.latency
+
+    def fault(self):
+        """Pick an injected failure for this request, or None to serve it normally."""
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.count("injected_429")
+            return 429, {"message": "Too many requests"}, {"Retry-After": str(self.retry_after)}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.count("injected_500")
+            return 500, {"message": "Internal server error"}, None
+        return None
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                delay = fake.delay()
+                if delay:
+                    time.sleep(delay)
+                reply = fake.fault() or fake.route(method, parts.path, parse_qs(parts.query), body, self.headers)
+                status, payload, headers = reply
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def route(self, method, path, query, body, headers):
+        return 404, {"message": "Not found"}, None
+
+
+class FakeWebex(FakeServer):
+    """In-memory Webex API with rooms, messages and webhook delivery."""
+
+    def __init__(self, latency=0.0, **faults):
+        super().__init__(latency, **faults)
+        self.ids = itertools.count(1)
+        self.rooms = []
+        self.messages = {}      # room id -> list of messages, oldest first
+        self.by_id = {}
+        self.webhooks = {}
+        self.posted = []        # (unix time, room id, text) for every bot reply
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def add_room(self, title, room_type="group"):
+        room = {"id": f"room-{next(self.ids)}", "title": title, "type": room_type}
+        with self.lock:
+            self.rooms.append(room)
+            self.messages[room["id"]] = []
+        return room["id"]
+
+    def add_message(self, room_id, text, person_id=USER_PERSON_ID):
+        """Post a message into a room as a user would (fires webhooks)."""
+        now = time.time()
+        message = {"id": f"msg-{next(self.ids)}", "roomId": room_id, "text": text,
+                   "personId": person_id, "personEmail": f"{person_id}@example.com",
+                   "created": iso_time(now)}
+        with self.lock:
+            self.messages[room_id].append(message)
+            self.by_id[message["id"]] = message
+            if person_id == BOT_PERSON_ID:
+                self.posted.append((now, room_id, text))
+            hooks = [hook for hook in self.webhooks.values()
+                     if hook["resource"] == "messages" and hook["event"] == "created"
+                     and hook.get("filter") in (None, "", f"roomId={room_id}")]
+        for hook in hooks:
+            threading.Thread(target=self._deliver, args=(hook, message), daemon=True).start()
+        return message
+
+    def _deliver(self, hook, message):
+        event = {"id": hook["id"], "name": hook["name"], "resource": "messages", "event": "created",
+                 "filter": hook.get("filter"),
+                 "data": {key: message[key] for key in ("id", "roomId", "personId", "personEmail", "created")}}
+        body = json.dumps(event).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if hook.get("secret"):
+            headers["X-Spark-Signature"] = hmac.new(hook["secret"].encode(), body, hashlib.sha1).hexdigest()
+        try:
+            requests.post(hook["targetUrl"], data=body, headers=headers, timeout=5)
+            self.count("webhook_delivered")
+        except requests.exceptions.RequestException:
+            self.count("webhook_failed")
+
+    def route(self, method, path, query, body, headers):
+        auth = headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return 401, {"message": "Missing token"}, None
+
+        if method == "GET" and path == "/v1/rooms":
+            self.count("rooms")
+            with self.lock:
+                return 200, {"items": list(self.rooms)}, None
+
+        if method == "GET" and path == "/v1/people/me":
+            return 200, {"id": BOT_PERSON_ID, "displayName": "Space Bot"}, None
+
+        if method == "GET" and path == "/v1/messages":
+            self.count("list_messages")
+            room_id = query.get("roomId", [""])[0]
+            limit = int(query.get("max", ["50"])[0])
+            before_id = query.get("beforeMessage", [None])[0]
+            with self.lock:
+                if room_id not in self.messages:
+                    return 404, {"message": "Room not found"}, None
+                items = self.messages[room_id][::-1]
+                if before_id:
+                    ids = [m["id"] for m in items]
+                    items = items[ids.index(before_id) + 1:] if before_id in ids else []
+                return 200, {"items": items[:limit]}, None
+
+        if method == "GET" and path.startswith("/v1/messages/"):
+            self.count("get_message")
+            with self.lock:
+                message = self.by_id.get(path.rsplit("/", 1)[1])
+            if message is None:
+                return 404, {"message": "Message not found"}, None
+            return 200, message, None
+
+        if method == "POST" and path == "/v1/messages":
+            self.count("post_message")
+            data = json.loads(body or b"{}")
+            if data.get("roomId") not in self.messages:
+                return 404, {"message": "Room not found"}, None
+            message = self.add_message(data["roomId"], data.get("text") or data.get("markdown", ""),
+                                       person_id=BOT_PERSON_ID)
+            return 200, message, None
+
+        if method == "POST" and path == "/v1/webhooks":
+            data = json.loads(body or b"{}")
+            hook = {"id": f"hook-{next(self.ids)}", "name": data.get("name", ""),
+                    "targetUrl": data["targetUrl"], "resource": data.get("resource", "messages"),
+                    "event": data.get("event", "created"), "filter": data.get("filter"),
+                    "secret": data.get("secret")}
+            with self.lock:
+                self.webhooks[hook["id"]] = hook
+            return 200, hook, None
+
+        if method == "GET" and path == "/v1/webhooks":
+            with self.lock:
+                return 200, {"items": list(self.webhooks.values())}, None
+
+        if method == "DELETE" and path.startswith("/v1/webhooks/"):
+            with self.lock:
+                self.webhooks.pop(path.rsplit("/", 1)[1], None)
+            return 204, b"", None
+
+        return 404, {"message": "Not found"}, None
+
+
+class FakeOpenNotify(FakeServer):
+    """open-notify stand-in: /iss-now.json for an ISS on a 51.6 degree, 92 minute orbit."""
+
+    PERIOD = 5560.0
+    INCLINATION = 51.6
+
+    def position(self, unix_time):
+        phase = 2 * math.pi * (unix_time % self.PERIOD) / self.PERIOD
+        lat = math.degrees(math.asin(math.sin(math.radians(self.INCLINATION)) * math.sin(phase)))
+        # The ground track drifts west as the Earth turns underneath.
+        lon = (math.degrees(phase) - unix_time % 86164 / 86164 * 360 + 180) % 360 - 180
+        return lat, lon
+
+    def route(self, method, path, query, body, headers):
+        if method == "GET" and path == "/iss-now.json":
+            self.count("iss_now")
+            now = int(time.time())
+            lat, lon = self.position(now)
+            return 200, {"message": "success", "timestamp": now,
+                         "iss_position": {"latitude": f"{lat:.4f}", "longitude": f"{lon:.4f}"}}, None
+        return 404, {"message": "Not found"}, None
+
+
+# (south, west, north, east, address) boxes, checked in order; anything else is ocean.
+LAND_AREAS = [
+    (36.0, -9.5, 43.5, 3.0, {"country_code": "es", "state": "Castile and León", "city": "Valladolid"}),
+    (43.5, -4.5, 51.0, 7.5, {"country_code": "fr", "state": "Île-de-France", "city": "Paris"}),
+    (47.5, 7.5, 54.5, 14.5, {"country_code": "de", "state": "Bavaria", "town": "Passau"}),
+    (25.0, -124.0, 49.0, -67.0, {"country_code": "us", "state": "Kansas"}),
+    (-44.0, 113.0, -11.0, 153.0, {"country_code": "au", "state": "Northern Territory"}),
+    (-34.0, -73.0, 5.0, -35.0, {"country_code": "br", "state": "Mato Grosso"}),
+    (18.0, 73.0, 50.0, 134.0, {"country_code": "cn", "state": "Sichuan", "city": "Chengdu"}),
+    (-35.0, 15.0, 35.0, 50.0, {"country_code": "cd", "state": "Kasaï"}),
+]
+
+
+class FakeLocationIQ(FakeServer):
+    """LocationIQ stand-in: /v1/reverse and /v1/reverse.php from LAND_AREAS."""
+
+    def route(self, method, path, query, body, headers):
+        if method != "GET" or path not in ("/v1/reverse", "/v1/reverse.php"):
+            return 404, {"error": "Not found"}, None
+        self.count("reverse")
+        if not query.get("key"):
+            return 401, {"error": "Invalid key"}, None
+        try:
+            lat = float(query["lat"][0])
+            lon = float(query["lon"][0])
+        except (KeyError, ValueError):
+            return 400, {"error": "Invalid coordinates"}, None
+        for south, west, north, east, address in LAND_AREAS:
+            if south <= lat <= north and west <= lon <= east:
+                return 200, {"lat": f"{lat}", "lon": f"{lon}", "address": dict(address)}, None
+        return 404, {"error": "Unable to geocode"}, None
@@ -0,0 +1,227 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+# -------------------------------------------------------------------
+# Stale-while-revalidate fallbacks
+# When open-notify or the geocoders are down or slow, a command used to
+# get no reply at all (after waiting for the upstream timeouts). Lookups
+# now go through a Revalidator that remembers the last good answer for
+# each key and:
+#   * waits at most `timeout` seconds for the upstream; the call keeps
+#     running in the background and its answer is kept for next time,
+#   * answers from the last good value when the upstream fails or is
+#     too slow, as long as that value is at most `max_stale` seconds old,
+#   * once a refresh has failed, stops waiting on the upstream: stale
+#     answers go out straight away, and a single call every
+#     `retry_every` seconds checks whether the upstream is back. A key
+#     with nothing usable to answer from still asks the upstream, so a
+#     recovered upstream is noticed on the next miss.
+# So replies keep coming, at about the usual latency, during an upstream
+# incident. For the ISS position the last fix is moved forward along
+# the track the last two fixes give (for up to `max_extrapolate`
+# seconds) and the reply says how old the data behind it is.
+#
+# The bounds can be set from the environment, in seconds:
+#   SPACEBOT_ISS_TIMEOUT, SPACEBOT_ISS_MAX_STALE, SPACEBOT_ISS_MAX_EXTRAPOLATE,
+#   SPACEBOT_GEOCODE_TIMEOUT, SPACEBOT_GEOCODE_MAX_STALE, ...
+# -------------------------------------------------------------------
+
+MAX_LATITUDE = 51.6     # the ISS orbit's inclination: it never gets further from the equator
+
+
+def bounds_from_env(prefix, **defaults):
+    """`defaults`, each overridden by SPACEBOT_<PREFIX>_<NAME> when that is set."""
+    bounds = {}
+    for name, value in defaults.items():
+        setting = os.environ.get(f"SPACEBOT_{prefix}_{name.upper()}")
+        bounds[name] = float(setting) if setting else value
+    return bounds
+
+
+def describe_age(seconds):
+    seconds = int(seconds)
+    if seconds < 90:
+        return f"{seconds} s"
+    if seconds < 5400:
+        return f"{round(seconds / 60)} min"
+    return f"{seconds // 3600} h {seconds % 3600 // 60} min"
+
+
+class Revalidator:
+    """Serves the last good answer per key while the upstream is refreshed in the background."""
+
+    def __init__(self, name, fetch, timeout=2.0, fresh_for=0.0, max_stale=600.0, retry_every=5.0,
+                 max_keys=4096):
+        self.name = name
+        self.fetch = fetch              # (*args) -> value, or None when the upstream failed
+        self.timeout = timeout          # None waits for the upstream as long as it takes
+        self.fresh_for = fresh_for      # answers younger than this are served without asking again
+        self.max_stale = max_stale
+        self.retry_every = retry_every
+        self.max_keys = max_keys
+        self.entries = OrderedDict()    # key -> (value, time.monotonic() it was fetched)
+        self.refreshing = {}            # key -> Future of the running upstream call
+        self.failing = False
+        self.last_failure = 0.0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"revalidate-{name}")
+        self.stats = {"requests": 0, "fresh": 0, "upstream": 0, "stale": 0, "timeouts": 0,
+                      "failures": 0, "misses": 0}
+
+    def get(self, key, *args):
+        """(value, age in seconds) for `key`, or None when there is neither a new nor a usable old answer."""
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+            entry = self.entries.get(key)
+            age = None if entry is None else now - entry[1]
+            if entry is not None and age < self.fresh_for:
+                self.stats["fresh"] += 1
+                return entry[0], age
+            usable = entry is not None and (self.max_stale is None or age <= self.max_stale)
+            future = self.refreshing.get(key)
+            if future is None and self._may_refresh(now, usable):
+                # Copy the context so the upstream call shows up in the caller's trace.
+                future = self.executor.submit(contextvars.copy_context().run, self._fetch, key, args)
+                self.refreshing[key] = future
+            # While the upstream is failing, answer from what we have instead of waiting on it again.
+            wait = future is not None and not (usable and self.failing)
+
+        if wait:
+            try:
+                value = future.result(self.timeout)
+            except FutureTimeout:
+                self._count("timeouts")
+                value = None
+            if value is not None:
+                self._count("upstream")
+                return value, 0.0
+        if usable:
+            self._count("stale")
+            return entry[0], time.monotonic() - entry[1]
+        self._count("misses")
+        return None
+
+    def _may_refresh(self, now, usable):
+        # Called with self.lock held. While the upstream is failing, keys that have an old answer
+        # to fall back on are only refreshed by one call at a time, at most every retry_every
+        # seconds; a key with nothing to answer from always asks (the answer is a miss otherwise).
+        if not self.failing or not usable:
+            return True
+        return not self.refreshing and now - self.last_failure >= self.retry_every
+
+    def _fetch(self, key, args):
+        try:
+            value = self.fetch(*args)
+        except Exception as e:
+            print(f"Error refreshing {self.name}: {e}")
+            value = None
+        with self.lock:
+            self.refreshing.pop(key, None)
+            if value is None:
+                self.failing = True
+                self.last_failure = time.monotonic()
+                self.stats["failures"] += 1
+                return None
+            self.failing = False
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+        return value
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.failing = False
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["keys"] = len(self.entries)
+            stats["failing"] = self.failing
+        return stats
+
+    def print_report(self):
+        s = self.report()
+        state = "failing" if s["failing"] else "ok"
+        print(f"{self.name} fallback ({state}): {s['requests']} lookups, {s['stale']} answered from stale data, "
+              f"{s['timeouts']} upstream timeouts, {s['failures']} failed refreshes, {s['misses']} with no answer")
+
+
+class PositionFallback:
+    """The ISS position from `fetch`, or an estimate from the last fixes when it can't answer in time."""
+
+    def __init__(self, fetch, timeout=2.0, max_stale=1800.0, max_extrapolate=300.0, retry_every=5.0):
+        self.fetch = fetch              # () -> {"lat", "lon", "timestamp"} or None
+        self.max_extrapolate = max_extrapolate
+        self.fixes = deque(maxlen=2)    # the last two good fixes as (timestamp, lat, lon)
+        self.revalidator = Revalidator("ISS position", self._fetch, timeout=timeout, max_stale=max_stale,
+                                       retry_every=retry_every)
+
+    def _fetch(self):
+        iss = self.fetch()
+        if iss:
+            try:
+                fix = (float(iss["timestamp"]), float(iss["lat"]), float(iss["lon"]))
+            except (KeyError, TypeError, ValueError):
+                return None
+            if not self.fixes or fix[0] > self.fixes[-1][0]:
+                self.fixes.append(fix)
+        return iss or None
+
+    def get(self):
+        """The position dict, with "age" (seconds) and "estimated" added when it isn't a new fix."""
+        answer = self.revalidator.get("iss")
+        if answer is None:
+            return None
+        iss, age = answer
+        if not age:
+            return iss
+        estimate = self.extrapolate(age)
+        if estimate is not None:
+            return estimate
+        return dict(iss, age=age, estimated=False)
+
+    def extrapolate(self, age):
+        """Where the last two fixes put the ISS `age` seconds after the newer one (None if they can't)."""
+        fixes = list(self.fixes)
+        if len(fixes) < 2 or age > self.max_extrapolate:
+            return None
+        (t0, lat0, lon0), (t1, lat1, lon1) = fixes
+        if not 0 < t1 - t0 <= self.max_extrapolate:
+            return None
+        # Unwrap the longitude step across the date line before working out the speed.
+        dlon = (lon1 - lon0 + 180) % 360 - 180
+        lat = lat1 + (lat1 - lat0) / (t1 - t0) * age
+        lon = lon1 + dlon / (t1 - t0) * age
+        return {"lat": f"{max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)):.4f}",
+                "lon": f"{(lon + 180) % 360 - 180:.4f}",
+                "timestamp": int(t1 + age), "age": age, "estimated": True}
+
+    def clear(self):
+        self.fixes.clear()
+        self.revalidator.clear()
+
+    def print_report(self):
+        self.revalidator.print_report()
+
+
+def staleness_note(iss):
+    """A line to add to a reply built from an old or estimated position ("" for a new fix)."""
+    age = iss.get("age")
+    if not age:
+        return ""
+    if iss.get("estimated"):
+        return f"\n(Estimated: the ISS tracker hasn't answered for {describe_age(age)}, " \
+               f"so this is worked out from its last fix.)"
+    return f"\n(Last known position, {describe_age(age)} old: the ISS tracker isn't answering right now.)"
@@ -0,0 +1,157 @@
+import functools
+import time
+
+import lazy_iss
+
+iso3166 = lazy_iss.module("iso3166")
+
+# -------------------------------------------------------------------
+# Reply formatting
+# One place that turns (lat, lon, timestamp, address) into the reply,
+# shared by all the scripts. The country code -> name table is built
+# once, on first use, instead of calling iso3166 per reply (iso3166
+# itself is only imported then), time.ctime() is cached per timestamp
+# (replies for the same ISS fix share it), and the sentences are fixed
+# templates picked by where the ISS is (ocean, over a city, over a
+# region, or "unknown" when the address is None because no geocoder
+# answered) and filled in with str.format. Template fields are
+# positional: {0} time, {1} lat, {2} lon, {3} city, {4} state,
+# {5} country.
+#
+# Views:
+#   text       plain sentence, in the wording of a style:
+#                "bot"      errorhandling_iss / async_monitor_iss / service_iss
+#                "classic"  space_iss / functionsspace_iss
+#   markdown   the same with the place in bold (Webex "markdown" field)
+#   card       an Adaptive Card for a message's "attachments" (send the
+#              text view along with it as the fallback)
+#
+# format_many() formats a whole batch and formats each distinct
+# position only once.
+# -------------------------------------------------------------------
+
+OCEAN = "XZ"
+CARD_CONTENT_TYPE = "application/vnd.microsoft.card.adaptive"
+
+COUNTRY_NAMES = {}      # alpha-2 code -> name, filled from iso3166 on first use
+
+STYLES = {
+    "bot": {
+        "unknown_country": "Unknown Country",
+        "unknown": "On {0}, the ISS was at ({1}°, {2}°). (The address lookup isn't answering right now.)".format,
+        "ocean": "On {0}, the ISS was over the ocean at ({1}°, {2}°).".format,
+        "city": "On {0}, the ISS was above {3}, {4}, {5}.\nCoordinates: ({1}°, {2}°)".format,
+        "region": "On {0}, the ISS was above {4}, {5}.\nCoordinates: ({1}°, {2}°)".format,
+    },
+    "classic": {
+        # None: show the country code itself when iso3166 doesn't know it.
+        "unknown_country": None,
+        "unknown": ("On {0}, the ISS was at latitude {1}° and longitude {2}° "
+                    "(the address lookup is unavailable right now).").format,
+        "ocean": ("On {0}, the ISS was flying over a body of water "
+                  "at latitude {1}° and longitude {2}°.").format,
+        "city": ("In {3}, {4}, the ISS was flying over on {0}.\n"
+                 "Coordinates: ({1}°, {2}°)\nCountry: {5}").format,
+        "region": "On {0}, the ISS was flying over {4}, {5} at coordinates ({1}°, {2}°).".format,
+    },
+}
+
+MARKDOWN = {
+    "unknown": "On {0}, the ISS was at `({1}°, {2}°)`. (The address lookup isn't answering right now.)".format,
+    "ocean": "On {0}, the ISS was over **the ocean** at `({1}°, {2}°)`.".format,
+    "city": "On {0}, the ISS was above **{3}, {4}, {5}**.\nCoordinates: `({1}°, {2}°)`".format,
+    "region": "On {0}, the ISS was above **{4}, {5}**.\nCoordinates: `({1}°, {2}°)`".format,
+}
+
+# Adaptive Card titles; the facts below them are the same for every card.
+CARD_TITLES = {
+    "unknown": "The ISS position".format,
+    "ocean": "The ISS is over the ocean".format,
+    "city": "The ISS is above {3}".format,
+    "region": "The ISS is above {4}".format,
+}
+
+ctime = functools.lru_cache(maxsize=1024)(time.ctime)
+
+
+def country_name(code, default=None):
+    """Full country name for a 2-letter code; `default` (or the code itself) when unknown."""
+    if not COUNTRY_NAMES:
+        COUNTRY_NAMES.update((country.alpha2, country.name) for country in iso3166.countries)
+    code = code.upper()
+    name = COUNTRY_NAMES.get(code)
+    if name is not None:
+        return name
+    return code if default is None else default
+
+
+def describe(lat, lon, timestamp, address, unknown_country=None):
+    """The template kind ("unknown", "ocean", "city" or "region") and its positional fields."""
+    if address is None:
+        return "unknown", (ctime(timestamp), lat, lon)
+    code = address.get("country_code", OCEAN).upper()
+    if code == OCEAN:
+        return "ocean", (ctime(timestamp), lat, lon)
+    city = address.get("city", address.get("town", "Unknown"))
+    fields = (ctime(timestamp), lat, lon, city, address.get("state", "Unknown"), country_name(code, unknown_country))
+    return ("city" if city != "Unknown" else "region"), fields
+
+
+def format_text(lat, lon, timestamp, address, style="bot"):
+    templates = STYLES[style]
+    kind, fields = describe(lat, lon, timestamp, address, templates["unknown_country"])
+    return templates[kind](*fields)
+
+
+def format_markdown(lat, lon, timestamp, address, style="bot"):
+    kind, fields = describe(lat, lon, timestamp, address, STYLES[style]["unknown_country"])
+    return MARKDOWN[kind](*fields)
+
+
+def format_card(lat, lon, timestamp, address, style="bot"):
+    """An Adaptive Card for the position, ready to go in a Webex message's attachments."""
+    kind, fields = describe(lat, lon, timestamp, address, STYLES[style]["unknown_country"])
+    facts = [{"title": "Time", "value": fields[0]}]
+    if kind in ("city", "region"):
+        place = f"{fields[3]}, {fields[4]}" if kind == "city" else fields[4]
+        facts.append({"title": "Place", "value": place})
+        facts.append({"title": "Country", "value": fields[5]})
+    facts.append({"title": "Coordinates", "value": f"{lat}°, {lon}°"})
+    return {
+        "contentType": CARD_CONTENT_TYPE,
+        "content": {
+            "type": "AdaptiveCard",
+            "version": "1.3",
+            "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+            "body": [
+                {"type": "TextBlock", "text": CARD_TITLES[kind](*fields), "weight": "Bolder", "size": "Medium"},
+                {"type": "FactSet", "facts": facts},
+            ],
+        },
+    }
+
+
+VIEWS = {"text": format_text, "markdown": format_markdown, "card": format_card}
+
+
+def format_message(lat, lon, timestamp, address, view="text", style="bot"):
+    return VIEWS[view](lat, lon, timestamp, address, style)
+
+
+def format_many(items, view="text", style="bot"):
+    """Format a batch of (lat, lon, timestamp, address) at once, in order.
+
+    Replies for the same position are only formatted once. Cards are
+    shared between those replies, so don't change them in place.
+    """
+    formatter = VIEWS[view]
+    done = {}
+    results = []
+    for lat, lon, timestamp, address in items:
+        key = (lat, lon, timestamp) if address is None else \
+            (lat, lon, timestamp, address.get("country_code"), address.get("state"),
+             address.get("city", address.get("town")))
+        if key not in done:
+            done[key] = formatter(lat, lon, timestamp, address, style)
+        results.append(done[key])
+    return results
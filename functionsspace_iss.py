@@ -9,13 +9,24 @@
 #monitor_room(room_id, access_token, maps_api_key) – main loop
 
 #these are all my functions i have used below to store the data 
+import os
 import requests
 import json
 import time
-from iso3166 import countries
+import commands_iss
+import fallback_iss
+import formatter_iss
+from http_client_iss import client, WEBEX_API, ISS_API, LOCATIONIQ_API
+from geocode_cache_iss import geocode_cache
+import offline_geocode_iss
+import groundtrack_iss
+from scheduler_iss import scheduler
 
 
 def get_access_token():
+    if os.environ.get("WEBEX_TOKEN"):
+        token = os.environ["WEBEX_TOKEN"].strip()
+        return token if token.startswith("Bearer ") else f"Bearer {token}"
     choice = input("Do you wish to use the hard-coded Webex token? (y/n) ")
     if choice.lower() == 'n':
         user_token = input("Please enter your Webex access token: ")
@@ -25,7 +36,7 @@ def get_access_token():
 
 
 def get_rooms(access_token):
-    r = requests.get("https://webexapis.com/v1/rooms", headers={"Authorization": access_token})
+    r = client.get(f"{WEBEX_API}/rooms", endpoint="rooms", headers={"Authorization": access_token})
     if r.status_code != 200:
         raise Exception(f"Incorrect reply from Webex API. Status code: {r.status_code}. Text: {r.text}")
 
@@ -37,19 +48,24 @@ def get_rooms(access_token):
 
 
 def select_room(rooms):
+    # SPACEBOT_ROOM picks the room without asking
+    room_name = os.environ.get("SPACEBOT_ROOM")
     while True:
-        room_name = input("\nWhich room should be monitored for the /seconds messages? ")
+        if room_name is None:
+            room_name = input("\nWhich room should be monitored for the /seconds messages? ")
         for room in rooms:
             if room_name.lower() in room["title"].lower():
                 print(f"Found room: {room['title']}")
                 return room["id"], room["title"]
         print("No room found. Please try again.")
+        room_name = None
 
 
 def get_latest_message(room_id, access_token):
     params = {"roomId": room_id, "max": 1}
     try:
-        r = requests.get("https://webexapis.com/v1/messages", params=params, headers={"Authorization": access_token}, timeout=5)
+        r = client.get(f"{WEBEX_API}/messages", endpoint="messages", params=params,
+                       headers={"Authorization": access_token})
         r.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"Error fetching messages: {e}")
@@ -63,7 +79,7 @@ def get_latest_message(room_id, access_token):
 
 def get_iss_location():
     try:
-        r = requests.get("http://api.open-notify.org/iss-now.json", timeout=5)
+        r = client.get(f"{ISS_API}/iss-now.json", endpoint="iss")
         r.raise_for_status()
         data = r.json()
         if data.get("message") != "success":
@@ -78,42 +94,53 @@ def get_iss_location():
         return None
 
 
+# if open-notify is down or slow, use the last fix (moved along its track) instead of not replying
+iss_fallback = fallback_iss.PositionFallback(get_iss_location, **fallback_iss.bounds_from_env(
+    "ISS", timeout=2.0, max_stale=1800.0, max_extrapolate=300.0, retry_every=5.0))
+
+
 def reverse_geocode(lat, lon, api_key):
-    params = {"pk.1af4b5d6f1cf9d29dfdfc6ab5c545fe5": api_key, "lat": lat, "lon": lon, "format": "json"}
+    cached = geocode_cache.get(lat, lon)
+    if cached is not None:
+        return cached
+
+    # local country/ocean index if one is set up: LocationIQ is only asked for the city, and only over land
+    offline = offline_geocode_iss.get_geocoder()
+    if offline is not None:
+        remote = (lambda la, lo: locationiq_address(la, lo, api_key)) if api_key else None
+        address = offline.address(lat, lon, remote)
+        geocode_cache.put(lat, lon, address)
+        return address
+
+    address = locationiq_address(lat, lon, api_key)
+    if address is not None:
+        geocode_cache.put(lat, lon, address)
+    return address
+
+
+def locationiq_address(lat, lon, api_key):
+    params = {"key": api_key, "lat": lat, "lon": lon, "format": "json"}
     try:
-        r = requests.get("https://us1.locationiq.com/v1/reverse.php", params=params, timeout=5)
+        r = client.get(f"{LOCATIONIQ_API}/reverse.php", endpoint="geocode", params=params)
+        if r.status_code == 404 or "Unable to geocode" in r.text:
+            # over the ocean, remember that too so we don't ask again
+            return {}
         r.raise_for_status()
         return r.json().get("address", {})
     except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Reverse geocode error: {e}")
-        return {}
+        return None
 
 
 def format_iss_message(lat, lon, timestamp, address):
-    time_str = time.ctime(timestamp)
-    country_code = address.get("country_code", "XZ").upper()
-    state = address.get("state", "Unknown")
-    city = address.get("city", address.get("town", "Unknown"))
-
-    try:
-        country_name = countries.get(country_code).name
-    except KeyError:
-        country_name = country_code
-
-    if country_code == "XZ":
-        return f"On {time_str}, the ISS was flying over a body of water at latitude {lat}° and longitude {lon}°."
-    elif city != "Unknown":
-        return (f"In {city}, {state}, the ISS was flying over on {time_str}.\n"
-                f"Coordinates: ({lat}°, {lon}°)\nCountry: {country_name}")
-    else:
-        return f"On {time_str}, the ISS was flying over {state}, {country_name} at coordinates ({lat}°, {lon}°)."
+    return formatter_iss.format_text(lat, lon, timestamp, address, style="classic")
 
 
 def post_message(room_id, text, access_token):
     headers = {"Authorization": access_token, "Content-Type": "application/json"}
     data = {"roomId": room_id, "text": text}
     try:
-        r = requests.post("https://webexapis.com/v1/messages", json=data, headers=headers, timeout=5)
+        r = client.post(f"{WEBEX_API}/messages", endpoint="post_message", json=data, headers=headers)
         if r.status_code == 200:
             print("Message successfully posted to Webex.")
         else:
@@ -122,52 +149,81 @@ def post_message(room_id, text, access_token):
         print(f"Error posting to Webex: {e}")
 
 
+def iss_message_after(seconds, context):
+    print(f"Waiting {seconds} seconds before fetching ISS data...")
+    time.sleep(seconds)
+
+    iss = iss_fallback.get()
+    if not iss:
+        print("Error getting ISS location.")
+        return None
+
+    address = reverse_geocode(iss["lat"], iss["lon"], context.maps_api_key)
+    if address is None:
+        print("Error reverse geocoding coordinates, sending just the coordinates.")
+
+    return format_iss_message(iss["lat"], iss["lon"], iss["timestamp"], address) + fallback_iss.staleness_note(iss)
+
+
+def track_reply(args, context, name):
+    # /at <minutes> and /pass <lat> <lon> come from the precomputed ground track
+    key = context.maps_api_key
+    return groundtrack_iss.handle_track_command(
+        f"{name} {args}",
+        describe=lambda lat, lon, ts: format_iss_message(lat, lon, ts, reverse_geocode(lat, lon, key) or {}))
+
+
+commands = commands_iss.Registry()
+commands.register("/", iss_message_after, usage="/<number>", parse=commands_iss.delay_argument(5))
+commands.register("/at", lambda args, context: track_reply(args, context, "/at"), usage="/at <minutes>")
+commands.register("/pass", lambda args, context: track_reply(args, context, "/pass"), usage="/pass <lat> <lon>")
+
+
 def monitor_room(room_id, access_token, maps_api_key):
     print("\nMonitoring room for /<seconds> messages...\n")
     last_message = None
+    scheduler.attach(client)
+    poller = scheduler.poller()
+    context = commands_iss.Context(room_id, access_token, maps_api_key)
 
     while True:
-        time.sleep(1)
+        # adaptive wait instead of a flat 1s, and it stops for a while after a 429
+        time.sleep(poller.next_delay())
+        scheduler.acquire()
         message = get_latest_message(room_id, access_token)
         if not message or message == last_message:
+            poller.on_idle()
             continue
         last_message = message
+        poller.on_activity()
 
         print(f"Latest message: {message}")
 
         if not message.startswith("/"):
             continue
 
-        command = message[1:]
-        if not command.isdigit():
-            print("Invalid command. Use /<number> (e.g. /5).")
+        [(_, call)] = commands.plan([message])
+        if call is None:
+            print(commands.invalid_message())
             continue
 
-        seconds = min(int(command), 5)
-        print(f"Waiting {seconds} seconds before fetching ISS data...")
-        time.sleep(seconds)
-
-        iss = get_iss_location()
-        if not iss:
-            print("Error getting ISS location.")
-            continue
-
-        address = reverse_geocode(iss["lat"], iss["lon"], maps_api_key)
-        if not address:
-            print("Error reverse geocoding coordinates.")
-            continue
-
-        msg = format_iss_message(iss["lat"], iss["lon"], iss["timestamp"], address)
-        print(f"Sending message: {msg}")
-        post_message(room_id, msg, access_token)
+        msg = commands.run(call, context)
+        if msg:
+            print(f"Sending message: {msg}")
+            post_message(room_id, msg, access_token)
 
 
 def main():
     access_token = get_access_token()
     rooms = get_rooms(access_token)
     room_id, room_title = select_room(rooms)
-    maps_api_key = input("Enter your LocationIQ API key: ")
-    monitor_room(room_id, access_token, maps_api_key)
+    maps_api_key = os.environ.get("LOCATIONIQ_KEY") or input("Enter your LocationIQ API key: ")
+    try:
+        monitor_room(room_id, access_token, maps_api_key)
+    except KeyboardInterrupt:
+        print("\nStopped monitoring.")
+        client.print_report()
+        scheduler.print_metrics()
 
 
 if __name__ == "__main__":
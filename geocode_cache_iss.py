@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------------------------------------------
+# Reverse-geocode cache
+# The ISS often passes over the same region (or the same ocean) for
+# several requests in a row, so there is no need to ask LocationIQ every
+# time. Coordinates are snapped to a grid cell (plain lat/lon degrees or
+# a geohash) and the address found for that cell is reused for any
+# nearby point. Ocean answers are cached too, as "negative" entries.
+# The cache is an LRU with a TTL and a hard cap on entries. With a
+# persistent store attached (see store_iss.py), misses are looked up
+# there and new entries are written through, so restarts start warm.
+# -------------------------------------------------------------------
+
+# Only these address fields are kept, which keeps every entry small.
+KEEP_FIELDS = ("country_code", "country", "state", "city", "town", "ocean")
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision=4):
+    """Encode a coordinate as a geohash string of the given length."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def grid_cell(lat, lon, cell_size=0.25):
+    """Snap a coordinate to the (row, col) of a cell_size-degree grid."""
+    return (int((lat + 90) // cell_size), int((lon + 180) // cell_size))
+
+
+def is_negative(address):
+    """True for an 'ocean' answer, i.e. no country in the address."""
+    return not address.get("country_code")
+
+
+class GeoCache:
+    """LRU + TTL cache of reverse-geocode results keyed on a grid cell."""
+
+    def __init__(self, cell="grid", cell_size=0.25, precision=4, max_entries=5000,
+                 ttl=24 * 3600, negative_ttl=6 * 3600):
+        if cell not in ("grid", "geohash"):
+            raise ValueError("cell must be 'grid' or 'geohash'")
+        self.cell = cell
+        self.cell_size = cell_size
+        self.precision = precision
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = None
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "expired": 0,
+                      "store_hits": 0}
+
+    def use_store(self, store):
+        """Back the cache with a persistent Store (or None to stop using one)."""
+        self.store = store
+        return self
+
+    def store_key(self, key):
+        # Include the cell scheme so a change of grid size never reads old cells.
+        if self.cell == "geohash":
+            return f"geohash:{key}"
+        return f"grid:{self.cell_size}:{key[0]},{key[1]}"
+
+    def key(self, lat, lon):
+        """Return the cache key (cell) for a coordinate."""
+        lat, lon = float(lat), float(lon)
+        if self.cell == "geohash":
+            return geohash(lat, lon, self.precision)
+        return grid_cell(lat, lon, self.cell_size)
+
+    def get(self, lat, lon):
+        """Return the cached address for this cell, or None on a miss."""
+        key = self.key(lat, lon)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self.entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                address = entry[0]
+                self.entries.move_to_end(key)
+                if is_negative(address):
+                    self.stats["negative_hits"] += 1
+                else:
+                    self.stats["hits"] += 1
+                return dict(address)
+        return self._get_stored(key)
+
+    def peek(self, lat, lon):
+        """Return the in-memory address for this cell without counting a lookup, or None."""
+        with self.lock:
+            entry = self.entries.get(self.key(lat, lon))
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return dict(entry[0])
+
+    def _get_stored(self, key):
+        """Look a missed cell up in the persistent store and keep it in memory if found."""
+        stored = self.store.get_geocode(self.store_key(key)) if self.store is not None else None
+        with self.lock:
+            if stored is None:
+                self.stats["misses"] += 1
+                return None
+            address, expires = stored
+            self._insert(key, address, time.monotonic() + expires - time.time())
+            self.stats["store_hits"] += 1
+        return dict(address)
+
+    def _insert(self, key, address, expires):
+        # Called with self.lock held.
+        self.entries[key] = (address, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def put(self, lat, lon, address):
+        """Store the address found for this coordinate's cell."""
+        small = {k: address[k] for k in KEEP_FIELDS if k in address}
+        ttl = self.negative_ttl if is_negative(small) else self.ttl
+        key = self.key(lat, lon)
+        with self.lock:
+            self._insert(key, small, time.monotonic() + ttl)
+        if self.store is not None:
+            self.store.put_geocode(self.store_key(key), small, ttl)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def report(self):
+        """Return hit/miss counters plus the current size."""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self.entries)
+        found = stats["hits"] + stats["negative_hits"] + stats["store_hits"]
+        lookups = found + stats["misses"]
+        stats["hit_ratio"] = found / lookups if lookups else 0.0
+        return stats
+
+    def print_report(self):
+        r = self.report()
+        print(f"Geocode cache: {r['hits']} hits, {r['negative_hits']} ocean hits, {r['store_hits']} from the store, "
+              f"{r['misses']} misses ({r['hit_ratio']:.0%} hit), {r['size']} cells, "
+              f"{r['evictions']} evicted, {r['expired']} expired")
+
+
+# Shared cache used by reverse_geocode() in the bot scripts.
+geocode_cache = GeoCache()
@@ -0,0 +1,373 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from requests.exceptions import RequestException
+
+from http_client_iss import client
+
+# -------------------------------------------------------------------
+# Reverse-geocode providers with hedging and circuit breakers
+# Instead of always asking us1.locationiq.com, reverse_geocode() goes
+# through a GeoRouter that knows several providers: LocationIQ regions
+# (us1, eu1), Mapbox, and the offline index as a last resort. For each
+# provider it keeps a rolling window of latencies and errors and:
+#   * tries the provider that has recently been fastest and most
+#     reliable first,
+#   * if no answer has come back by that provider's p95 latency, sends
+#     the same lookup to the next provider as well ("hedging") and uses
+#     whichever answer arrives first,
+#   * moves straight on when a provider fails,
+#   * skips a provider whose circuit breaker is open (too many failures
+#     in a row) until its cool-down is over and a trial call succeeds.
+#
+#   GEOCODE_PROVIDERS=locationiq,locationiq-eu,mapbox,offline   (default: locationiq)
+#   MAPBOX_TOKEN=...     needed for the mapbox provider
+# -------------------------------------------------------------------
+
+LOCATIONIQ_REGIONS = {
+    "locationiq-us": "https://us1.locationiq.com/v1",
+    "locationiq-eu": "https://eu1.locationiq.com/v1",
+}
+MAPBOX_API = os.environ.get("MAPBOX_API_URL", "https://api.mapbox.com")
+
+
+def locationiq_request(base_url, lat, lon, api_key):
+    """Ask a LocationIQ endpoint for the address at these coordinates ({} means ocean, None an error)."""
+    try:
+        params = {"key": api_key, "lat": lat, "lon": lon, "format": "json"}
+        response = client.get(f"{base_url}/reverse.php", endpoint="geocode", params=params)
+        if response.status_code == 404 or "Unable to geocode" in response.text:
+            # Nothing on land here, so it's the ocean.
+            return {}
+        if response.status_code != 200:
+            print(f"Reverse geocoding failed ({response.status_code}).")
+            return None
+        return response.json().get("address", {})
+    except RequestException as e:
+        print(f"Error in reverse geocoding: {e}")
+        return None
+    except ValueError:
+        print("Could not decode JSON response from LocationIQ.")
+        return None
+
+
+class CircuitBreaker:
+    """Opens after `threshold` failures in a row; after `cooldown` seconds lets one trial call through."""
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def available(self):
+        """Whether allow() would let a call through right now, without taking the half-open trial."""
+        with self.lock:
+            state = self.state
+            return state == "closed" or (state == "half-open" and not self.trial_running)
+
+    def allow(self):
+        """Take permission for one call (the single trial call when half-open)."""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self.lock:
+            self.trial_running = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class Provider:
+    """One place addresses can come from, with its rolling latency / error record."""
+
+    fallback = False
+
+    def __init__(self, name, window=100):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.breaker = CircuitBreaker()
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "wins": 0}
+
+    def fetch(self, lat, lon, api_key):
+        raise NotImplementedError
+
+    def lookup(self, lat, lon, api_key):
+        """fetch() plus bookkeeping. Returns the address, {} for ocean, or None on an error."""
+        start = time.monotonic()
+        try:
+            address = self.fetch(lat, lon, api_key)
+        except Exception as e:
+            print(f"Geocoder {self.name} failed: {e}")
+            address = None
+        elapsed = time.monotonic() - start
+        ok = address is not None
+        with self.lock:
+            self.stats["calls"] += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(elapsed)
+            else:
+                self.stats["errors"] += 1
+        self.breaker.record(ok)
+        return address
+
+    def quantile(self, q, default):
+        with self.lock:
+            if len(self.latencies) < 5:
+                return default
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def error_rate(self):
+        with self.lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def score(self):
+        """Lower is better: typical latency, made worse by recent errors."""
+        return self.quantile(0.5, 0.5) * (1 + 4 * self.error_rate())
+
+
+class LocationIQProvider(Provider):
+    def __init__(self, name, base_url):
+        super().__init__(name)
+        # A callable is looked up on every call, so the bot's base URL can be changed at runtime.
+        self.base_url = base_url
+
+    def fetch(self, lat, lon, api_key):
+        if not api_key:
+            return None
+        base_url = self.base_url() if callable(self.base_url) else self.base_url
+        return locationiq_request(base_url, lat, lon, api_key)
+
+
+class MapboxProvider(Provider):
+    def __init__(self, token, name="mapbox", base_url=MAPBOX_API):
+        super().__init__(name)
+        self.token = token
+        self.base_url = base_url
+
+    def fetch(self, lat, lon, api_key):
+        try:
+            response = client.get(f"{self.base_url}/geocoding/v5/mapbox.places/{lon},{lat}.json",
+                                  endpoint="geocode",
+                                  params={"access_token": self.token, "types": "country,region,place"})
+            if response.status_code != 200:
+                print(f"Mapbox reverse geocoding failed ({response.status_code}).")
+                return None
+            features = response.json().get("features", [])
+        except (RequestException, ValueError) as e:
+            print(f"Error in Mapbox reverse geocoding: {e}")
+            return None
+        # No features means open water; otherwise map them onto LocationIQ's address fields.
+        address = {}
+        for feature in features:
+            kind = feature.get("place_type", [""])[0]
+            if kind == "country":
+                address["country_code"] = feature.get("properties", {}).get("short_code", "").lower()
+                address["country"] = feature.get("text", "")
+            elif kind == "region":
+                address["state"] = feature.get("text", "")
+            elif kind == "place":
+                address["city"] = feature.get("text", "")
+        return address
+
+
+class OfflineProvider(Provider):
+    """The local boundary index: always answers, only at country / state level."""
+
+    fallback = True
+
+    def __init__(self, get_geocoder, name="offline"):
+        super().__init__(name)
+        self.get_geocoder = get_geocoder
+
+    def fetch(self, lat, lon, api_key):
+        geocoder = self.get_geocoder()
+        return geocoder.lookup(lat, lon) if geocoder is not None else None
+
+
+class GeoRouter:
+    """Routes lookups to the best provider, hedging slow calls and skipping broken providers."""
+
+    def __init__(self, providers, hedge_quantile=0.95, first_deadline=1.0, min_hedge=0.05,
+                 max_parallel=2, workers=8):
+        self.providers = providers
+        self.hedge_quantile = hedge_quantile
+        self.first_deadline = first_deadline
+        self.min_hedge = min_hedge
+        self.max_parallel = max_parallel
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hedged": 0, "failovers": 0, "skipped": 0, "fallbacks": 0, "failed": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="geocode")
+            return self.executor
+
+    def ranked(self):
+        """Providers to try, best first, leaving out fallbacks and any whose breaker is open.
+
+        Ranking doesn't touch the breakers; allow() is only called right
+        before a provider is actually asked.
+        """
+        usable = []
+        for provider in self.providers:
+            if provider.fallback:
+                continue
+            if provider.breaker.available():
+                usable.append(provider)
+            else:
+                self._count("skipped")
+        return sorted(usable, key=lambda p: p.score())
+
+    def hedge_delay(self, provider):
+        return max(self.min_hedge, provider.quantile(self.hedge_quantile, self.first_deadline))
+
+    def lookup(self, lat, lon, api_key):
+        """The first good answer from any provider, or None if they all failed."""
+        self._count("lookups")
+        candidates = self.ranked()
+        if len(candidates) == 1:
+            # Nothing to hedge with; no need for a thread hop.
+            if candidates[0].breaker.allow():
+                address = candidates[0].lookup(lat, lon, api_key)
+                if address is not None:
+                    return self._won(candidates[0], address)
+            candidates = []
+        elif candidates:
+            address = self._race(candidates, lat, lon, api_key)
+            if address is not None:
+                return address
+
+        for provider in self.providers:
+            if provider.fallback and provider.breaker.allow():
+                address = provider.lookup(lat, lon, api_key)
+                if address is not None:
+                    self._count("fallbacks")
+                    return self._won(provider, address)
+        self._count("failed")
+        return None
+
+    def _won(self, provider, address):
+        with provider.lock:
+            provider.stats["wins"] += 1
+        return address
+
+    def _race(self, candidates, lat, lon, api_key):
+        pool = self._pool()
+        pending = {}
+        queue = list(candidates)
+
+        def launch():
+            # The next provider whose breaker still lets a call through, or None.
+            while queue:
+                provider = queue.pop(0)
+                if not provider.breaker.allow():
+                    self._count("skipped")
+                    continue
+                # Copy the context so the geocode span still sees the HTTP statuses.
+                context = contextvars.copy_context()
+                pending[pool.submit(context.run, provider.lookup, lat, lon, api_key)] = provider
+                return provider
+            return None
+
+        latest = launch()
+        while pending:
+            timeout = self.hedge_delay(latest) if queue and len(pending) < self.max_parallel else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slower than usual: ask the next provider too and take whichever answers first.
+                hedge = launch()
+                if hedge is not None:
+                    self._count("hedged")
+                    latest = hedge
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                address = future.result()
+                if address is not None:
+                    return self._won(provider, address)
+            if queue and len(pending) < self.max_parallel:
+                failover = launch()
+                if failover is not None:
+                    self._count("failovers")
+                    latest = failover
+        return None
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["providers"] = {
+            p.name: dict(p.stats, p50_ms=round(p.quantile(0.5, 0) * 1000, 1),
+                         p95_ms=round(p.quantile(0.95, 0) * 1000, 1),
+                         error_rate=round(p.error_rate(), 3), breaker=p.breaker.state)
+            for p in self.providers}
+        return stats
+
+    def print_report(self):
+        r = self.report()
+        print(f"Geocoding: {r['lookups']} lookups, {r['hedged']} hedged, {r['failovers']} failovers, "
+              f"{r['fallbacks']} offline fallbacks, {r['failed']} failed")
+        for name, p in r["providers"].items():
+            print(f"  {name}: {p['calls']} calls, {p['wins']} used, {p['errors']} errors, "
+                  f"p50 {p['p50_ms']} ms, p95 {p['p95_ms']} ms, breaker {p['breaker']}")
+
+
+def from_env(locationiq_url, get_geocoder):
+    """Build the router named by GEOCODE_PROVIDERS.
+
+    "locationiq" is the bot's configured LocationIQ endpoint (`locationiq_url`
+    may be a callable); "locationiq-us" / "locationiq-eu" are fixed regions.
+    """
+    names = [n.strip() for n in os.environ.get("GEOCODE_PROVIDERS", "locationiq").split(",") if n.strip()]
+    providers = []
+    for name in names:
+        if name == "locationiq":
+            providers.append(LocationIQProvider(name, locationiq_url))
+        elif name in LOCATIONIQ_REGIONS:
+            providers.append(LocationIQProvider(name, LOCATIONIQ_REGIONS[name]))
+        elif name == "mapbox":
+            if os.environ.get("MAPBOX_TOKEN"):
+                providers.append(MapboxProvider(os.environ["MAPBOX_TOKEN"]))
+            else:
+                print("GEOCODE_PROVIDERS lists mapbox but MAPBOX_TOKEN is not set; skipping it.")
+        elif name == "offline":
+            providers.append(OfflineProvider(get_geocoder))
+        else:
+            print(f"Unknown geocode provider {name!r}; skipping it.")
+    if not providers:
+        providers.append(LocationIQProvider("locationiq", locationiq_url))
+    return GeoRouter(providers)
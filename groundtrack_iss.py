@@ -0,0 +1,252 @@
+import calendar
+import math
+import threading
+import time
+from array import array
+
+import lazy_iss
+import propagator_iss
+from fallback_iss import describe_age
+
+np = lazy_iss.optional("numpy")  # imported on first use
+
+# -------------------------------------------------------------------
+# Ground track and pass prediction
+# Precomputes where the ISS will be over the next 24 hours (one point
+# every 30 s, about 3000 points in two float32 arrays) from the local
+# TLE, and buckets those points into a coarse lat/lon grid. "Where will
+# it be at T" is then an array lookup plus interpolation, and "next pass
+# within R km of a place" only has to check the few grid cells around
+# that place before refining the closest approach with the propagator.
+#
+# Bot commands handled here:
+#   /at 90          where the ISS will be in 90 minutes
+#   /at 18:30       where it will be at 18:30 UTC (today or tomorrow)
+#   /pass 51.5 -0.1 [km]   next time it passes within km (default 500)
+# -------------------------------------------------------------------
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_HOURS = 24
+DEFAULT_STEP = 30
+CELL_DEG = 5.0
+DEFAULT_PASS_KM = 500
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(lat, lon):
+    return (int((lat + 90) // CELL_DEG), int((lon + 180) // CELL_DEG) % int(360 / CELL_DEG))
+
+
+class GroundTrack:
+    """Precomputed ISS positions over a time window with a grid index."""
+
+    def __init__(self, propagator, start=None, hours=DEFAULT_HOURS, step=DEFAULT_STEP):
+        self.propagator = propagator
+        self.start = int(time.time() if start is None else start)
+        self.step = step
+        self.count = int(hours * 3600 // step) + 1
+        self.end = self.start + (self.count - 1) * step
+
+        timestamps = [self.start + k * step for k in range(self.count)]
+        track = propagator.positions(timestamps)
+        if np:
+            self.lat = np.asarray(track["lat"], dtype=np.float32)
+            self.lon = np.asarray(track["lon"], dtype=np.float32)
+        else:
+            self.lat = array("f", track["lat"])
+            self.lon = array("f", track["lon"])
+
+        # Grid cell -> sorted list of point indices in that cell.
+        self.grid = {}
+        for k in range(self.count):
+            self.grid.setdefault(_cell(float(self.lat[k]), float(self.lon[k])), []).append(k)
+
+    def covers(self, unix_time):
+        return self.start <= unix_time <= self.end
+
+    def position_at(self, unix_time):
+        """Interpolated {"lat", "lon", "timestamp"} at a time inside the window."""
+        if not self.covers(unix_time):
+            raise ValueError("time is outside the precomputed ground track")
+        offset = (unix_time - self.start) / self.step
+        k = min(int(offset), self.count - 2)
+        frac = offset - k
+        lat0, lat1 = float(self.lat[k]), float(self.lat[k + 1])
+        lon0, lon1 = float(self.lon[k]), float(self.lon[k + 1])
+        # Don't interpolate the long way round across the date line.
+        if lon1 - lon0 > 180:
+            lon1 -= 360
+        elif lon0 - lon1 > 180:
+            lon1 += 360
+        lon = lon0 + (lon1 - lon0) * frac
+        lon = (lon + 180) % 360 - 180
+        return {"lat": round(lat0 + (lat1 - lat0) * frac, 4), "lon": round(lon, 4),
+                "timestamp": int(unix_time)}
+
+    def _candidates(self, lat, lon, radius_km, first):
+        """Indices (>= first) whose grid cell is near enough to the point."""
+        # Pad by half a step of ground travel so a point between samples isn't missed.
+        pad_km = radius_km + 4 * self.step
+        dlat = pad_km / 111.0
+        rows = range(int((max(-90, lat - dlat) + 90) // CELL_DEG),
+                     int((min(90, lat + dlat) + 90) // CELL_DEG) + 1)
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + dlat))), 0.01)
+        dlon = min(180.0, pad_km / (111.0 * cos_lat))
+        cols_per_row = int(360 / CELL_DEG)
+        first_col = int((lon - dlon + 180) // CELL_DEG)
+        last_col = int((lon + dlon + 180) // CELL_DEG)
+        cols = {c % cols_per_row for c in range(first_col, last_col + 1)}
+
+        found = []
+        for row in rows:
+            for col in cols:
+                found.extend(k for k in self.grid.get((row, col), ()) if k >= first)
+        found.sort()
+        return found, pad_km
+
+    def next_pass(self, lat, lon, radius_km=DEFAULT_PASS_KM, after=None):
+        """Find the next time the ISS comes within radius_km of (lat, lon).
+
+        Returns {"start", "end", "closest", "distance_km"} or None if it
+        doesn't happen inside the precomputed window.
+        """
+        after = time.time() if after is None else after
+        first = max(0, int((after - self.start) // self.step))
+        candidates, pad_km = self._candidates(lat, lon, radius_km, first)
+
+        # Group consecutive samples into passes and take the first one that really gets close.
+        group = []
+        for k in candidates + [None]:
+            if group and (k is None or k != group[-1] + 1):
+                result = self._refine(group, lat, lon, radius_km, after)
+                if result:
+                    return result
+                group = []
+            if k is not None and haversine_km(lat, lon, float(self.lat[k]), float(self.lon[k])) <= pad_km:
+                group.append(k)
+        return None
+
+    def _refine(self, group, lat, lon, radius_km, after):
+        """Use the propagator to find the closest approach and the in-range window."""
+        lo = max(after, self.start + (group[0] - 1) * self.step)
+        hi = min(self.end, self.start + (group[-1] + 1) * self.step)
+
+        def distance(t):
+            p_lat, p_lon = self.propagator.lat_lon(t)
+            return haversine_km(lat, lon, p_lat, p_lon)
+
+        # Ternary search for the closest approach (the distance is unimodal over one pass).
+        a, b = lo, hi
+        while b - a > 1:
+            m1 = a + (b - a) / 3
+            m2 = b - (b - a) / 3
+            if distance(m1) < distance(m2):
+                b = m2
+            else:
+                a = m1
+        closest = (a + b) / 2
+        best = distance(closest)
+        if best > radius_km:
+            return None
+
+        # Binary search for when it comes into and goes out of range.
+        def edge(inside, outside):
+            while abs(outside - inside) > 1:
+                mid = (inside + outside) / 2
+                if distance(mid) <= radius_km:
+                    inside = mid
+                else:
+                    outside = mid
+            return inside
+
+        start = lo if distance(lo) <= radius_km else edge(closest, lo)
+        end = hi if distance(hi) <= radius_km else edge(closest, hi)
+        return {"start": int(start), "end": int(end), "closest": int(closest), "distance_km": round(best)}
+
+
+_track = {"track": None}
+_track_lock = threading.Lock()
+
+
+def get_track(now=None):
+    """Return the shared ground track, rebuilding it for a new TLE or once it's half used up."""
+    propagator = propagator_iss.get_propagator()
+    if propagator is None:
+        return None
+    now = time.time() if now is None else now
+    with _track_lock:
+        track = _track["track"]
+        if (track is None or track.propagator is not propagator
+                or now > track.start + DEFAULT_HOURS * 3600 / 2 or now < track.start):
+            track = GroundTrack(propagator, start=now)
+            _track["track"] = track
+        return track
+
+
+def parse_when(arg, now=None):
+    """Turn '90' (minutes from now) or '18:30' (UTC) into a Unix timestamp."""
+    now = time.time() if now is None else now
+    if ":" in arg:
+        hours, minutes = arg.split(":", 1)
+        hours, minutes = int(hours), int(minutes)
+        if not (0 <= hours < 24 and 0 <= minutes < 60):
+            raise ValueError("bad time of day")
+        today = time.gmtime(now)
+        when = calendar.timegm((today.tm_year, today.tm_mon, today.tm_mday, hours, minutes, 0))
+        # A time of day that has gone by today means tomorrow; the current minute means now.
+        return when + 86400 if when + 60 <= now else max(when, now)
+    return now + float(arg.lstrip("+")) * 60
+
+
+def handle_track_command(text, describe=None):
+    """Answer a /at or /pass command. Returns the reply text, or None if it isn't one.
+
+    `describe(lat, lon, timestamp)` turns a position into a sentence (e.g.
+    reverse geocode + format_iss_message); without it only coordinates are shown.
+    """
+    parts = text.split()
+    if not parts or parts[0] not in ("/at", "/pass"):
+        return None
+
+    track = get_track()
+    if track is None:
+        return "Predictions need a local TLE file. Run: python propagator_iss.py refresh"
+
+    if parts[0] == "/at":
+        if len(parts) != 2:
+            return "Use /at <minutes> or /at <HH:MM> (UTC), e.g. /at 90"
+        now = time.time()
+        try:
+            when = parse_when(parts[1], now)
+        except ValueError:
+            return "Use /at <minutes> or /at <HH:MM> (UTC), e.g. /at 90"
+        if when < now:
+            return "That is in the past: /at only predicts ahead. Use /0 for where the ISS is now."
+        if not track.covers(when):
+            return f"I can only predict up to {describe_age(max(0, track.end - now))} ahead."
+        pos = track.position_at(when)
+        if describe is not None:
+            return describe(pos["lat"], pos["lon"], pos["timestamp"])
+        return f"At {time.ctime(pos['timestamp'])}, the ISS will be at ({pos['lat']}°, {pos['lon']}°)."
+
+    try:
+        lat, lon = float(parts[1]), float(parts[2])
+        radius = float(parts[3]) if len(parts) > 3 else DEFAULT_PASS_KM
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180 and radius > 0):
+            raise ValueError
+    except (IndexError, ValueError):
+        return "Use /pass <lat> <lon> [km], e.g. /pass 51.5 -0.12 500"
+
+    found = track.next_pass(lat, lon, radius)
+    if found is None:
+        return f"The ISS doesn't pass within {radius:g} km of ({lat}°, {lon}°) in the next few hours."
+    return (f"Next ISS pass within {radius:g} km of ({lat}°, {lon}°): "
+            f"from {time.ctime(found['start'])} to {time.ctime(found['end'])}, "
+            f"closest ({found['distance_km']} km) at {time.ctime(found['closest'])}.")
@@ -0,0 +1,411 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import lazy_iss
+
+iso3166 = lazy_iss.module("iso3166")
+np = lazy_iss.optional("numpy")  # without numpy, plain arrays and loops are used instead
+
+# -------------------------------------------------------------------
+# ISS position history
+# Every fix fetched from open-notify is appended to a small columnar
+# store: one directory, one set of files per UTC day, one file per
+# column (t as uint32, lat / lon as float32, country as a uint16 index
+# into countries.json), 14 bytes per fix. A fix whose country isn't
+# known yet is stored as "?" (not "", which is the ocean) and tagged
+# once its reverse geocode comes back. Appends are buffered and
+# written every minute or so. Queries only read the days they cover and
+# go through them a day at a time, so memory stays flat however many
+# months are kept; days older than max_days are deleted.
+#
+#   SPACEBOT_HISTORY=history/        record every fix into this directory
+#   SPACEBOT_HISTORY_SAMPLE=1        also sample the position every N seconds
+#   SPACEBOT_HISTORY_READONLY=1      only read it (set for all but one worker
+#                                    process, so a single writer appends)
+#
+# Bot command:
+#   /over France [today|6h|7d]    how long the ISS spent over a country
+#   python history_iss.py stats history/
+# -------------------------------------------------------------------
+
+# Column name -> array typecode.
+COLUMNS = {"t": "I", "lat": "f", "lon": "f", "cc": "H"}
+NUMPY_TYPES = {"I": "<u4", "f": "<f4", "H": "<u2"}
+DAY = 86400
+UNKNOWN = "?"   # country code of a fix that hasn't been placed (yet)
+
+
+def day_name(unix_time):
+    return time.strftime("%Y%m%d", time.gmtime(unix_time))
+
+
+def _chunk_length(columns):
+    return min(len(values) for values in columns.values())
+
+
+class HistoryRecorder:
+    """Append-only (timestamp, lat, lon, country) history split into daily column files."""
+
+    def __init__(self, directory, max_days=400, flush_every=60, max_gap=30, read_only=False):
+        self.directory = directory
+        # Another process writes the files: record() does nothing and the country list is re-read when it changes.
+        self.read_only = read_only
+        self.max_days = max_days
+        self.flush_every = flush_every
+        # A gap longer than this (e.g. while the bot was down) is not counted as time over anywhere.
+        self.max_gap = max_gap
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.codes_mtime = None
+        self.codes = self._load_codes()
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        self.day = None
+        self.buffers = {name: array(code) for name, code in COLUMNS.items()}
+        self.last_time = None
+
+    def _path(self, day, column):
+        return os.path.join(self.directory, f"{day}.{column}")
+
+    def _load_codes(self):
+        path = os.path.join(self.directory, "countries.json")
+        try:
+            self.codes_mtime = os.stat(path).st_mtime_ns
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return [""]    # index 0: ocean / unknown
+
+    def _reload_codes(self):
+        # Read-only recorders: pick up countries the writer has added since.
+        try:
+            mtime = os.stat(os.path.join(self.directory, "countries.json")).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self.codes_mtime:
+            with self.lock:
+                self.codes = self._load_codes()
+                self.code_index = {code: i for i, code in enumerate(self.codes)}
+
+    def _code(self, country_code):
+        # Called with self.lock held.
+        country_code = (country_code or "").upper()
+        if country_code not in self.code_index:
+            self.code_index[country_code] = len(self.codes)
+            self.codes.append(country_code)
+            # Write a new file and swap it in, so readers never see half a list.
+            path = os.path.join(self.directory, "countries.json")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.codes, f)
+            os.replace(path + ".tmp", path)
+        return self.code_index[country_code]
+
+    def record(self, timestamp, lat, lon, country_code=""):
+        """Add one fix. Fixes that are not newer than the last one (or any, when read-only) are ignored."""
+        if self.read_only:
+            return False
+        timestamp = int(timestamp)
+        with self.lock:
+            if self.last_time is None:
+                self.last_time = self._last_stored_time(day_name(timestamp))
+            if timestamp <= self.last_time:
+                return False
+            day = day_name(timestamp)
+            if day != self.day:
+                self._flush()
+                self.day = day
+                self._prune(timestamp)
+            self.buffers["t"].append(timestamp)
+            self.buffers["lat"].append(float(lat))
+            self.buffers["lon"].append(float(lon))
+            self.buffers["cc"].append(self._code(country_code))
+            self.last_time = timestamp
+            if len(self.buffers["t"]) >= self.flush_every:
+                self._flush()
+        return True
+
+    def tag(self, timestamp, country_code):
+        """Set the country of the fix at `timestamp` if it is still UNKNOWN. Returns whether it was."""
+        if self.read_only:
+            return False
+        timestamp = int(timestamp)
+        day = day_name(timestamp)
+        with self.lock:
+            unknown = self.code_index.get(UNKNOWN)
+            if unknown is None:
+                return False
+            if day == self.day:
+                t = self.buffers["t"]
+                i = bisect_left(t, timestamp)
+                if i < len(t) and t[i] == timestamp:
+                    if self.buffers["cc"][i] != unknown:
+                        return False
+                    self.buffers["cc"][i] = self._code(country_code)
+                    return True
+            return self._tag_stored(day, timestamp, unknown, country_code)
+
+    def _tag_stored(self, day, timestamp, unknown, country_code):
+        # Called with self.lock held: overwrite the country of a fix that has been flushed already.
+        try:
+            with open(self._path(day, "t"), "rb") as f:
+                t = array("I", f.read())
+            i = bisect_left(t, timestamp)
+            if i == len(t) or t[i] != timestamp:
+                return False
+            size = array("H").itemsize
+            with open(self._path(day, "cc"), "r+b") as f:
+                f.seek(i * size)
+                if array("H", f.read(size)) != array("H", [unknown]):
+                    return False
+                f.seek(i * size)
+                array("H", [self._code(country_code)]).tofile(f)
+        except OSError:
+            return False
+        return True
+
+    def _last_stored_time(self, day):
+        try:
+            with open(self._path(day, "t"), "rb") as f:
+                f.seek(-4, os.SEEK_END)
+                return array("I", f.read(4))[0]
+        except OSError:
+            return 0
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        # Called with self.lock held.
+        if self.day is None or not self.buffers["t"]:
+            return
+        for name, values in self.buffers.items():
+            with open(self._path(self.day, name), "ab") as f:
+                values.tofile(f)
+            self.buffers[name] = array(COLUMNS[name])
+
+    def _prune(self, now):
+        oldest = day_name(now - self.max_days * DAY)
+        for name in os.listdir(self.directory):
+            day, _, column = name.partition(".")
+            if column in COLUMNS and day.isdigit() and day < oldest:
+                os.remove(os.path.join(self.directory, name))
+
+    def days(self):
+        return sorted({name.split(".")[0] for name in os.listdir(self.directory)
+                       if name.endswith(".t") and name[:-2].isdigit()})
+
+    def _read_day(self, day):
+        columns = {}
+        for name, code in COLUMNS.items():
+            path = self._path(day, name)
+            if np:
+                columns[name] = np.fromfile(path, dtype=NUMPY_TYPES[code]) if os.path.exists(path) \
+                    else np.zeros(0, dtype=NUMPY_TYPES[code])
+            else:
+                values = array(code)
+                try:
+                    with open(path, "rb") as f:
+                        values.frombytes(f.read())
+                except OSError:
+                    pass
+                columns[name] = values
+        # A crash mid-flush can leave one column a row longer than the others.
+        n = _chunk_length(columns)
+        return {name: values[:n] for name, values in columns.items()}
+
+    def chunks(self, start, end):
+        """Yield the stored columns for start <= t < end, one day at a time."""
+        if self.read_only:
+            self._reload_codes()
+        self.flush()
+        first, last = day_name(start), day_name(max(start, end - 1))
+        for day in self.days():
+            if not first <= day <= last:
+                continue
+            columns = self._read_day(day)
+            t = columns["t"]
+            if np:
+                lo, hi = np.searchsorted(t, start), np.searchsorted(t, end)
+            else:
+                lo, hi = bisect_left(t, start), bisect_left(t, end)
+            if hi > lo:
+                yield {name: values[lo:hi] for name, values in columns.items()}
+
+    def query(self, start, end):
+        """All fixes with start <= t < end as a list of (t, lat, lon, country code)."""
+        rows = []
+        for chunk in self.chunks(start, end):
+            for t, lat, lon, cc in zip(chunk["t"], chunk["lat"], chunk["lon"], chunk["cc"]):
+                rows.append((int(t), round(float(lat), 4), round(float(lon), 4), self.codes[int(cc)]))
+        return rows
+
+    def time_by_country(self, start, end):
+        """Seconds spent over each country code ("" for ocean) between start and end, plus fix count.
+
+        Each fix owns the time until the next one, capped at max_gap.
+        """
+        totals = {}
+        fixes = 0
+        prev_t = prev_cc = None
+        for chunk in self.chunks(start, end):
+            t, cc = chunk["t"], chunk["cc"]
+            fixes += len(t)
+            if np:
+                times = t.astype(np.int64)
+                owners = cc
+                if prev_t is not None:
+                    times = np.concatenate(([prev_t], times))
+                    owners = np.concatenate(([prev_cc], cc)).astype(cc.dtype)
+                gaps = np.minimum(np.diff(times), self.max_gap)
+                sums = np.bincount(owners[:-1], weights=gaps, minlength=len(self.codes))
+                for i in np.flatnonzero(sums):
+                    totals[self.codes[i]] = totals.get(self.codes[i], 0.0) + float(sums[i])
+            else:
+                for i in range(len(t)):
+                    if prev_t is not None:
+                        code = self.codes[prev_cc]
+                        totals[code] = totals.get(code, 0.0) + min(t[i] - prev_t, self.max_gap)
+                    prev_t, prev_cc = t[i], cc[i]
+            prev_t, prev_cc = int(t[-1]), int(cc[-1])
+        if prev_t is not None:
+            # The last fix owns the time up to the end of the window (or now), again capped.
+            code = self.codes[prev_cc]
+            tail = max(0.0, min(end, time.time()) - prev_t)
+            totals[code] = totals.get(code, 0.0) + min(tail, self.max_gap)
+        return totals, fixes
+
+    def stats(self):
+        days = self.days()
+        size = sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+        fixes = sum(os.path.getsize(self._path(day, "t")) // 4 for day in days)
+        return {"days": len(days), "fixes": fixes, "bytes": size}
+
+
+def start_sampler(fetch, interval):
+    """Call fetch() every `interval` seconds on a daemon thread (fetch records and places the fix)."""
+    def run():
+        while True:
+            started = time.monotonic()
+            try:
+                fetch()
+            except Exception as e:
+                print(f"Error sampling the ISS position: {e}")
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    thread = threading.Thread(target=run, daemon=True, name="history-sampler")
+    thread.start()
+    return thread
+
+
+_recorder = {"recorder": None, "sampler": None}
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Return the shared recorder for SPACEBOT_HISTORY, or None when history is off."""
+    directory = os.environ.get("SPACEBOT_HISTORY")
+    if not directory:
+        return None
+    with _recorder_lock:
+        if _recorder["recorder"] is None:
+            read_only = os.environ.get("SPACEBOT_HISTORY_READONLY", "") not in ("", "0")
+            _recorder["recorder"] = HistoryRecorder(directory, read_only=read_only)
+        return _recorder["recorder"]
+
+
+def start_from_env(fetch):
+    """Start the background sampler if SPACEBOT_HISTORY and SPACEBOT_HISTORY_SAMPLE are set."""
+    interval = float(os.environ.get("SPACEBOT_HISTORY_SAMPLE") or 0)
+    recorder = get_recorder()
+    if interval <= 0 or recorder is None or recorder.read_only:
+        return None
+    with _recorder_lock:
+        if _recorder["sampler"] is None:
+            _recorder["sampler"] = start_sampler(fetch, interval)
+        return _recorder["sampler"]
+
+
+def parse_window(arg, now):
+    """'today' (since 00:00 UTC), '6h' or '7d' -> (start, label)."""
+    if arg == "today":
+        return now - now % DAY, "Today"
+    match = re.fullmatch(r"(\d+)([hd])", arg)
+    if not match:
+        raise ValueError(arg)
+    count, unit = int(match.group(1)), match.group(2)
+    label = f"In the last {count} {'hour' if unit == 'h' else 'day'}{'s' if count != 1 else ''}"
+    return now - count * (3600 if unit == "h" else DAY), label
+
+
+def parse_country(name):
+    """A 2-letter code, 3-letter code or country name -> (alpha-2 code, display name)."""
+    if name.lower() in ("ocean", "sea", "water"):
+        return "", "the ocean"
+    try:
+        country = iso3166.countries.get(name)
+    except KeyError:
+        # Let "United Kingdom" or "bolivia" find the full ISO name.
+        matches = [c for c in iso3166.countries if c.name.lower().startswith(name.lower())
+                   or c.apolitical_name.lower().startswith(name.lower())]
+        if not matches:
+            raise
+        country = matches[0]
+    return country.alpha2, country.name
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{int(seconds)} s"
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60} h {minutes % 60} min"
+
+
+def handle_history_command(text, recorder=None, now=None):
+    """Answer a /over command. Returns the reply text, or None if it isn't one."""
+    parts = text.split()
+    if not parts or parts[0] != "/over":
+        return None
+    usage = "Use /over <country> [today|6h|7d], e.g. /over France today"
+    recorder = recorder or get_recorder()
+    if recorder is None:
+        return "Position history is not being recorded. Set SPACEBOT_HISTORY to turn it on."
+    if len(parts) < 2:
+        return usage
+
+    now = time.time() if now is None else now
+    window = "today"
+    if len(parts) > 2 and (parts[-1] == "today" or re.fullmatch(r"\d+[hd]", parts[-1])):
+        window = parts.pop()
+    try:
+        start, label = parse_window(window, now)
+        code, name = parse_country(" ".join(parts[1:]))
+    except (KeyError, ValueError):
+        return usage
+
+    totals, fixes = recorder.time_by_country(start, now)
+    if not fixes:
+        return "No position history has been recorded for that period yet."
+    unknown = totals.get(UNKNOWN, 0.0)
+    note = f"; for {format_duration(unknown)} of that time the country is not known" if unknown >= 1 else ""
+    return (f"{label} the ISS spent {format_duration(totals.get(code, 0.0))} over {name} "
+            f"(from {fixes} recorded positions{note}).")
+
+
+def main(argv):
+    if len(argv) != 2 or argv[0] != "stats":
+        print("Usage: python history_iss.py stats <directory>")
+        return
+    s = HistoryRecorder(argv[1]).stats()
+    print(f"{argv[1]}: {s['fixes']} positions over {s['days']} day(s), {s['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# -------------------------------------------------------------------
+# Pooled HTTP client
+# One keep-alive requests.Session per host (webexapis.com, open-notify,
+# locationiq.com), each with its own connection pool, so the bot stops
+# paying a new TCP + TLS handshake on every poll. Every connect() is
+# timed, which lets the client report how often a pooled connection was
+# reused and roughly how much handshake time that saved.
+# -------------------------------------------------------------------
+
+# Base URLs can be pointed somewhere else (e.g. a local stand-in) from the environment.
+WEBEX_API = os.environ.get("WEBEX_API_URL", "https://webexapis.com/v1")
+ISS_API = os.environ.get("ISS_API_URL", "http://api.open-notify.org")
+LOCATIONIQ_API = os.environ.get("LOCATIONIQ_API_URL", "https://us1.locationiq.com/v1")
+
+# (connect, read) timeouts in seconds for each kind of call.
+DEFAULT_TIMEOUTS = {
+    "rooms": (3.05, 10),
+    "messages": (3.05, 5),
+    "post_message": (3.05, 10),
+    "people": (3.05, 10),
+    "webhooks": (3.05, 10),
+    "iss": (3.05, 5),
+    "geocode": (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+def _counting_pool_classes(record_connect):
+    """Build pool classes whose connections report how long connect() took."""
+
+    class CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            record_connect(time.perf_counter() - start)
+
+    class CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            record_connect(time.perf_counter() - start)
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+
+class HttpClient:
+    """Keep-alive HTTP client with one connection pool per host."""
+
+    def __init__(self, pool_connections=4, pool_maxsize=10, pool_sizes=None, timeouts=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # Optional per-host override of pool_maxsize, e.g. {"webexapis.com": 50}.
+        self.pool_sizes = dict(pool_sizes or {})
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+
+        self.sessions = {}
+        # Functions called with every response, e.g. to spot 429 rate limiting.
+        self.response_hooks = []
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "connections": 0, "connect_time": 0.0}
+
+    def _record_connect(self, seconds):
+        with self.lock:
+            self.stats["connections"] += 1
+            self.stats["connect_time"] += seconds
+
+    def session_for(self, url):
+        """Return the shared session for the host in `url`, creating it on first use."""
+        host = urlsplit(url).hostname
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                      pool_maxsize=self.pool_sizes.get(host, self.pool_maxsize))
+                adapter.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self._record_connect)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[host] = session
+        return session
+
+    def request(self, method, url, endpoint=None, **kwargs):
+        """Send a request through the pooled session, using the endpoint's timeout."""
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, DEFAULT_TIMEOUT))
+        session = self.session_for(url)
+        with self.lock:
+            self.stats["requests"] += 1
+        response = session.request(method, url, **kwargs)
+        # Lets the hooks tell Webex calls from the others.
+        response.endpoint = endpoint
+        for hook in self.response_hooks:
+            hook(response)
+        return response
+
+    def get(self, url, endpoint=None, **kwargs):
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url, endpoint=None, **kwargs):
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    def report(self):
+        """Summarise connection reuse and the handshake time it saved."""
+        with self.lock:
+            requests_sent = self.stats["requests"]
+            connections = self.stats["connections"]
+            connect_time = self.stats["connect_time"]
+
+        reused = max(0, requests_sent - connections)
+        avg_connect = connect_time / connections if connections else 0.0
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections,
+            "connections_reused": reused,
+            "reuse_ratio": reused / requests_sent if requests_sent else 0.0,
+            "avg_handshake_ms": avg_connect * 1000,
+            "handshake_saved_ms": reused * avg_connect * 1000,
+        }
+
+    def print_report(self):
+        """Print the connection reuse report."""
+        r = self.report()
+        print(f"HTTP requests: {r['requests']}, connections opened: {r['connections_opened']}, "
+              f"reused: {r['connections_reused']} ({r['reuse_ratio']:.0%})")
+        print(f"Average handshake: {r['avg_handshake_ms']:.1f} ms, "
+              f"handshake time saved: {r['handshake_saved_ms']:.0f} ms")
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+
+# Shared client used by all the API helpers.
+client = HttpClient()
@@ -0,0 +1,69 @@
+import importlib
+import threading
+
+# -------------------------------------------------------------------
+# Lazy imports
+# NumPy alone takes longer to import than the rest of the bot, and most
+# runs (and every freshly spawned worker) never reach the code that
+# uses it. Modules that only need a heavy dependency on some paths keep
+# a LazyModule in its place: nothing is imported until the first
+# attribute is looked up. For optional dependencies the object is falsy
+# when the module is not installed, so
+#
+#   np = lazy_iss.optional("numpy")
+#   if np:
+#       ...vectorised path...
+#
+# replaces the usual try: import numpy / except ImportError: np = None.
+# -------------------------------------------------------------------
+
+
+class LazyModule:
+    """Imports `name` on first use."""
+
+    def __init__(self, name, optional=False):
+        self._name = name
+        self._optional = optional
+        self._module = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._module = importlib.import_module(self._name)
+                    except ImportError:
+                        if not self._optional:
+                            raise
+                    if self._module is not None:
+                        # Later lookups find the attributes directly, without __getattr__.
+                        self.__dict__.update((k, v) for k, v in vars(self._module).items()
+                                             if not k.startswith("_"))
+                    self._loaded = True
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        module = self._load()
+        if module is None:
+            raise AttributeError(f"{self._name} is not installed")
+        return getattr(module, attr)
+
+    def __bool__(self):
+        return self._load() is not None
+
+    def __repr__(self):
+        state = "loaded" if self._loaded else "not loaded yet"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def module(name):
+    return LazyModule(name)
+
+
+def optional(name):
+    """A lazy module that is falsy (instead of raising) when it isn't installed."""
+    return LazyModule(name, optional=True)
@@ -0,0 +1,207 @@
+import re
+import threading
+import time
+
+import fallback_iss
+import formatter_iss
+
+# -------------------------------------------------------------------
+# Live tracking
+# Rooms can subscribe to ISS updates instead of sending /N every time:
+#   /subscribe            the position every 10 minutes
+#   /subscribe 30m        every 30 minutes (also 90s, 2h; a bare number is minutes)
+#   /subscribe country    whenever the ISS crosses into a new country
+#   /unsubscribe          stop
+# All subscriptions are fed by one position stream: a single thread
+# takes one fix (from the local propagator, or open-notify) and
+# at most one reverse geocode per tick, and fans the message out to
+# every room that is due. Upstream calls depend on the tick rate, not
+# on how many rooms subscribe. The stream only runs while there are
+# subscribers, and subscriptions are kept in the store across restarts.
+# -------------------------------------------------------------------
+
+DEFAULT_EVERY = 600
+MIN_EVERY = 60
+COUNTRY_CHECK = 15
+USAGE = "Use /subscribe [minutes|30m|2h|country] or /unsubscribe"
+
+
+def parse_every(arg):
+    """'30m', '90s', '2h' or a bare number of minutes -> seconds."""
+    match = re.fullmatch(r"(\d+)\s*([smh]?)", arg.strip().lower())
+    if not match:
+        raise ValueError(arg)
+    return int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "": 60}[match.group(2)]
+
+
+def describe_every(seconds):
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60} min"
+    return f"{seconds} s"
+
+
+class Subscription:
+    def __init__(self, room_id, access_token, maps_api_key, mode="interval", every=DEFAULT_EVERY):
+        self.room_id = room_id
+        self.access_token = access_token
+        self.maps_api_key = maps_api_key
+        self.mode = mode        # "interval" or "country"
+        self.every = every
+        self.last_sent = 0.0
+
+
+class Tracker:
+    """One shared ISS position stream, fanned out to subscribed rooms."""
+
+    def __init__(self, locate, geocode, format_message, send, store=None):
+        self.locate = locate                    # () -> {"lat", "lon", "timestamp"} or None
+        self.geocode = geocode                  # (lat, lon, api_key) -> address or None
+        self.format_message = format_message    # (lat, lon, timestamp, address) -> text
+        self.send = send                        # (room_id, text, access_token)
+        self.store = store
+        self.subscriptions = {}                 # room id -> Subscription
+        self.last_country = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.stats = {"ticks": 0, "fixes": 0, "geocodes": 0, "sent": 0, "crossings": 0}
+
+    def use_store(self, store):
+        self.store = store
+
+    def _save(self, room_id):
+        # Called with self.lock held.
+        if self.store is not None:
+            sub = self.subscriptions.get(room_id)
+            self.store.save_subscription(room_id, None if sub is None else {"mode": sub.mode, "every": sub.every})
+
+    def subscribe(self, room_id, access_token, maps_api_key, mode="interval", every=DEFAULT_EVERY):
+        sub = Subscription(room_id, access_token, maps_api_key, mode, every)
+        # The first update goes out a moment after the "Subscribed" reply, not before it.
+        sub.last_sent = time.time() - every + 1
+        with self.lock:
+            self.subscriptions[room_id] = sub
+            self._save(room_id)
+        self._start()
+
+    def unsubscribe(self, room_id):
+        with self.lock:
+            found = self.subscriptions.pop(room_id, None) is not None
+            if found:
+                self._save(room_id)
+        return found
+
+    def resume(self, room_id, access_token, maps_api_key):
+        """Bring back a room's saved subscription once we have its token again (e.g. after a restart)."""
+        if self.store is None:
+            return False
+        saved = self.store.get_subscription(room_id)
+        with self.lock:
+            if saved is None or room_id in self.subscriptions:
+                return False
+            sub = Subscription(room_id, access_token, maps_api_key, saved["mode"], saved["every"])
+            # Don't post straight away just because the bot restarted.
+            sub.last_sent = time.time()
+            self.subscriptions[room_id] = sub
+        self._start()
+        return True
+
+    def handle_command(self, text, context):
+        """Answer /subscribe or /unsubscribe for the room in `context`."""
+        parts = text.split(maxsplit=1)
+        if parts[0] == "/unsubscribe":
+            if self.unsubscribe(context.room_id):
+                return "Unsubscribed. No more ISS updates for this room."
+            return "This room isn't subscribed."
+        arg = parts[1].strip().lower() if len(parts) > 1 else ""
+        if arg == "country":
+            self.subscribe(context.room_id, context.access_token, context.maps_api_key, mode="country")
+            return "Subscribed: I'll post whenever the ISS crosses into a new country. Send /unsubscribe to stop."
+        try:
+            every = parse_every(arg) if arg else DEFAULT_EVERY
+        except ValueError:
+            return USAGE
+        if every < MIN_EVERY:
+            return f"The shortest interval is {describe_every(MIN_EVERY)}."
+        self.subscribe(context.room_id, context.access_token, context.maps_api_key, every=every)
+        return f"Subscribed: I'll post the ISS position every {describe_every(every)}. Send /unsubscribe to stop."
+
+    def _start(self):
+        with self.lock:
+            self.wake.set()
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, daemon=True, name="livetrack")
+            self.thread.start()
+
+    def next_delay(self, now):
+        """Seconds until the next subscription is due (or the next country check)."""
+        with self.lock:
+            subs = list(self.subscriptions.values())
+        delays = [max(0.0, s.last_sent + s.every - now) for s in subs if s.mode == "interval"]
+        if any(s.mode == "country" for s in subs):
+            delays.append(COUNTRY_CHECK)
+        return max(1.0, min(delays)) if delays else None
+
+    def _run(self):
+        while True:
+            self.wake.clear()
+            try:
+                self.tick(time.time())
+            except Exception as e:
+                print(f"Error in live tracking: {e}")
+            delay = self.next_delay(time.time())
+            with self.lock:
+                if not self.subscriptions:
+                    # Nobody is subscribed any more; the next subscribe() starts a new thread.
+                    self.thread = None
+                    return
+            self.wake.wait(delay)
+
+    def tick(self, now):
+        """Take one fix if anyone needs it and send it to every room that is due."""
+        with self.lock:
+            subs = list(self.subscriptions.values())
+        due = [s for s in subs if s.mode == "interval" and now >= s.last_sent + s.every - 0.5]
+        watchers = [s for s in subs if s.mode == "country"]
+        if not due and not watchers:
+            return
+        self.stats["ticks"] += 1
+
+        iss = self.locate()
+        if not iss:
+            return
+        self.stats["fixes"] += 1
+        key = next((s.maps_api_key for s in subs if s.maps_api_key), "")
+        address = self.geocode(iss["lat"], iss["lon"], key)
+        if address is not None:
+            self.stats["geocodes"] += 1
+        # Without an address (or with only an estimated position) rooms still get the coordinates.
+        text = self.format_message(iss["lat"], iss["lon"], iss["timestamp"], address)
+        text += fallback_iss.staleness_note(iss)
+
+        crossed = False
+        if address is not None and not iss.get("age"):
+            # Only a real fix with a real address can say the ISS changed country.
+            country = address.get("country_code", "").lower()
+            crossed = bool(country) and self.last_country is not None and country != self.last_country
+            self.last_country = country
+        for sub in due:
+            sub.last_sent = now
+            self._send(sub, text)
+        if crossed:
+            self.stats["crossings"] += 1
+            crossing = f"The ISS just crossed into {formatter_iss.country_name(country)}.\n{text}"
+            for sub in watchers:
+                self._send(sub, crossing)
+
+    def _send(self, sub, text):
+        self.stats["sent"] += 1
+        self.send(sub.room_id, text, sub.access_token)
+
+    def print_report(self):
+        s = self.stats
+        print(f"Live tracking: {len(self.subscriptions)} subscribed room(s), {s['fixes']} fixes, "
+              f"{s['geocodes']} geocodes, {s['sent']} updates sent, {s['crossings']} border crossings")
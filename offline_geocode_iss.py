@@ -0,0 +1,324 @@
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+
+import lazy_iss
+
+np = lazy_iss.optional("numpy")  # without numpy, the pure Python point-in-polygon test is used instead
+
+# -------------------------------------------------------------------
+# Offline reverse geocoder
+# Answers "which country / state / ocean is under this point" from a
+# local boundary dataset instead of asking LocationIQ. A GeoJSON file of
+# country (or state) polygons, e.g. Natural Earth admin-0 / admin-1, is
+# compiled once into a flat binary index file. At startup that file is
+# memory-mapped, so nothing is parsed or copied, and a 1-degree grid
+# over the polygon bounding boxes narrows each lookup to a handful of
+# candidates before the point-in-polygon test runs (vectorised with
+# NumPy when it is installed).
+#
+#   python offline_geocode_iss.py compile countries.geojson countries.idx --layer country
+#   python offline_geocode_iss.py compile states.geojson states.idx --layer state
+#   python offline_geocode_iss.py lookup countries.idx,states.idx 51.5 -0.12
+#
+# Set OFFLINE_GEOCODE_INDEX to a comma separated list of index files to
+# make reverse_geocode() use them.
+# -------------------------------------------------------------------
+
+MAGIC = b"ISSGEO1\0"
+# feature, polygon, is_hole, start, count, min_lon, min_lat, max_lon, max_lat
+RING_FIELDS = 9
+GRID_SIZE = 1.0
+
+COUNTRY_CODE_KEYS = ("ISO_A2", "iso_a2", "ISO3166-1-Alpha-2", "country_code")
+COUNTRY_NAME_KEYS = ("ADMIN", "admin", "NAME", "name", "country")
+STATE_NAME_KEYS = ("name", "NAME", "state")
+
+# Very coarse ocean boxes, checked in order, for points on no polygon.
+OCEANS = [
+    ("Arctic Ocean", 66.0, 90.0, -180.0, 180.0),
+    ("Southern Ocean", -90.0, -60.0, -180.0, 180.0),
+    ("Atlantic Ocean", -60.0, 66.0, -70.0, 20.0),
+    ("Indian Ocean", -60.0, 30.0, 20.0, 147.0),
+    ("Pacific Ocean", -60.0, 66.0, -180.0, 180.0),
+]
+
+
+def ocean_name(lat, lon):
+    """Name the ocean a point is (roughly) in."""
+    for name, min_lat, max_lat, min_lon, max_lon in OCEANS:
+        if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+            return name
+    return "Pacific Ocean"
+
+
+def _first(props, keys):
+    for key in keys:
+        value = props.get(key)
+        if value and value != "-99":
+            return value
+    return None
+
+
+def feature_address(props, layer):
+    """Pick out the address fields LocationIQ would return for a feature."""
+    address = {}
+    code = _first(props, COUNTRY_CODE_KEYS)
+    if code:
+        address["country_code"] = code.lower()
+    if layer == "state":
+        state = _first(props, STATE_NAME_KEYS)
+        country = _first(props, ("ADMIN", "admin", "country"))
+        if state:
+            address["state"] = state
+    else:
+        country = _first(props, COUNTRY_NAME_KEYS)
+    if country:
+        address["country"] = country
+    return address
+
+
+def compile_index(geojson_path, out_path, layer="country"):
+    """Compile a GeoJSON file of (multi)polygons into a binary index file."""
+    if layer not in ("country", "state"):
+        raise ValueError("layer must be 'country' or 'state'")
+
+    with open(geojson_path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    features = []
+    rings = []
+    vertices = []
+    polygon_id = 0
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+
+        feature_id = len(features)
+        features.append(feature_address(feature.get("properties") or {}, layer))
+        for polygon in polygons:
+            for ring_no, ring in enumerate(polygon):
+                if len(ring) < 3:
+                    continue
+                lons = [p[0] for p in ring]
+                lats = [p[1] for p in ring]
+                start = len(vertices) // 2
+                for lon, lat in zip(lons, lats):
+                    vertices.extend((lon, lat))
+                rings.append((feature_id, polygon_id, 1 if ring_no else 0, start, len(ring),
+                              min(lons), min(lats), max(lons), max(lats)))
+            polygon_id += 1
+
+    header = json.dumps({"layer": layer, "features": features,
+                         "rings": len(rings), "vertices": len(vertices) // 2}).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    with open(out_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for ring in rings:
+            f.write(struct.pack(f"<{RING_FIELDS}d", *ring))
+        f.write(struct.pack(f"<{len(vertices)}d", *vertices))
+
+    print(f"Compiled {len(features)} features, {len(rings)} rings, "
+          f"{len(vertices) // 2} vertices into {out_path}")
+    return out_path
+
+
+def _point_in_ring(xs, ys, lon, lat):
+    """Ray casting test in pure Python."""
+    inside = False
+    n = len(xs)
+    j = n - 1
+    for i in range(n):
+        yi, yj = ys[i], ys[j]
+        if (yi > lat) != (yj > lat):
+            x_cross = (xs[j] - xs[i]) * (lat - yi) / (yj - yi) + xs[i]
+            if lon < x_cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+def _point_in_ring_np(xs, ys, lon, lat):
+    """Ray casting test over every edge at once with NumPy."""
+    x2 = np.roll(xs, -1)
+    y2 = np.roll(ys, -1)
+    crosses = (ys > lat) != (y2 > lat)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = (x2 - xs) * (lat - ys) / (y2 - ys) + xs
+    return bool(np.count_nonzero(crosses & (lon < x_cross)) % 2)
+
+
+class IndexFile:
+    """One memory-mapped index file plus its grid of polygon bounding boxes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:8] != MAGIC:
+            raise ValueError(f"{path} is not an offline geocode index")
+
+        header_len = struct.unpack_from("<Q", self.map, 8)[0]
+        header = json.loads(self.map[16:16 + header_len].decode("utf-8"))
+        self.layer = header["layer"]
+        self.features = header["features"]
+        ring_offset = 16 + header_len
+        vertex_offset = ring_offset + header["rings"] * RING_FIELDS * 8
+        vertex_end = vertex_offset + header["vertices"] * 2 * 8
+
+        if np:
+            self.rings = np.frombuffer(self.map, dtype="<f8", count=header["rings"] * RING_FIELDS,
+                                       offset=ring_offset).reshape(-1, RING_FIELDS)
+            vertices = np.frombuffer(self.map, dtype="<f8", count=header["vertices"] * 2,
+                                     offset=vertex_offset)
+            self.xs = vertices[0::2]
+            self.ys = vertices[1::2]
+        else:
+            self.rings = memoryview(self.map)[ring_offset:vertex_offset].cast("d")
+            vertices = memoryview(self.map)[vertex_offset:vertex_end].cast("d")
+            self.xs = vertices[0::2]
+            self.ys = vertices[1::2]
+
+        self.grid = {}
+        self.holes = {}
+        for i in range(header["rings"]):
+            _, polygon, is_hole, _, _, min_lon, min_lat, max_lon, max_lat = self.ring(i)
+            if is_hole:
+                self.holes.setdefault(int(polygon), []).append(i)
+                continue
+            for row in range(math.floor(min_lat / GRID_SIZE), math.floor(max_lat / GRID_SIZE) + 1):
+                for col in range(math.floor(min_lon / GRID_SIZE), math.floor(max_lon / GRID_SIZE) + 1):
+                    self.grid.setdefault((row, col), []).append(i)
+
+    def ring(self, i):
+        if np:
+            return self.rings[i]
+        return self.rings[i * RING_FIELDS:(i + 1) * RING_FIELDS]
+
+    def contains(self, i, lon, lat):
+        """Test whether (lon, lat) falls inside ring i."""
+        _, _, _, start, count, min_lon, min_lat, max_lon, max_lat = self.ring(i)
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            return False
+        start, count = int(start), int(count)
+        xs = self.xs[start:start + count]
+        ys = self.ys[start:start + count]
+        if np:
+            return _point_in_ring_np(xs, ys, lon, lat)
+        return _point_in_ring(xs, ys, lon, lat)
+
+    def lookup(self, lat, lon):
+        """Return the address of the feature containing the point, or None."""
+        cell = (math.floor(lat / GRID_SIZE), math.floor(lon / GRID_SIZE))
+        for i in self.grid.get(cell, ()):
+            if not self.contains(i, lon, lat):
+                continue
+            feature, polygon = int(self.ring(i)[0]), int(self.ring(i)[1])
+            if any(self.contains(h, lon, lat) for h in self.holes.get(polygon, ())):
+                continue
+            return self.features[feature]
+        return None
+
+    def close(self):
+        self.rings = self.xs = self.ys = None
+        self.map.close()
+        self.file.close()
+
+
+class OfflineGeocoder:
+    """Looks points up in one or more index files (e.g. countries + states)."""
+
+    def __init__(self, paths, enrich_city=False):
+        self.indexes = [IndexFile(path) for path in paths]
+        # Also ask LocationIQ for the city name when a key is available.
+        self.enrich_city = enrich_city
+        self.stats = {"lookups": 0, "land": 0, "ocean": 0}
+
+    def lookup(self, lat, lon):
+        """Return an address dict in the same shape LocationIQ returns."""
+        lat, lon = float(lat), float(lon)
+        self.stats["lookups"] += 1
+        address = {}
+        # Country layers first so a state layer can add the state on top.
+        for index in sorted(self.indexes, key=lambda ix: ix.layer != "country"):
+            found = index.lookup(lat, lon)
+            if found:
+                for key, value in found.items():
+                    if index.layer == "state" or key not in address:
+                        address[key] = value
+
+        if address.get("country_code"):
+            self.stats["land"] += 1
+            return address
+
+        self.stats["ocean"] += 1
+        return {"ocean": ocean_name(lat, lon)}
+
+    def address(self, lat, lon, remote=None):
+        """lookup(), with the city / town from remote(lat, lon) added on land when enrich_city is on.
+
+        `remote` returns a LocationIQ style address or None; it is never
+        called over the ocean, and the offline answer stands if it fails.
+        """
+        address = self.lookup(lat, lon)
+        if self.enrich_city and remote is not None and address.get("country_code"):
+            found = remote(lat, lon)
+            if found:
+                for key in ("city", "town"):
+                    if key in found:
+                        address[key] = found[key]
+        return address
+
+    def close(self):
+        for index in self.indexes:
+            index.close()
+
+
+geocoder = None
+_load_lock = threading.Lock()
+
+
+def enable(paths, enrich_city=False):
+    """Switch reverse_geocode() over to the offline index files in `paths`."""
+    global geocoder
+    if isinstance(paths, str):
+        paths = [p for p in paths.split(",") if p]
+    geocoder = OfflineGeocoder(paths, enrich_city=enrich_city)
+    return geocoder
+
+
+def get_geocoder():
+    """Return the offline geocoder, loading it from OFFLINE_GEOCODE_INDEX on first use."""
+    if geocoder is None and os.environ.get("OFFLINE_GEOCODE_INDEX"):
+        with _load_lock:
+            if geocoder is None:
+                enable(os.environ["OFFLINE_GEOCODE_INDEX"],
+                       enrich_city=os.environ.get("OFFLINE_GEOCODE_ENRICH", "") == "1")
+    return geocoder
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "compile":
+        layer = argv[argv.index("--layer") + 1] if "--layer" in argv else "country"
+        compile_index(argv[1], argv[2], layer=layer)
+    elif len(argv) == 4 and argv[0] == "lookup":
+        print(OfflineGeocoder(argv[1].split(",")).lookup(float(argv[2]), float(argv[3])))
+    else:
+        print("Usage:\n  offline_geocode_iss.py compile <in.geojson> <out.idx> [--layer country|state]\n"
+              "  offline_geocode_iss.py lookup <a.idx[,b.idx]> <lat> <lon>")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
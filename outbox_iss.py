@@ -0,0 +1,206 @@
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+
+from scheduler_iss import backoff_delay, parse_retry_after
+
+# -------------------------------------------------------------------
+# Outbound message queue
+# Replies are handed to the outbox instead of being POSTed on the
+# polling thread, so a slow Webex POST no longer holds up the next poll.
+# A few worker threads send them:
+#   * rooms are served concurrently, but each room has at most one
+#     worker at a time, so replies arrive in the order they were queued,
+#   * a 429 or 5xx (or a network error) is retried with jittered
+#     backoff, and a 429's Retry-After pauses every worker,
+#   * while Webex is throttling us, replies already waiting for the same
+#     room are merged into one message, so fewer POSTs are needed.
+# Queue depth, retries, merges and send latency (queued -> posted) are
+# kept so they can be printed with the other reports.
+# -------------------------------------------------------------------
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class _Reply:
+    def __init__(self, room_id, text, access_token, on_done):
+        self.room_id = room_id
+        self.text = text
+        self.access_token = access_token
+        self.on_done = on_done
+        self.queued = time.monotonic()
+        # Send inside the submitter's context so tracing spans land on its trace.
+        self.context = contextvars.copy_context()
+
+
+class Outbox:
+    """Sends replies from worker threads, in order per room, with retries."""
+
+    def __init__(self, send, workers=16, max_attempts=5, base_delay=0.5, merge=True, max_merge=5,
+                 merge_window=10.0, separator="\n\n"):
+        self.send = send
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.merge = merge
+        self.max_merge = max_merge
+        self.merge_window = merge_window
+        self.separator = separator
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.rooms = {}             # room id -> deque of waiting replies
+        self.busy = set()           # rooms a worker is sending for right now
+        self.ready = queue.Queue()  # rooms with replies and no worker
+        self.unfinished = 0
+        self.paused_until = 0.0
+        self.throttled_at = None
+        self.threads = []
+        self.latencies = deque(maxlen=2048)
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retries": 0, "merged": 0, "max_depth": 0}
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return self
+            self.threads = [threading.Thread(target=self._work, daemon=True, name=f"outbox-{i}")
+                            for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def submit(self, room_id, text, access_token, on_done=None):
+        """Queue a reply. on_done(status) is called from a worker once it is sent or given up on."""
+        if not self.threads:
+            self.start()
+        reply = _Reply(room_id, text, access_token, on_done)
+        with self.lock:
+            self.rooms.setdefault(room_id, deque()).append(reply)
+            self.unfinished += 1
+            self.stats["queued"] += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], self.unfinished)
+            wake = room_id not in self.busy
+            if wake:
+                self.busy.add(room_id)
+        if wake:
+            self.ready.put(room_id)
+        return reply
+
+    def depth(self):
+        with self.lock:
+            return self.unfinished
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent (or given up on)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.idle:
+            while self.unfinished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+    def throttled(self):
+        with self.lock:
+            return self.throttled_at is not None and time.monotonic() - self.throttled_at < self.merge_window
+
+    def observe(self, response):
+        """Response hook for the HTTP client: a 429 on a message POST pauses the outbox."""
+        if response.status_code != 429 or response.request.method != "POST":
+            return
+        if not response.url.split("?")[0].endswith("/messages"):
+            return
+        seconds = parse_retry_after(response.headers.get("Retry-After"))
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.throttled_at = time.monotonic()
+
+    def attach(self, http_client):
+        """Watch every response the given HttpClient receives."""
+        if self.observe not in http_client.response_hooks:
+            http_client.response_hooks.append(self.observe)
+        return self
+
+    def _take(self, room_id):
+        """Next reply(s) for the room: one normally, several merged while throttled."""
+        throttled = self.merge and self.throttled()
+        with self.lock:
+            pending = self.rooms[room_id]
+            batch = [pending.popleft()]
+            if throttled:
+                while pending and len(batch) < self.max_merge:
+                    batch.append(pending.popleft())
+        return batch
+
+    def _send(self, batch):
+        first = batch[0]
+        text = self.separator.join(reply.text for reply in batch)
+        status = None
+        for attempt in range(1, self.max_attempts + 1):
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                status = first.context.run(self.send, first.room_id, text, first.access_token)
+            except Exception as e:
+                # A sender that raises counts as a failed attempt; it must not kill the worker.
+                print(f"Error sending a reply: {e}")
+                status = None
+            if status not in RETRY_STATUSES and status is not None:
+                break
+            if attempt < self.max_attempts:
+                with self.lock:
+                    self.stats["retries"] += 1
+                time.sleep(backoff_delay(attempt, base=self.base_delay))
+        return status
+
+    def _work(self):
+        while True:
+            room_id = self.ready.get()
+            while True:
+                batch = self._take(room_id)
+                status = None
+                try:
+                    status = self._send(batch)
+                finally:
+                    # Whatever happened, the replies are done with and the room is handed back.
+                    now = time.monotonic()
+                    with self.lock:
+                        self.stats["sent" if status == 200 else "failed"] += 1
+                        self.stats["merged"] += len(batch) - 1
+                        self.latencies.extend(now - reply.queued for reply in batch)
+                    for reply in batch:
+                        if reply.on_done:
+                            try:
+                                reply.on_done(status)
+                            except Exception as e:
+                                print(f"Error in reply callback: {e}")
+                    with self.lock:
+                        self.unfinished -= len(batch)
+                        if not self.unfinished:
+                            self.idle.notify_all()
+                        finished = not self.rooms[room_id]
+                        if finished:
+                            del self.rooms[room_id]
+                            self.busy.discard(room_id)
+                if finished:
+                    break
+
+    def metrics(self):
+        """Queue depth, sends, retries, merges and send latency percentiles (ms)."""
+        with self.lock:
+            stats = dict(self.stats, depth=self.unfinished)
+            latencies = sorted(self.latencies)
+        for q in (50, 99):
+            value = latencies[min(len(latencies) - 1, len(latencies) * q // 100)] if latencies else 0.0
+            stats[f"p{q}_ms"] = round(value * 1000, 1)
+        return stats
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"Outbox: {m['sent']} sent, {m['failed']} failed, {m['retries']} retries, {m['merged']} merged, "
+              f"depth {m['depth']} (max {m['max_depth']}), send latency p50 {m['p50_ms']} ms, "
+              f"p99 {m['p99_ms']} ms")
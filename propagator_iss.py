@@ -0,0 +1,268 @@
+import calendar
+import math
+import os
+import sys
+import threading
+import time
+
+import lazy_iss
+
+np = lazy_iss.optional("numpy")  # without numpy, batch calls fall back to a plain list loop
+
+# -------------------------------------------------------------------
+# Local ISS orbit propagator
+# Works out where the ISS is from its two-line element set (TLE) instead
+# of asking api.open-notify.org. The TLE is read from a local file that
+# can be refreshed from Celestrak every day or so. Positions come from
+# Kepler's equation with the J2 secular drift of the node, perigee and
+# mean anomaly plus the TLE's mean motion decay term. That is not full
+# SGP4, but from a fresh TLE it stays within about 100 km over the first
+# day, which is plenty for "which country is it over". A position takes
+# microseconds, any timestamp (past or future) works, and a whole NumPy
+# array of timestamps can be evaluated in one call.
+# -------------------------------------------------------------------
+
+TLE_FILE = os.environ.get("ISS_TLE_FILE", "iss.tle")
+TLE_URL = "https://celestrak.org/NORAD/elements/gp.php?CATNR=25544&FORMAT=tle"
+
+MU = 398600.4418          # km^3 / s^2
+EARTH_RADIUS = 6378.137   # km (WGS84)
+FLATTENING = 1 / 298.257223563
+J2 = 1.08262668e-3
+SECONDS_PER_DAY = 86400.0
+TWO_PI = 2 * math.pi
+UNIX_EPOCH_JD = 2440587.5
+
+
+def _tle_float(field):
+    """Parse TLE 'assumed decimal point' fields like ' 12345-3' (= 0.12345e-3)."""
+    field = field.strip()
+    if not field:
+        return 0.0
+    sign = -1.0 if field[0] == "-" else 1.0
+    field = field.lstrip("+-")
+    mantissa, exponent = field[:-2], field[-2:]
+    return sign * float(f"0.{mantissa}") * 10 ** int(exponent)
+
+
+def parse_tle(line1, line2):
+    """Pull the mean orbital elements out of the two TLE lines."""
+    year = int(line1[18:20])
+    year += 2000 if year < 57 else 1900
+    day_of_year = float(line1[20:32])
+    epoch = calendar.timegm((year, 1, 1, 0, 0, 0)) + (day_of_year - 1) * SECONDS_PER_DAY
+
+    return {
+        "epoch": epoch,
+        "ndot": float(line1[33:43]),   # rev/day^2, already divided by two
+        "bstar": _tle_float(line1[53:61]),
+        "inclination": math.radians(float(line2[8:16])),
+        "raan": math.radians(float(line2[17:25])),
+        "eccentricity": float("0." + line2[26:33].strip()),
+        "arg_perigee": math.radians(float(line2[34:42])),
+        "mean_anomaly": math.radians(float(line2[43:51])),
+        "mean_motion": float(line2[52:63]),   # rev/day
+    }
+
+
+def gmst(unix_time):
+    """Greenwich mean sidereal time in radians for a Unix timestamp."""
+    days = unix_time / SECONDS_PER_DAY + UNIX_EPOCH_JD - 2451545.0
+    return math.radians((280.46061837 + 360.98564736629 * days) % 360.0)
+
+
+def geodetic(x, y, z):
+    """Turn an Earth-fixed position (km) into WGS84 latitude/longitude in degrees."""
+    e2 = FLATTENING * (2 - FLATTENING)
+    lon = math.atan2(y, x)
+    p = math.hypot(x, y)
+    lat = math.atan2(z, p * (1 - e2))
+    for _ in range(3):
+        sin_lat = math.sin(lat)
+        n = EARTH_RADIUS / math.sqrt(1 - e2 * sin_lat * sin_lat)
+        lat = math.atan2(z + e2 * n * sin_lat, p)
+    return math.degrees(lat), math.degrees(lon)
+
+
+class Propagator:
+    """Computes the ISS position for any timestamp from one TLE."""
+
+    def __init__(self, line1, line2, name="ISS (ZARYA)"):
+        self.name = name
+        self.line1 = line1
+        self.line2 = line2
+        el = parse_tle(line1, line2)
+        self.epoch = el["epoch"]
+        self.e = el["eccentricity"]
+        self.i = el["inclination"]
+        self.raan0 = el["raan"]
+        self.argp0 = el["arg_perigee"]
+        self.m0 = el["mean_anomaly"]
+
+        self.n = el["mean_motion"] * TWO_PI / SECONDS_PER_DAY          # rad/s
+        self.ndot = el["ndot"] * TWO_PI / SECONDS_PER_DAY ** 2         # rad/s^2 (halved)
+        self.a = (MU / self.n ** 2) ** (1 / 3)
+
+        # J2 secular rates for the node, perigee and mean anomaly.
+        p = self.a * (1 - self.e ** 2)
+        k = 1.5 * J2 * (EARTH_RADIUS / p) ** 2 * self.n
+        sin2_i = math.sin(self.i) ** 2
+        self.raan_rate = -k * math.cos(self.i)
+        self.argp_rate = k * (2 - 2.5 * sin2_i)
+        self.m_rate = self.n + k * math.sqrt(1 - self.e ** 2) * (1 - 1.5 * sin2_i)
+
+    def age(self, unix_time=None):
+        """How many days old the TLE is at `unix_time` (default now)."""
+        return ((time.time() if unix_time is None else unix_time) - self.epoch) / SECONDS_PER_DAY
+
+    def _eci(self, unix_time):
+        dt = unix_time - self.epoch
+        m = (self.m0 + self.m_rate * dt + self.ndot * dt * dt) % TWO_PI
+        raan = self.raan0 + self.raan_rate * dt
+        argp = self.argp0 + self.argp_rate * dt
+        # The mean motion decays, so the orbit shrinks a little over time.
+        a = self.a * (1 - 4 / 3 * self.ndot * dt / self.n)
+
+        e = self.e
+        ecc_anomaly = m
+        for _ in range(6):
+            ecc_anomaly -= (ecc_anomaly - e * math.sin(ecc_anomaly) - m) / (1 - e * math.cos(ecc_anomaly))
+        cos_e, sin_e = math.cos(ecc_anomaly), math.sin(ecc_anomaly)
+        # Position in the orbital plane.
+        px = a * (cos_e - e)
+        py = a * math.sqrt(1 - e * e) * sin_e
+
+        cos_w, sin_w = math.cos(argp), math.sin(argp)
+        cos_o, sin_o = math.cos(raan), math.sin(raan)
+        cos_i, sin_i = math.cos(self.i), math.sin(self.i)
+        x = (cos_o * cos_w - sin_o * sin_w * cos_i) * px + (-cos_o * sin_w - sin_o * cos_w * cos_i) * py
+        y = (sin_o * cos_w + cos_o * sin_w * cos_i) * px + (-sin_o * sin_w + cos_o * cos_w * cos_i) * py
+        z = (sin_w * sin_i) * px + (cos_w * sin_i) * py
+        return x, y, z
+
+    def lat_lon(self, unix_time):
+        """Return (lat, lon) in degrees for a Unix timestamp."""
+        x, y, z = self._eci(unix_time)
+        theta = gmst(unix_time)
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        return geodetic(cos_t * x + sin_t * y, -sin_t * x + cos_t * y, z)
+
+    def position(self, unix_time=None):
+        """Same dict as get_iss_location(): {"lat", "lon", "timestamp"}."""
+        if unix_time is None:
+            unix_time = time.time()
+        lat, lon = self.lat_lon(unix_time)
+        return {"lat": round(lat, 4), "lon": round(lon, 4), "timestamp": int(unix_time)}
+
+    def positions(self, timestamps):
+        """Evaluate many timestamps at once; returns arrays under the same keys."""
+        if not np:
+            points = [self.lat_lon(t) for t in timestamps]
+            return {"lat": [p[0] for p in points], "lon": [p[1] for p in points],
+                    "timestamp": list(timestamps)}
+        return self._positions_np(np.asarray(timestamps, dtype=float))
+
+    def _positions_np(self, t):
+        dt = t - self.epoch
+        m = (self.m0 + self.m_rate * dt + self.ndot * dt * dt) % TWO_PI
+        raan = self.raan0 + self.raan_rate * dt
+        argp = self.argp0 + self.argp_rate * dt
+        a = self.a * (1 - 4 / 3 * self.ndot * dt / self.n)
+
+        e = self.e
+        ecc_anomaly = m.copy()
+        for _ in range(6):
+            ecc_anomaly -= (ecc_anomaly - e * np.sin(ecc_anomaly) - m) / (1 - e * np.cos(ecc_anomaly))
+        px = a * (np.cos(ecc_anomaly) - e)
+        py = a * math.sqrt(1 - e * e) * np.sin(ecc_anomaly)
+
+        cos_w, sin_w = np.cos(argp), np.sin(argp)
+        cos_o, sin_o = np.cos(raan), np.sin(raan)
+        cos_i, sin_i = math.cos(self.i), math.sin(self.i)
+        x = (cos_o * cos_w - sin_o * sin_w * cos_i) * px + (-cos_o * sin_w - sin_o * cos_w * cos_i) * py
+        y = (sin_o * cos_w + cos_o * sin_w * cos_i) * px + (-sin_o * sin_w + cos_o * cos_w * cos_i) * py
+        z = (sin_w * sin_i) * px + (cos_w * sin_i) * py
+
+        theta = np.radians((280.46061837 + 360.98564736629
+                            * (t / SECONDS_PER_DAY + UNIX_EPOCH_JD - 2451545.0)) % 360.0)
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        xe = cos_t * x + sin_t * y
+        ye = -sin_t * x + cos_t * y
+
+        e2 = FLATTENING * (2 - FLATTENING)
+        p = np.hypot(xe, ye)
+        lat = np.arctan2(z, p * (1 - e2))
+        for _ in range(3):
+            sin_lat = np.sin(lat)
+            n = EARTH_RADIUS / np.sqrt(1 - e2 * sin_lat * sin_lat)
+            lat = np.arctan2(z + e2 * n * sin_lat, p)
+        return {"lat": np.degrees(lat), "lon": np.degrees(np.arctan2(ye, xe)), "timestamp": t}
+
+
+def load_tle(path=TLE_FILE):
+    """Read a TLE file (optionally with a name line) and build a Propagator."""
+    with open(path, encoding="ascii") as f:
+        lines = [line.rstrip() for line in f if line.strip()]
+    line1 = next(line for line in lines if line.startswith("1 "))
+    line2 = next(line for line in lines if line.startswith("2 "))
+    name = lines[0] if not lines[0].startswith("1 ") else "ISS (ZARYA)"
+    return Propagator(line1, line2, name=name)
+
+
+def refresh_tle(path=TLE_FILE, url=TLE_URL):
+    """Download the latest ISS TLE from Celestrak and save it to `path`."""
+    from http_client_iss import client
+
+    response = client.get(url, endpoint="tle")
+    response.raise_for_status()
+    text = response.text.strip()
+    if "\n1 " not in text and not text.startswith("1 "):
+        raise ValueError("Response does not look like a TLE")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="ascii") as f:
+        f.write(text + "\n")
+    os.replace(tmp_path, path)
+    print(f"Saved a fresh ISS TLE to {path}")
+    return load_tle(path)
+
+
+_cached = {"path": None, "mtime": None, "propagator": None}
+_cache_lock = threading.Lock()
+
+
+def get_propagator(path=TLE_FILE):
+    """Return a Propagator for the TLE file, reloading it when the file changes.
+
+    Returns None when there is no TLE file, so callers can fall back to
+    the open-notify API.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached["path"] != path or _cached["mtime"] != mtime:
+            try:
+                _cached["propagator"] = load_tle(path)
+            except (OSError, ValueError, StopIteration) as e:
+                print(f"Could not load TLE from {path}: {e}")
+                return None
+            _cached["path"] = path
+            _cached["mtime"] = mtime
+        return _cached["propagator"]
+
+
+def main(argv):
+    if argv and argv[0] == "refresh":
+        refresh_tle(argv[1] if len(argv) > 1 else TLE_FILE)
+        return
+    propagator = get_propagator()
+    if propagator is None:
+        print(f"No TLE file at {TLE_FILE}. Run: python propagator_iss.py refresh")
+        return
+    print(f"{propagator.name}, TLE is {propagator.age():.1f} days old")
+    print(propagator.position())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
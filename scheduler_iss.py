@@ -0,0 +1,187 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# -------------------------------------------------------------------
+# Adaptive polling scheduler
+# Replaces the fixed time.sleep(1) between polls:
+#   * each room's poll interval shrinks right after a command and grows
+#     while the room is quiet,
+#   * errors back off exponentially with random jitter,
+#   * all rooms draw from one shared token bucket, so the total request
+#     rate stays under the Webex limit however many rooms we watch,
+#   * an HTTP 429 from Webex pauses every poller for its Retry-After
+#     time (429s from open-notify or the geocoders are only counted:
+#     they say nothing about the Webex budget).
+# The scheduler counts requests and the time spent throttled so both
+# can be printed or exported.
+# -------------------------------------------------------------------
+
+
+def parse_retry_after(value, default=5.0):
+    """Seconds to wait from a Retry-After header (seconds or an HTTP date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter for the given attempt (1, 2, 3...)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+# HttpClient endpoint names of the Webex API calls.
+WEBEX_ENDPOINTS = ("rooms", "messages", "post_message", "people", "webhooks")
+
+
+class TokenBucket:
+    """Shared request budget: `rate` tokens per second, up to `burst` saved up."""
+
+    def __init__(self, rate=5.0, burst=10):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.paused_until - now)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (e.g. after a 429)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RoomPoller:
+    """Poll interval for one room that adapts to how busy the room is."""
+
+    def __init__(self, min_interval=1.0, max_interval=10.0, idle_growth=1.25):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_growth = idle_growth
+        self.interval = min_interval
+        self.failures = 0
+
+    def on_activity(self):
+        """Someone sent a command: poll quickly for follow-ups."""
+        self.failures = 0
+        self.interval = self.min_interval
+
+    def on_idle(self):
+        """Nothing new: slow down a bit."""
+        self.failures = 0
+        self.interval = min(self.max_interval, self.interval * self.idle_growth)
+
+    def on_error(self):
+        self.failures += 1
+
+    def next_delay(self):
+        """How long to wait before the next poll of this room."""
+        if self.failures:
+            return max(self.interval, backoff_delay(self.failures, base=self.min_interval))
+        return self.interval
+
+
+class PollScheduler:
+    """Hands out poll slots from a shared token bucket and keeps the metrics."""
+
+    def __init__(self, rate=5.0, burst=10, min_interval=1.0, max_interval=10.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stats = {"requests": 0, "rate_limited": 0, "other_rate_limited": 0, "errors": 0,
+                      "throttled_seconds": 0.0}
+
+    def poller(self, min_interval=None, max_interval=None):
+        """Create the adaptive interval tracker for one room."""
+        return RoomPoller(self.min_interval if min_interval is None else min_interval,
+                          self.max_interval if max_interval is None else max_interval)
+
+    def _reserve(self):
+        wait = self.bucket.reserve()
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["throttled_seconds"] += wait
+            self.recent.append(now + wait)
+            while self.recent and self.recent[0] < now - 60:
+                self.recent.popleft()
+        return wait
+
+    def acquire(self):
+        """Block until this poll is allowed to go out."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Like acquire(), but waits on the event loop."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, response):
+        """Response hook for the HTTP client: honour a Webex 429's Retry-After, count errors."""
+        if response.status_code == 429 and getattr(response, "endpoint", None) not in WEBEX_ENDPOINTS:
+            # Another service's limit: polling Webex can carry on.
+            with self.lock:
+                self.stats["other_rate_limited"] += 1
+        elif response.status_code == 429:
+            seconds = parse_retry_after(response.headers.get("Retry-After"))
+            print(f"Rate limited by {response.url.split('/')[2]}, pausing polls for {seconds:.1f}s.")
+            self.bucket.pause(seconds)
+            with self.lock:
+                self.stats["rate_limited"] += 1
+        elif response.status_code >= 500:
+            with self.lock:
+                self.stats["errors"] += 1
+
+    def attach(self, http_client):
+        """Watch every response the given HttpClient receives."""
+        if self.observe not in http_client.response_hooks:
+            http_client.response_hooks.append(self.observe)
+        return self
+
+    def metrics(self):
+        """Request count, requests/second over the last minute and time spent throttled."""
+        now = time.monotonic()
+        with self.lock:
+            stats = dict(self.stats)
+            recent = [t for t in self.recent if now - 60 <= t <= now]
+        if recent:
+            window = max(1.0, now - recent[0])
+            stats["request_rate"] = len(recent) / window
+        else:
+            stats["request_rate"] = 0.0
+        return stats
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"Polls: {m['requests']} ({m['request_rate']:.2f}/s), Webex 429s: {m['rate_limited']}, "
+              f"other 429s: {m['other_rate_limited']}, 5xx: {m['errors']}, "
+              f"time throttled: {m['throttled_seconds']:.1f}s")
+
+
+# Shared scheduler for the bot: about 5 polls per second across all rooms.
+scheduler = PollScheduler()
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+import history_iss
+import scheduler_iss
+import store_iss
+import tracing_iss
+
+# -------------------------------------------------------------------
+# Service mode
+# Runs the bot without any prompts, for any number of tenants (a Webex
+# token, a LocationIQ key and a set of rooms) in one process. All
+# tenants share the HTTP connection pools, the geocode cache and store,
+# the ISS / geocode coalescing and the outbox.
+#
+# Tenants come from a JSON config file (SPACEBOT_CONFIG or the first
+# argument); "$VAR" in a value is read from the environment:
+#
+#   {"poll_interval": 1.0,
+#    "tenants": [{"name": "iss-team", "token": "$ISS_TEAM_TOKEN",
+#                 "locationiq_key": "$LOCATIONIQ_KEY",
+#                 "rooms": ["Space Bot", "Y2lzY29zcGFyazovL..."]}]}
+#
+# Without a config file there is one tenant from WEBEX_TOKEN,
+# SPACEBOT_ROOMS (comma separated names or ids) and LOCATIONIQ_KEY.
+#
+# The config file is reloaded when it changes (or on SIGHUP). Rooms that
+# were added start polling, rooms that were removed stop polling, and
+# rooms whose token or key changed are restarted. A room that stops
+# still finishes the commands it was already working on, and a restarted
+# room carries on from the same cursor, so nothing is lost or repeated.
+# -------------------------------------------------------------------
+
+RELOAD_INTERVAL = 2.0
+
+
+def _expand(value):
+    return os.path.expandvars(value).strip() if isinstance(value, str) else value
+
+
+def parse_config(data):
+    """Check a config dict and return (poll_interval, {tenant name: tenant})."""
+    if not isinstance(data, dict) or not isinstance(data.get("tenants"), list):
+        raise ValueError('config needs a "tenants" list')
+    poll_interval = data.get("poll_interval", 1.0)
+    if isinstance(poll_interval, bool) or not isinstance(poll_interval, (int, float)) or poll_interval <= 0:
+        raise ValueError(f'"poll_interval" must be a positive number, not {poll_interval!r}')
+    tenants = {}
+    for i, raw in enumerate(data["tenants"]):
+        if not isinstance(raw, dict):
+            raise ValueError(f"tenant {i + 1} is not an object")
+        name = raw.get("name") or f"tenant-{i + 1}"
+        if not isinstance(name, str):
+            raise ValueError(f"tenant {i + 1} has a name that is not a string")
+        token = _expand(raw.get("token", ""))
+        rooms = raw.get("rooms") or []
+        if not isinstance(token, str) or not token or token.startswith("$"):
+            raise ValueError(f"tenant {name!r} has no token")
+        if isinstance(rooms, str):
+            rooms = [r for r in rooms.split(",") if r.strip()]
+        if not isinstance(rooms, list) or not all(isinstance(r, str) for r in rooms):
+            raise ValueError(f"tenant {name!r} needs a list of room names or ids")
+        if not rooms:
+            raise ValueError(f"tenant {name!r} has no rooms")
+        key = _expand(raw.get("locationiq_key", ""))
+        if not isinstance(key, str):
+            raise ValueError(f"tenant {name!r} has a locationiq_key that is not a string")
+        if name in tenants:
+            raise ValueError(f"tenant {name!r} is listed twice")
+        tenants[name] = {"name": name, "token": bot.bearer(token),
+                         "key": key, "rooms": [_expand(r) for r in rooms]}
+    return float(poll_interval), tenants
+
+
+def config_from_env():
+    """The single tenant described by WEBEX_TOKEN / SPACEBOT_ROOMS / LOCATIONIQ_KEY."""
+    rooms = os.environ.get("SPACEBOT_ROOMS") or os.environ.get("SPACEBOT_ROOM", "")
+    return {"tenants": [{"name": "default", "token": os.environ.get("WEBEX_TOKEN", ""),
+                         "locationiq_key": os.environ.get("LOCATIONIQ_KEY", ""), "rooms": rooms}]}
+
+
+class Service:
+    """Runs a room watcher per (tenant, room) and keeps them in line with the config."""
+
+    def __init__(self, path=None, store=None, max_workers=None, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.store = store
+        self.max_workers = max_workers
+        self.reload_interval = reload_interval
+        self.mtime = None
+        self.tasks = {}         # (tenant, room id) -> watcher task
+        self.stops = {}         # (tenant, room id) -> asyncio.Event
+        self.settings = {}      # (tenant, room id) -> (token, key, poll interval)
+        self.cursors = {}       # tenant -> {room id: cursor}
+        self.stats = {}         # tenant -> monitor stats
+        self.retiring = set()   # stopped watchers still answering their last commands
+        self.reload_requested = None
+
+    def read_config(self):
+        if self.path is None:
+            return parse_config(config_from_env())
+        with open(self.path, encoding="utf-8") as f:
+            self.mtime = os.path.getmtime(self.path)
+            return parse_config(json.load(f))
+
+    def changed(self):
+        if self.path is None:
+            return False
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return False
+
+    async def resolve_rooms(self, tenant):
+        """Turn the tenant's room names / ids into room ids.
+
+        Returns (ids, complete); complete is False when the room list was
+        needed but could not be fetched, so names it would have resolved
+        are missing from ids.
+        """
+        token = tenant["token"]
+        rooms = self.store.load_rooms(token) if self.store is not None else None
+        wanted = tenant["rooms"]
+        complete = True
+        if not rooms or any(bot.find_room(rooms, name) is None for name in wanted):
+            fetched = await monitor.run_blocking(bot.fetch_rooms, token)
+            if fetched:
+                rooms = fetched
+                if self.store is not None:
+                    self.store.save_rooms(token, rooms)
+            else:
+                complete = False
+                print(f"[{tenant['name']}] Could not list the rooms, keeping the ones already being watched.")
+        ids = []
+        for name in wanted:
+            room = bot.find_room(rooms or [], name)
+            if room is None:
+                if complete:
+                    print(f"[{tenant['name']}] No room matches {name!r}, skipping it.")
+            elif room["id"] not in ids:
+                ids.append(room["id"])
+        return ids, complete
+
+    async def apply(self, poll_interval, tenants):
+        """Start, stop and restart watchers so they match the tenants given."""
+        wanted = {}
+        for tenant in tenants.values():
+            ids, complete = await self.resolve_rooms(tenant)
+            for room_id in ids:
+                wanted[(tenant["name"], room_id)] = (tenant["token"], tenant["key"], poll_interval)
+            if not complete:
+                # Don't stop rooms just because the room list couldn't be fetched this time.
+                for key, settings in self.settings.items():
+                    if key[0] == tenant["name"] and key not in wanted:
+                        wanted[key] = settings
+
+        for key in list(self.tasks):
+            if self.settings[key] != wanted.get(key):
+                # Stop polling; the task lives on until its in-flight commands are answered.
+                self.stops[key].set()
+                task = self.tasks[key]
+                self.retiring.add(task)
+                task.add_done_callback(self.retiring.discard)
+        for key, settings in wanted.items():
+            if self.settings.get(key) != settings:
+                self.start(key, settings, previous=self.tasks.get(key))
+        for key in [k for k in self.tasks if k not in wanted]:
+            del self.tasks[key], self.stops[key], self.settings[key]
+
+        print(f"Serving {len(self.tasks)} room(s) for {len(tenants)} tenant(s).")
+
+    def start(self, key, settings, previous=None):
+        tenant, room_id = key
+        token, maps_key, poll_interval = settings
+        stop = asyncio.Event()
+        stats = self.stats.setdefault(tenant, monitor.new_stats())
+        cursors = self.cursors.setdefault(tenant, {})
+        if room_id not in cursors and self.store is not None:
+            cursors.update(self.store.load_cursors([room_id]))
+
+        async def run():
+            if previous is not None:
+                # The old watcher keeps the cursor up to date until it has finished.
+                await asyncio.gather(previous, return_exceptions=True)
+            await monitor.watch_room(room_id, token, maps_key, stats, poll_interval, cursors, stop=stop)
+
+        self.tasks[key] = asyncio.create_task(run())
+        self.stops[key] = stop
+        self.settings[key] = settings
+
+    async def reload(self):
+        try:
+            poll_interval, tenants = self.read_config()
+        except (OSError, ValueError) as e:
+            print(f"Could not load the config, keeping the current one: {e}")
+            return
+        print("Config changed, reloading.")
+        await self.apply(poll_interval, tenants)
+
+    async def run(self, duration=None):
+        poll_interval, tenants = self.read_config()
+        monitor.use_thread_pool(self.max_workers or 32)
+        scheduler_iss.scheduler.attach(bot.client)
+        bot.outbox.attach(bot.client)
+        bot.geocode_cache.use_store(self.store)
+        bot.tracker.use_store(self.store)
+        tracing_iss.start_from_env(bot.client)
+        # The sampler places its fixes with the first tenant's LocationIQ key that is set.
+        sample_key = next((t["key"] for t in tenants.values() if t["key"]), "")
+        history_iss.start_from_env(lambda: bot.sample_position(sample_key))
+
+        self.reload_requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload_requested.set)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass  # No SIGHUP (e.g. Windows): file changes are still picked up.
+
+        await self.apply(poll_interval, tenants)
+        deadline = None if duration is None else loop.time() + duration
+        try:
+            while deadline is None or loop.time() < deadline:
+                wait = self.reload_interval if deadline is None else min(self.reload_interval,
+                                                                         deadline - loop.time())
+                await monitor.pause(max(0.0, wait), self.reload_requested)
+                if self.reload_requested.is_set() or self.changed():
+                    self.reload_requested.clear()
+                    await self.reload()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        for stop in self.stops.values():
+            stop.set()
+        tasks = list(self.tasks.values()) + list(self.retiring)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await monitor.run_blocking(bot.outbox.flush, 5)
+        if self.store is not None:
+            for cursors in self.cursors.values():
+                self.store.save_cursors(cursors)
+
+    def print_report(self):
+        for tenant, stats in self.stats.items():
+            print(f"[{tenant}] polls: {stats['polls']}, commands: {stats['commands']}, "
+                  f"replies: {stats['replies']}, errors: {stats['errors']}")
+
+
+def main(argv):
+    """Run the bot as a service from a config file or the environment."""
+    path = argv[0] if argv else os.environ.get("SPACEBOT_CONFIG")
+    service = Service(path, store=store_iss.get_store())
+    try:
+        asyncio.run(service.run())
+    except (OSError, ValueError) as e:
+        print(f"Could not start: {e}")
+    except KeyboardInterrupt:
+        print("\nStopped the service.")
+        service.print_report()
+        bot.client.print_report()
+        scheduler_iss.scheduler.print_metrics()
+        bot.outbox.print_metrics()
+        bot.geocode_cache.print_report()
+        bot.geocoders.print_report()
+        bot.iss_fallback.print_report()
+        bot.geocode_fallback.print_report()
+        bot.tracker.print_report()
+        tracing_iss.registry.print_summary()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+import threading
+import time
+
+# -------------------------------------------------------------------
+# Request coalescing ("single flight")
+# When several rooms send /N in the same second they all want the same
+# ISS position and (nearly) the same address. Instead of each thread
+# calling open-notify and LocationIQ on its own, the first caller for a
+# key does the upstream request and everyone else asking for that key
+# while it is in flight waits for, and shares, its answer. A result can
+# also be kept for a short freshness window (about 1 s for the ISS
+# position) so callers arriving just after it finished reuse it too.
+# -------------------------------------------------------------------
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _share(result):
+    # Hand followers their own copy of dict results so nobody can change another's answer.
+    return dict(result) if isinstance(result, dict) else result
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one upstream call."""
+
+    def __init__(self, name, fresh_for=0.0, max_recent=1000):
+        self.name = name
+        self.fresh_for = fresh_for
+        self.max_recent = max_recent
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.recent = {}
+        self.stats = {"requests": 0, "upstream": 0, "shared": 0, "fresh": 0}
+
+    def do(self, key, fn, *args):
+        """Return fn(*args), sharing the answer with any identical call already running."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.fresh_for:
+                hit = self.recent.get(key)
+                if hit and time.monotonic() - hit[0] < self.fresh_for:
+                    self.stats["fresh"] += 1
+                    return _share(hit[1])
+
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                self.stats["upstream"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return _share(call.result)
+
+        try:
+            call.result = fn(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                # Failures (None) are never reused, the next caller tries again.
+                if self.fresh_for and call.error is None and call.result is not None:
+                    if len(self.recent) >= self.max_recent:
+                        self.recent.clear()
+                    self.recent[key] = (time.monotonic(), call.result)
+            call.done.set()
+        return call.result
+
+    def report(self):
+        """Requests seen, upstream calls made and how many were collapsed."""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["collapsed"] = stats["requests"] - stats["upstream"]
+        return stats
+
+    def print_report(self):
+        r = self.report()
+        print(f"{self.name}: {r['requests']} lookups, {r['upstream']} upstream calls, "
+              f"{r['collapsed']} collapsed ({r['shared']} in flight, {r['fresh']} fresh)")
+
+
+# Shared coalescers used by get_iss_location() and reverse_geocode().
+iss_flight = SingleFlight("ISS position", fresh_for=1.0)
+geocode_flight = SingleFlight("Reverse geocode")
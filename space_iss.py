@@ -1,188 +1,213 @@
+import os
 import requests
 import json
 import time
-from iso3166 import countries
+import fallback_iss
+import formatter_iss
+from http_client_iss import client, WEBEX_API, ISS_API, LOCATIONIQ_API
+from scheduler_iss import scheduler
 
 
-choice = input("Do you wish to use the hard-coded Webex token? (y/n) ")
+def fetch_iss_position():
+    r = client.get(f"{ISS_API}/iss-now.json", endpoint="iss")
+    if r.status_code != 200:
+        print("Error retrieving ISS data.")
+        return None
+
+    json_data = r.json()
+    if json_data.get("message") != "success":
+        print("ISS API did not return success.")
+        return None
 
-if choice.lower() == 'n':
-    user_token = input("Please enter your Webex access token: ")
-    accessToken = f"Bearer {user_token}"
-else:
-    accessToken = "Bearer MzhiM2Y2N2EtNDhjNC00NDk3LTgwYjktNjg2YjIyMTQyZWE4ZjY0Mzg2YzUtMzQ2_P0A1_636b97a0-b0af-4297-b0e7-480dd517b3f9"
+    return {"lat": json_data["iss_position"]["latitude"],
+            "lon": json_data["iss_position"]["longitude"],
+            "timestamp": json_data["timestamp"]}
 
 
-r = requests.get("https://webexapis.com/v1/rooms", headers={"Authorization": accessToken})
-if r.status_code != 200:
-    raise Exception(f"Incorrect reply from Webex API. Status code: {r.status_code}. Text: {r.text}")
+# if open-notify is down or slow, answer from the last fix (moved along its track) instead of skipping the reply
+iss_fallback = fallback_iss.PositionFallback(fetch_iss_position, **fallback_iss.bounds_from_env(
+    "ISS", timeout=2.0, max_stale=1800.0, max_extrapolate=300.0, retry_every=5.0))
 
-print("\nList of available rooms:")
-rooms = r.json()["items"]
-for room in rooms:
-    print(f"Room Type: {room['type']} | Title: {room['title']}")
 
+def main():
+    # WEBEX_TOKEN, SPACEBOT_ROOM and LOCATIONIQ_KEY skip the questions below
+    if os.environ.get("WEBEX_TOKEN"):
+        choice = "env"
+    else:
+        choice = input("Do you wish to use the hard-coded Webex token? (y/n) ")
+
+    if choice == "env":
+        user_token = os.environ["WEBEX_TOKEN"].strip()
+        accessToken = user_token if user_token.startswith("Bearer ") else f"Bearer {user_token}"
+    elif choice.lower() == 'n':
+        user_token = input("Please enter your Webex access token: ")
+        accessToken = f"Bearer {user_token}"
+    else:
+        accessToken = "Bearer MzhiM2Y2N2EtNDhjNC00NDk3LTgwYjktNjg2YjIyMTQyZWE4ZjY0Mzg2YzUtMzQ2_P0A1_636b97a0-b0af-4297-b0e7-480dd517b3f9"
 
-while True:
-    roomNameToSearch = input("\nWhich room should be monitored for the /seconds messages? ")
-    roomIdToGetMessages = None
-    roomTitleToGetMessages = None
 
+    try:
+        r = client.get(f"{WEBEX_API}/rooms", endpoint="rooms", headers={"Authorization": accessToken})
+        if r.status_code != 200:
+            print(f"Incorrect reply from Webex API. Status code: {r.status_code}. Text: {r.text}")
+            return
+        rooms = r.json()["items"]
+    except requests.exceptions.RequestException as e:
+        print(f"Could not reach Webex to list the rooms: {e}")
+        return
+    except (ValueError, KeyError):
+        print("Could not decode the room list from Webex.")
+        return
+
+    print("\nList of available rooms:")
     for room in rooms:
-        if roomNameToSearch.lower() in room["title"].lower():
-            print(f"Found room: {room['title']}")
-            roomIdToGetMessages = room["id"]
-            roomTitleToGetMessages = room["title"]
-            break
+        print(f"Room Type: {room['type']} | Title: {room['title']}")
 
-    if roomIdToGetMessages:
-        print(f"Monitoring room: {roomTitleToGetMessages}")
-        break
-    else:
-        print(f"No room found containing '{roomNameToSearch}'. Try again.\n")
 
+    roomNameToSearch = os.environ.get("SPACEBOT_ROOM")
+    while True:
+        if not roomNameToSearch:
+            roomNameToSearch = input("\nWhich room should be monitored for the /seconds messages? ")
+        roomIdToGetMessages = None
+        roomTitleToGetMessages = None
 
-while True:
-    time.sleep(1)
-    GetParameters = {"roomId": roomIdToGetMessages, "max": 1}
+        for room in rooms:
+            if roomNameToSearch.lower() in room["title"].lower():
+                print(f"Found room: {room['title']}")
+                roomIdToGetMessages = room["id"]
+                roomTitleToGetMessages = room["title"]
+                break
 
-    r = requests.get("https://webexapis.com/v1/messages",
-                     params=GetParameters,
-                     headers={"Authorization": accessToken})
+        if roomIdToGetMessages:
+            print(f"Monitoring room: {roomTitleToGetMessages}")
+            break
+        else:
+            print(f"No room found containing '{roomNameToSearch}'. Try again.\n")
+            roomNameToSearch = None
 
-    if r.status_code != 200:
-        raise Exception(f"Incorrect reply from Webex API. Status code: {r.status_code}. Text: {r.text}")
 
-    json_data = r.json()
-    if len(json_data["items"]) == 0:
-        continue
+    scheduler.attach(client)
+    poller = scheduler.poller()
 
-    message = json_data["items"][0]["text"]
-    print(f"Latest message received: {message}")
+    while True:
+        # adaptive poll interval instead of a fixed 1 second
+        time.sleep(poller.next_delay())
+        scheduler.acquire()
+        GetParameters = {"roomId": roomIdToGetMessages, "max": 1}
 
-    
-    if message.startswith("/"):
-        if message[1:].isdigit():
-            seconds = int(message[1:])
-        else:
-            print("Invalid format. Use /<number> (for example, /5).")
+        try:
+            r = client.get(f"{WEBEX_API}/messages", endpoint="messages",
+                           params=GetParameters,
+                           headers={"Authorization": accessToken})
+        except requests.exceptions.RequestException as e:
+            print(f"Error polling Webex: {e}")
+            poller.on_error()
             continue
 
-        
-        if seconds > 5:
-            seconds = 5
-
-        time.sleep(seconds)
-
-        
-        print("Fetching ISS location...")
-        r = requests.get("http://api.open-notify.org/iss-now.json", timeout=5)
         if r.status_code != 200:
-            print("Error retrieving ISS data.")
+            # a 429 has already paused the scheduler for its Retry-After time
+            print(f"Incorrect reply from Webex API. Status code: {r.status_code}. Text: {r.text}")
+            poller.on_error()
             continue
 
-        json_data = r.json()
-        if json_data.get("message") != "success":
-            print("ISS API did not return success.")
+        try:
+            items = r.json()["items"]
+            message = items[0].get("text", "") if items else None
+        except (ValueError, KeyError, AttributeError):
+            print("Could not decode messages from Webex.")
+            poller.on_error()
+            continue
+        if message is None:
+            poller.on_idle()
             continue
 
-        lat = json_data["iss_position"]["latitude"]
-        lng = json_data["iss_position"]["longitude"]
-        timestamp = json_data["timestamp"]
-        timeString = time.ctime(timestamp)
+        print(f"Latest message received: {message}")
+        if message.startswith("/"):
+            poller.on_activity()
+        else:
+            poller.on_idle()
 
-        
-        mapsAPIGetParameters = {
-            "key": "pk.1af4b5d6f1cf9d29dfdfc6ab5c545fe5",  # Your LocationIQ key
-            "lat": lat,
-            "lon": lng,
-            "format": "json"
-        }
 
-        try:
-            r = requests.get("https://us1.locationiq.com/v1/reverse", params=mapsAPIGetParameters, timeout=10)
-#didn't know what was wrong so was looking online what may be problem, they said i should input a debug code to check whats the problem, after this i solved the problem
-            print(f"[DEBUG] Reverse geocode URL: {r.url}")
-            print(f"[DEBUG] Status Code: {r.status_code}")
-            print(f"[DEBUG] Response Text (first 500 chars): {r.text[:500]}")
-
-            
-            if r.status_code == 404 or "Unable to geocode" in r.text:
-                print("The ISS is currently over the ocean or an uninhabited area.")
-                CountryResult = "XZ"
-                CityResult = "Unknown"
-                StateResult = "Unknown"
-            elif r.status_code != 200:
-                print(f"Reverse geocode failed. HTTP {r.status_code}")
-                continue
+        if message.startswith("/"):
+            if message[1:].isdigit():
+                seconds = int(message[1:])
             else:
-                json_data = r.json()
-                address = json_data.get("address", {})
-
-                CountryResult = address.get("country_code", "XZ").upper()
-                StateResult = address.get("state", "Unknown")
-                CityResult = address.get("city", address.get("town", "Unknown"))
-                StreetResult = address.get("road", "Unknown")
-
-                if CountryResult != "XZ":
-                    try:
-                        CountryResult = countries.get(CountryResult).name
-                    except KeyError:
-                        pass
-
-        except Exception as e:
-            print(f"Error while getting reverse geocode: {e}")
-            continue
+                print("Invalid format. Use /<number> (for example, /5).")
+                continue
 
-        
-        if CountryResult == "XZ":
-            responseMessage = (
-                f"On {timeString}, the ISS was flying over a body of water "
-                f"at latitude {lat}° and longitude {lng}°."
-            )
-        elif CityResult != "Unknown":
-            responseMessage = (
-                f"In {CityResult}, {StateResult}, the ISS was flying over on {timeString}.\n"
-                f"Coordinates: ({lat}°, {lng}°)\nCountry: {CountryResult}"
-            )
-        else:
-            responseMessage = (
-                f"On {timeString}, the ISS was flying over {StateResult}, {CountryResult} "
-                f"at coordinates ({lat}°, {lng}°)."
-            )
 
-        print("Sending to Webex:", responseMessage)
+            if seconds > 5:
+                seconds = 5
 
-        
-        HTTPHeaders = {
-            "Authorization": accessToken,
-            "Content-Type": "application/json"
-        }
+            time.sleep(seconds)
 
-        PostData = {
-            "roomId": roomIdToGetMessages,
-            "text": responseMessage
-        }
 
-        r = requests.post("https://webexapis.com/v1/messages",
-                          data=json.dumps(PostData),
-                          headers=HTTPHeaders)
+            print("Fetching ISS location...")
+            iss = iss_fallback.get()
+            if not iss:
+                print("No ISS position, new or old.")
+                continue
 
-        if r.status_code != 200:
-            print(f"Failed to post message. Status: {r.status_code}, Text: {r.text}")
-        else:
-            print("Message successfully posted to Webex.\n")
+            lat = iss["lat"]
+            lng = iss["lon"]
+            timestamp = iss["timestamp"]
 
 
+            mapsAPIGetParameters = {
+                "key": os.environ.get("LOCATIONIQ_KEY", "pk.1af4b5d6f1cf9d29dfdfc6ab5c545fe5"),  # Your LocationIQ key
+                "lat": lat,
+                "lon": lng,
+                "format": "json"
+            }
 
+            try:
+                r = client.get(f"{LOCATIONIQ_API}/reverse", endpoint="geocode", params=mapsAPIGetParameters)
 
+                if r.status_code == 404 or "Unable to geocode" in r.text:
+                    print("The ISS is currently over the ocean or an uninhabited area.")
+                    address = {}
+                elif r.status_code != 200:
+                    # no address, but the user still gets the coordinates
+                    print(f"Reverse geocode failed. HTTP {r.status_code}")
+                    address = None
+                else:
+                    json_data = r.json()
+                    address = json_data.get("address", {})
 
+            except Exception as e:
+                print(f"Error while getting reverse geocode: {e}")
+                address = None
 
 
+            responseMessage = formatter_iss.format_text(lat, lng, timestamp, address, style="classic")
+            responseMessage += fallback_iss.staleness_note(iss)
 
+            print("Sending to Webex:", responseMessage)
 
 
+            HTTPHeaders = {
+                "Authorization": accessToken,
+                "Content-Type": "application/json"
+            }
 
+            PostData = {
+                "roomId": roomIdToGetMessages,
+                "text": responseMessage
+            }
 
+            try:
+                r = client.post(f"{WEBEX_API}/messages", endpoint="post_message",
+                                data=json.dumps(PostData),
+                                headers=HTTPHeaders)
+            except requests.exceptions.RequestException as e:
+                print(f"Error sending message: {e}")
+                continue
+
+            if r.status_code != 200:
+                print(f"Failed to post message. Status: {r.status_code}, Text: {r.text}")
+            else:
+                print("Message successfully posted to Webex.\n")
 
 
+if __name__ == "__main__":
+    main()
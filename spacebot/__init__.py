@@ -0,0 +1,87 @@
+"""Space Bot as an importable package.
+
+    import spacebot
+    spacebot.get_iss_location()         # imports errorhandling_iss on first use
+    spacebot.workers.Supervisor(...)    # the whole workers_iss module
+
+Importing this package does nothing: no script runs and no module is
+imported until one of its names is used (PEP 562 module __getattr__).
+The code itself stays in the *_iss.py modules next to this directory,
+which must be on sys.path (it is when running from the repository).
+"""
+
+import importlib
+
+# Short name -> module.
+MODULES = {
+    "bot": "errorhandling_iss",
+    "classic": "space_iss",
+    "commands": "commands_iss",
+    "fallback": "fallback_iss",
+    "formatter": "formatter_iss",
+    "functions": "functionsspace_iss",
+    "geocode_cache": "geocode_cache_iss",
+    "geocoders": "geoproviders_iss",
+    "groundtrack": "groundtrack_iss",
+    "history": "history_iss",
+    "http_client": "http_client_iss",
+    "lazy": "lazy_iss",
+    "monitor": "async_monitor_iss",
+    "offline_geocode": "offline_geocode_iss",
+    "outbox": "outbox_iss",
+    "propagator": "propagator_iss",
+    "scheduler": "scheduler_iss",
+    "service": "service_iss",
+    "singleflight": "singleflight_iss",
+    "store": "store_iss",
+    "tracing": "tracing_iss",
+    "tracking": "livetrack_iss",
+    "webhook": "webhook_iss",
+    "workers": "workers_iss",
+}
+
+# Names that are re-exported from a module -> that module's short name.
+ATTRIBUTES = {
+    "get_access_token": "bot",
+    "get_iss_location": "bot",
+    "predict_iss_location": "bot",
+    "lookup_address": "bot",
+    "lookup_message": "bot",
+    "format_iss_message": "bot",
+    "post_message": "bot",
+    "monitor_room": "bot",
+    "command_registry": "bot",
+    "tracker": "bot",
+    "Registry": "commands",
+    "Context": "commands",
+    "format_message": "formatter",
+    "format_many": "formatter",
+    "GeoRouter": "geocoders",
+    "Revalidator": "fallback",
+    "Propagator": "propagator",
+    "HistoryRecorder": "history",
+    "get_store": "store",
+    "Tracker": "tracking",
+    "Service": "service",
+    "WebhookReceiver": "webhook",
+    "Supervisor": "workers",
+    "HashRing": "workers",
+}
+
+__all__ = sorted(MODULES) + sorted(ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in MODULES:
+        value = importlib.import_module(MODULES[name])
+    elif name in ATTRIBUTES:
+        value = getattr(__getattr__(ATTRIBUTES[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cache it, so the next lookup doesn't come through here.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
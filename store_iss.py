@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# -------------------------------------------------------------------
+# Persistent local store
+# A small SQLite file that survives restarts, so the bot starts warm:
+#   * reverse-geocode results per grid cell (backs the in-memory cache),
+#   * the room list and the rooms picked last time, per Webex account,
+#   * each room's message high-water mark (the get_new_messages cursor),
+#   * which rooms subscribed to live tracking, and how.
+# Nothing is opened until the first read or write, so importing and
+# starting the bot costs no disk I/O. Geocode rows are capped
+# (oldest-used go first) and the file can be compacted to a size limit:
+#
+#   SPACEBOT_STORE=spacebot.db           where to keep it ("off" disables)
+#   python store_iss.py stats [path]
+#   python store_iss.py compact [path]
+# -------------------------------------------------------------------
+
+DEFAULT_PATH = "spacebot.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    cell TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS geocode_used ON geocode (used);
+CREATE TABLE IF NOT EXISTS rooms (
+    account TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT,
+    type TEXT,
+    PRIMARY KEY (account, id)
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    room_id TEXT PRIMARY KEY,
+    message_id TEXT,
+    created TEXT,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def account_key(access_token):
+    """Short, non-reversible id for a token, so room lists are kept per account."""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+
+
+class Store:
+    """SQLite-backed store for geocode cells, rooms and cursors, opened on first use."""
+
+    def __init__(self, path=DEFAULT_PATH, max_geocode_rows=50000, max_bytes=20 * 2 ** 20, trim_every=500):
+        self.path = path
+        self.max_geocode_rows = max_geocode_rows
+        self.max_bytes = max_bytes
+        self.trim_every = trim_every
+        self.lock = threading.Lock()
+        self.db = None
+        self.writes = 0
+
+    def _conn(self):
+        # Called with self.lock held.
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+        return self.db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    # --- geocode cells ---
+
+    def get_geocode(self, cell):
+        """Return (address, expires as unix time) for a cell, or None."""
+        with self.lock:
+            db = self._conn()
+            row = db.execute("SELECT address, expires FROM geocode WHERE cell = ?", (cell,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                db.execute("DELETE FROM geocode WHERE cell = ?", (cell,))
+                return None
+            db.execute("UPDATE geocode SET used = ? WHERE cell = ?", (time.time(), cell))
+        return json.loads(row[0]), row[1]
+
+    def put_geocode(self, cell, address, ttl):
+        with self.lock:
+            db = self._conn()
+            now = time.time()
+            db.execute("INSERT OR REPLACE INTO geocode (cell, address, expires, used) VALUES (?, ?, ?, ?)",
+                        (cell, json.dumps(address, separators=(",", ":")), now + ttl, now))
+            self.writes += 1
+            if self.writes % self.trim_every == 0:
+                self._trim(db)
+
+    def _trim(self, db):
+        """Drop expired cells and the least recently used ones above max_geocode_rows."""
+        db.execute("DELETE FROM geocode WHERE expires <= ?", (time.time(),))
+        extra = db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0] - self.max_geocode_rows
+        if extra > 0:
+            db.execute("DELETE FROM geocode WHERE cell IN (SELECT cell FROM geocode ORDER BY used LIMIT ?)",
+                       (extra,))
+
+    # --- rooms ---
+
+    def save_rooms(self, access_token, rooms):
+        account = account_key(access_token)
+        with self.lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            db.execute("DELETE FROM rooms WHERE account = ?", (account,))
+            db.executemany("INSERT INTO rooms (account, id, title, type) VALUES (?, ?, ?, ?)",
+                           [(account, r["id"], r.get("title", ""), r.get("type", "")) for r in rooms])
+            db.execute("COMMIT")
+
+    def load_rooms(self, access_token):
+        """The room list saved for this account, or None if there is none."""
+        with self.lock:
+            rows = self._conn().execute("SELECT id, title, type FROM rooms WHERE account = ? ORDER BY rowid",
+                                        (account_key(access_token),)).fetchall()
+        return [{"id": i, "title": t, "type": k} for i, t, k in rows] or None
+
+    def save_selection(self, access_token, rooms):
+        """Remember which rooms were picked, as a list of (id, title)."""
+        self._set_meta(f"selection:{account_key(access_token)}", [list(room) for room in rooms])
+
+    def last_selection(self, access_token):
+        """The rooms picked last time as [(id, title)], or []."""
+        return [tuple(room) for room in self._get_meta(f"selection:{account_key(access_token)}", [])]
+
+    def save_subscription(self, room_id, settings):
+        """A room's live-tracking settings ({"mode": ..., "every": ...}), or None to drop them. No tokens."""
+        if settings is None:
+            with self.lock:
+                self._conn().execute("DELETE FROM meta WHERE key = ?", (f"subscription:{room_id}",))
+        else:
+            self._set_meta(f"subscription:{room_id}", settings)
+
+    def get_subscription(self, room_id):
+        return self._get_meta(f"subscription:{room_id}")
+
+    def _set_meta(self, key, value):
+        with self.lock:
+            self._conn().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def _get_meta(self, key, default=None):
+        with self.lock:
+            row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    # --- message cursors ---
+
+    def get_cursor(self, room_id):
+        with self.lock:
+            row = self._conn().execute("SELECT message_id, created FROM cursors WHERE room_id = ?",
+                                       (room_id,)).fetchone()
+        return {"id": row[0], "created": row[1] or ""} if row else None
+
+    def load_cursors(self, room_ids):
+        cursors = {}
+        for room_id in room_ids:
+            cursor = self.get_cursor(room_id)
+            if cursor:
+                cursors[room_id] = cursor
+        return cursors
+
+    def save_cursor(self, room_id, cursor):
+        if not cursor:
+            return
+        with self.lock:
+            self._conn().execute("INSERT OR REPLACE INTO cursors (room_id, message_id, created, updated) "
+                                 "VALUES (?, ?, ?, ?)", (room_id, cursor["id"], cursor.get("created", ""), time.time()))
+
+    def save_cursors(self, cursors):
+        for room_id, cursor in cursors.items():
+            self.save_cursor(room_id, cursor)
+
+    # --- maintenance ---
+
+    def size(self):
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return total
+
+    def compact(self):
+        """Trim the geocode cells, shrink the file under max_bytes and VACUUM it. Returns stats()."""
+        with self.lock:
+            db = self._conn()
+            self._trim(db)
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db.execute("VACUUM")
+            # Still too big: keep dropping the least recently used quarter of the cells.
+            while self.size() > self.max_bytes:
+                count = db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+                if not count:
+                    break
+                db.execute("DELETE FROM geocode WHERE cell IN (SELECT cell FROM geocode ORDER BY used LIMIT ?)",
+                           (max(1, count // 4),))
+                db.execute("VACUUM")
+                db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return self.stats()
+
+    def stats(self):
+        with self.lock:
+            db = self._conn()
+            counts = {table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("geocode", "rooms", "cursors")}
+        counts["bytes"] = self.size()
+        return counts
+
+
+_store = {"instance": None}
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the shared Store from SPACEBOT_STORE (default spacebot.db), or None if set to "off"."""
+    path = os.environ.get("SPACEBOT_STORE", DEFAULT_PATH)
+    if not path or path.lower() == "off":
+        return None
+    with _store_lock:
+        if _store["instance"] is None or _store["instance"].path != path:
+            _store["instance"] = Store(path)
+        return _store["instance"]
+
+
+def main(argv):
+    if not argv or argv[0] not in ("stats", "compact"):
+        print("Usage: python store_iss.py stats|compact [path]")
+        return
+    store = Store(argv[1] if len(argv) > 1 else os.environ.get("SPACEBOT_STORE", DEFAULT_PATH))
+    before = store.stats()
+    if argv[0] == "compact":
+        after = store.compact()
+        print(f"Compacted {store.path}: {before['bytes']} -> {after['bytes']} bytes, "
+              f"{before['geocode']} -> {after['geocode']} geocode cells")
+    else:
+        print(f"{store.path}: {before['geocode']} geocode cells, {before['rooms']} rooms, "
+              f"{before['cursors']} cursors, {before['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+from fake_servers_iss import FakeWebex
+from scheduler_iss import PollScheduler
+
+TOKEN = "Bearer fake"
+
+
+@pytest.fixture
+def webex(monkeypatch):
+    fake = FakeWebex().start()
+    monkeypatch.setattr(bot, "WEBEX_API", fake.url)
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Seconds asked of lookup_after(); answers straight away instead of waiting."""
+    asked = []
+
+    async def lookup_after(seconds, maps_api_key):
+        asked.append(round(seconds))
+        return f"The ISS in {round(seconds)} s"
+
+    monkeypatch.setattr(monitor, "lookup_after", lookup_after)
+    return asked
+
+
+def posted_text(webex):
+    return "\n".join(text for _, _, text in webex.posted)
+
+
+def test_identical_commands_in_a_batch_share_one_lookup(webex, lookups):
+    room = webex.add_room("Space Bot")
+    stats = monitor.new_stats()
+    asyncio.run(monitor.handle_batch(room, ["/3", "/3", "/1", "/nope"], TOKEN, "key", stats))
+    assert sorted(lookups) == [1, 3]
+    assert (stats["commands"], stats["lookups"], stats["replies"], stats["errors"]) == (3, 2, 3, 0)
+    assert posted_text(webex).count("The ISS in 3 s") == 2
+    assert len(stats["latencies"]) == 3
+
+
+def test_a_failed_lookup_is_an_error_not_a_reply(webex, monkeypatch):
+    async def lookup_after(seconds, maps_api_key):
+        return None
+
+    monkeypatch.setattr(monitor, "lookup_after", lookup_after)
+    room = webex.add_room("Space Bot")
+    stats = monitor.new_stats()
+    asyncio.run(monitor.handle_command(room, "/2", TOKEN, "key", stats))
+    assert (stats["replies"], stats["errors"]) == (0, 1) and webex.posted == []
+
+
+def test_watch_room_answers_new_commands_until_stopped(webex, lookups):
+    room = webex.add_room("Space Bot")
+    webex.add_message(room, "/5")       # from before the bot started: not answered
+    stats = monitor.new_stats()
+    cursors = {}
+
+    async def main():
+        stop = asyncio.Event()
+        scheduler = PollScheduler(rate=100, burst=100, min_interval=0.02, max_interval=0.05)
+        watcher = asyncio.create_task(monitor.watch_room(room, TOKEN, "key", stats, 0.02, cursors,
+                                                         scheduler=scheduler, stop=stop))
+        while stats["polls"] < 1:
+            await asyncio.sleep(0.01)
+        webex.add_message(room, "hello")
+        command = webex.add_message(room, "/1")
+        deadline = time.monotonic() + 5
+        while stats["replies"] < 1 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(watcher, 5)
+        return command
+
+    command = asyncio.run(main())
+    assert lookups == [1] and stats["replies"] == 1
+    # The cursor has moved past the command (and maybe onto the reply).
+    ids = [m["id"] for m in webex.messages[room]]
+    assert ids.index(cursors[room]["id"]) >= ids.index(command["id"])
+
+
+def test_pause_wakes_up_when_stopped():
+    async def main():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.05, stop.set)
+        started = time.monotonic()
+        await monitor.pause(10, stop)
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < 1
+
+
+def test_select_rooms(monkeypatch, capsys):
+    rooms = [{"id": "r1", "title": "Space Bot"}, {"id": "r2", "title": "ISS Team"}, {"id": "r3", "title": "Lunch"}]
+    answers = iter(["", "mars", "space, iss"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    assert monitor.select_rooms(rooms) == ["r1", "r2"]
+    out = capsys.readouterr().out
+    assert "at least one room name" in out and "No matching rooms" in out
+    assert monitor.select_rooms([]) == []
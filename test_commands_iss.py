@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+import commands_iss
+from commands_iss import CommandTrie, Context, Registry
+
+
+def make_registry():
+    registry = Registry()
+    registry.register("/", lambda seconds, context: f"delay {seconds}", usage="/<number>",
+                      parse=commands_iss.delay_argument(5), batchable=True)
+    registry.register("/at", lambda args, context: f"at {args}", usage="/at <minutes>")
+    registry.register("/over", lambda args, context: f"over {args}", usage="/over <country>",
+                      batchable=True, cacheable=True)
+    return registry
+
+
+def test_trie_longest_match():
+    trie = CommandTrie()
+    trie.insert("/", "slash")
+    trie.insert("/at", "at")
+    assert trie.match("/at 90") == ("at", "90")
+    assert trie.match("/5") == ("slash", "5")
+    assert trie.match("hello") is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("/at", ("at", "")),
+    ("/at   90 ", ("at", "90")),
+    ("/at\t18:30", ("at", "18:30")),
+    ("/attack", None),
+    ("/at2", None),
+])
+def test_trie_word_boundary(text, expected):
+    trie = CommandTrie()
+    trie.insert("/at", "at")
+    assert trie.match(text) == expected
+
+
+def test_trie_name_ending_in_punctuation_needs_no_space():
+    trie = CommandTrie()
+    trie.insert("/", "slash")
+    assert trie.match("/42") == ("slash", "42")
+
+
+def test_trie_remove():
+    trie = CommandTrie()
+    trie.insert("/", "slash")
+    trie.insert("/at", "at")
+    trie.remove("/at")
+    # "/at" now falls through to "/" with an argument the delay parser would reject.
+    assert trie.match("/at 5") == ("slash", "at 5")
+    trie.remove("/nothing")
+
+
+def test_parse_delay_argument():
+    registry = make_registry()
+    command, argument = registry.parse("/9")
+    assert command.name == "/" and argument == 5
+    assert registry.parse("/-1") is None
+    assert registry.parse("/x") is None
+    assert registry.parse("  /over France ")[1] == "France"
+
+
+def test_plan_shares_batchable_calls():
+    registry = make_registry()
+    planned = registry.plan(["/over France", "/at 5", "/over France", "/at 5", "nonsense"])
+    calls = [call for _, call in planned]
+    assert calls[0] is calls[2]
+    assert calls[1] is not calls[3]     # /at is not batchable
+    assert calls[4] is None
+    assert registry.stats["batched"] == 1 and registry.stats["invalid"] == 1
+
+
+def test_run_once_per_call_and_cache():
+    calls = []
+    registry = Registry()
+    registry.register("/over", lambda args, context: calls.append(args) or f"over {args}",
+                      batchable=True, cacheable=True, cache_ttl=60)
+    context = Context("room")
+    (_, first), = registry.plan(["/over France"])
+    assert registry.run(first, context) == "over France"
+    assert registry.run(first, context) == "over France"
+    (_, second), = registry.plan(["/over France"])
+    assert registry.run(second, context) == "over France"
+    assert calls == ["France"]
+    assert registry.stats["cached"] == 1
+
+
+def test_handler_errors_are_counted_not_raised(capsys):
+    registry = Registry()
+    registry.register("/boom", lambda args, context: 1 / 0)
+    (_, call), = registry.plan(["/boom"])
+    assert registry.run(call, Context()) is None
+    assert call.done
+    assert registry.stats["errors"] == 1
+    assert "ZeroDivisionError" in capsys.readouterr().out
+
+
+def test_run_async_handles_sync_async_and_failing_handlers():
+    registry = Registry()
+
+    async def echo(args, context):
+        return f"echo {args}"
+
+    async def broken(args, context):
+        raise RuntimeError("down")
+
+    registry.register("/echo", echo)
+    registry.register("/sync", lambda args, context: f"sync {args}")
+    registry.register("/broken", broken)
+
+    async def main():
+        planned = registry.plan(["/echo a", "/sync b", "/broken"])
+        return await asyncio.gather(*(registry.run_async(call, Context()) for _, call in planned))
+
+    assert asyncio.run(main()) == ["echo a", "sync b", None]
+    assert registry.stats["errors"] == 1
+
+
+def test_run_async_handler_from_inside_a_running_loop():
+    registry = Registry()
+
+    async def echo(args, context):
+        await asyncio.sleep(0)
+        return f"echo {args}"
+
+    registry.register("/echo", echo)
+
+    async def main():
+        (_, call), = registry.plan(["/echo x"])
+        return registry.run(call, Context())
+
+    assert asyncio.run(main()) == "echo x"
+
+
+def test_copy_overrides_without_touching_the_original():
+    registry = make_registry()
+    other = registry.copy()
+    other.register("/at", lambda args, context: "overridden")
+    assert registry.run(registry.plan(["/at 1"])[0][1], Context()) == "at 1"
+    assert other.run(other.plan(["/at 1"])[0][1], Context()) == "overridden"
+
+
+def test_invalid_message_lists_usages():
+    assert make_registry().invalid_message() == \
+        "Invalid command. Please use /<number>, /at <minutes> or /over <country>."
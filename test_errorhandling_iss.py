@@ -0,0 +1,85 @@
+import pytest
+
+import errorhandling_iss as bot
+from fake_servers_iss import FakeWebex
+
+TOKEN = "Bearer fake"
+
+
+@pytest.fixture
+def webex(monkeypatch):
+    fake = FakeWebex().start()
+    monkeypatch.setattr(bot, "WEBEX_API", fake.url)
+    yield fake
+    fake.stop()
+
+
+def texts(messages):
+    return [m["text"] for m in messages]
+
+
+def test_first_call_only_sets_the_cursor(webex):
+    room = webex.add_room("Space Bot")
+    webex.add_message(room, "old")
+    last = webex.add_message(room, "/5")
+    messages, cursor = bot.get_new_messages(room, TOKEN)
+    assert messages == []
+    assert cursor["id"] == last["id"]
+
+
+def test_empty_room_then_new_messages(webex):
+    room = webex.add_room("Space Bot")
+    messages, cursor = bot.get_new_messages(room, TOKEN)
+    assert messages == [] and cursor == {"id": None, "created": ""}
+    webex.add_message(room, "/1")
+    messages, cursor = bot.get_new_messages(room, TOKEN, cursor)
+    assert texts(messages) == ["/1"]
+
+
+def test_new_messages_oldest_first_and_nothing_twice(webex):
+    room = webex.add_room("Space Bot")
+    webex.add_message(room, "before")
+    _, cursor = bot.get_new_messages(room, TOKEN)
+    for text in ("/1", "/2", "/3"):
+        webex.add_message(room, text)
+    messages, cursor = bot.get_new_messages(room, TOKEN, cursor)
+    assert texts(messages) == ["/1", "/2", "/3"]
+    messages, cursor = bot.get_new_messages(room, TOKEN, cursor)
+    assert messages == []
+
+
+def test_pages_back_to_the_cursor(webex):
+    room = webex.add_room("Space Bot")
+    webex.add_message(room, "before")
+    _, cursor = bot.get_new_messages(room, TOKEN)
+    sent = [f"/{i}" for i in range(12)]
+    for text in sent:
+        webex.add_message(room, text)
+    before = webex.calls.get("list_messages", 0)
+    messages, cursor = bot.get_new_messages(room, TOKEN, cursor, page_size=5)
+    assert texts(messages) == sent
+    # 5 + 5 + the page that reaches the cursor.
+    assert webex.calls["list_messages"] - before == 3
+    assert cursor["id"] == messages[-1]["id"]
+
+
+def test_max_pages_bounds_a_backlog(webex):
+    room = webex.add_room("Space Bot")
+    webex.add_message(room, "before")
+    _, cursor = bot.get_new_messages(room, TOKEN)
+    for i in range(20):
+        webex.add_message(room, f"/{i}")
+    messages, cursor = bot.get_new_messages(room, TOKEN, cursor, page_size=5, max_pages=2)
+    # Only the newest two pages are read; the cursor still moves to the newest message.
+    assert texts(messages) == [f"/{i}" for i in range(10, 20)]
+    assert cursor["id"] == messages[-1]["id"]
+
+
+def test_error_keeps_the_cursor(webex, capsys):
+    room = webex.add_room("Space Bot")
+    webex.add_message(room, "before")
+    _, cursor = bot.get_new_messages(room, TOKEN)
+    webex.add_message(room, "/1")
+    messages, same = bot.get_new_messages("no-such-room", TOKEN, cursor)
+    assert messages is None and same is cursor
+    assert "status 404" in capsys.readouterr().out
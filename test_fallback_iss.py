@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+from fallback_iss import PositionFallback, Revalidator, describe_age, staleness_note
+
+
+class Upstream:
+    """fetch() for a Revalidator: answers, fails (None) or hangs, as told."""
+
+    def __init__(self):
+        self.value = "v1"
+        self.hang = threading.Event()
+        self.hang.set()
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.hang.wait(5)
+        return self.value
+
+
+@pytest.fixture
+def upstream():
+    fetch = Upstream()
+    yield fetch
+    fetch.hang.set()
+
+
+def test_fresh_answer_comes_from_upstream(upstream):
+    cache = Revalidator("test", upstream, timeout=1.0)
+    assert cache.get("k") == ("v1", 0.0)
+    assert cache.report()["upstream"] == 1
+
+
+def test_stale_answer_while_upstream_fails(upstream):
+    cache = Revalidator("test", upstream, timeout=1.0, max_stale=60, retry_every=60)
+    cache.get("k")
+    upstream.value = None
+    value, age = cache.get("k")
+    assert value == "v1" and age > 0
+    assert cache.report()["failing"]
+    # Failing: answered from the old value without asking upstream again.
+    calls = upstream.calls
+    assert cache.get("k")[0] == "v1"
+    assert upstream.calls == calls
+
+
+def test_stale_answer_when_upstream_is_too_slow(upstream):
+    cache = Revalidator("test", upstream, timeout=0.05)
+    cache.get("k")
+    upstream.hang.clear()
+    started = time.monotonic()
+    assert cache.get("k")[0] == "v1"
+    assert time.monotonic() - started < 0.5
+    assert cache.report()["timeouts"] == 1
+    # The slow call finishes in the background and its answer is kept.
+    upstream.value = "v2"
+    upstream.hang.set()
+    for _ in range(50):
+        if not cache.refreshing:
+            break
+        time.sleep(0.01)
+    assert cache.entries["k"][0] == "v2"
+
+
+def test_too_old_is_a_miss(upstream):
+    cache = Revalidator("test", upstream, timeout=1.0, max_stale=0.05)
+    cache.get("k")
+    upstream.value = None
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.report()["misses"] == 1
+
+
+def test_fresh_for_skips_upstream(upstream):
+    cache = Revalidator("test", upstream, fresh_for=60)
+    cache.get("k")
+    cache.get("k")
+    assert upstream.calls == 1 and cache.report()["fresh"] == 1
+
+
+def test_recovers_after_retry_every(upstream):
+    cache = Revalidator("test", upstream, timeout=1.0, retry_every=0.05)
+    cache.get("k")
+    upstream.value = None
+    cache.get("k")
+    upstream.value = "v2"
+    time.sleep(0.1)
+    cache.get("k")      # starts the retry and, not having to wait, answers stale
+    for _ in range(50):
+        if not cache.report()["failing"]:
+            break
+        time.sleep(0.01)
+    assert cache.get("k") == ("v2", 0.0)
+
+
+def test_fetch_exception_counts_as_failure(capsys):
+    def broken():
+        raise RuntimeError("boom")
+
+    cache = Revalidator("test", broken, timeout=1.0)
+    assert cache.get("k") is None
+    assert cache.report()["failures"] == 1
+    assert "boom" in capsys.readouterr().out
+
+
+def test_position_is_extrapolated_from_the_last_two_fixes():
+    fixes = iter([{"lat": "10.0", "lon": "20.0", "timestamp": 1000},
+                  {"lat": "10.5", "lon": "21.0", "timestamp": 1010}])
+    fallback = PositionFallback(lambda: next(fixes, None), timeout=1.0, retry_every=60)
+    assert fallback.get()["lat"] == "10.0"
+    assert fallback.get()["lat"] == "10.5"
+    estimate = fallback.extrapolate(20)
+    assert (estimate["lat"], estimate["lon"], estimate["timestamp"]) == ("11.5000", "23.0000", 1030)
+    stale = fallback.get()
+    assert stale["estimated"] and stale["age"] > 0
+    assert "Estimated" in staleness_note(stale)
+
+
+def test_extrapolation_wraps_the_date_line_and_stops_at_the_limit():
+    fallback = PositionFallback(None, max_extrapolate=100)
+    fallback.fixes.extend([(0, 0.0, 179.0), (10, 0.0, -179.0)])
+    assert fallback.extrapolate(10)["lon"] == "-177.0000"
+    assert fallback.extrapolate(101) is None
+
+
+def test_describe_age():
+    assert describe_age(42) == "42 s"
+    assert describe_age(600) == "10 min"
+    assert describe_age(7260) == "2 h 1 min"
+
+
+def test_new_keys_still_ask_while_failing(upstream):
+    cache = Revalidator("test", upstream, timeout=1.0, retry_every=60)
+    cache.get("old")
+    upstream.value = None
+    cache.get("old")
+    assert cache.report()["failing"]
+    # The upstream is back: a key with nothing stale to serve asks it straight away...
+    upstream.value = "v2"
+    assert cache.get("new") == ("v2", 0.0)
+    # ...and that success ends the failing state for every key.
+    assert not cache.report()["failing"]
+    assert cache.get("old") == ("v2", 0.0)
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from formatter_iss import country_name, format_card, format_many, format_message
+
+T = 1_800_000_000
+WHEN = time.ctime(T)
+PARIS = {"country_code": "fr", "state": "Île-de-France", "city": "Paris"}
+REGION = {"country_code": "fr", "state": "Brittany"}
+
+
+@pytest.mark.parametrize("address, expected", [
+    (PARIS, f"On {WHEN}, the ISS was above Paris, Île-de-France, France.\nCoordinates: (48.85°, 2.35°)"),
+    (REGION, f"On {WHEN}, the ISS was above Brittany, France.\nCoordinates: (48.85°, 2.35°)"),
+    ({"country_code": "xz"}, f"On {WHEN}, the ISS was over the ocean at (48.85°, 2.35°)."),
+    ({}, f"On {WHEN}, the ISS was over the ocean at (48.85°, 2.35°)."),
+    (None, f"On {WHEN}, the ISS was at (48.85°, 2.35°). (The address lookup isn't answering right now.)"),
+])
+def test_bot_text(address, expected):
+    assert format_message("48.85", "2.35", T, address) == expected
+
+
+def test_classic_text():
+    assert format_message("48.85", "2.35", T, PARIS, style="classic") == \
+        f"In Paris, Île-de-France, the ISS was flying over on {WHEN}.\nCoordinates: (48.85°, 2.35°)\nCountry: France"
+    assert format_message("0", "-30", T, {}, style="classic") == \
+        f"On {WHEN}, the ISS was flying over a body of water at latitude 0° and longitude -30°."
+
+
+def test_town_counts_as_the_city():
+    reply = format_message("48.85", "2.35", T, {"country_code": "fr", "state": "Normandy", "town": "Bayeux"})
+    assert "above Bayeux, Normandy, France" in reply
+
+
+def test_unknown_country_codes():
+    assert country_name("fr") == "France"
+    assert country_name("qq") == "QQ"
+    assert country_name("qq", "Unknown Country") == "Unknown Country"
+    assert "Unknown Country" in format_message("1", "2", T, {"country_code": "qq", "state": "S"})
+    assert "Country: QQ" in format_message("1", "2", T, {"country_code": "qq", "state": "S", "city": "C"},
+                                           style="classic")
+
+
+def test_markdown():
+    assert format_message("48.85", "2.35", T, PARIS, view="markdown") == \
+        f"On {WHEN}, the ISS was above **Paris, Île-de-France, France**.\nCoordinates: `(48.85°, 2.35°)`"
+
+
+def test_card():
+    card = format_card("48.85", "2.35", T, PARIS)
+    assert card["contentType"] == "application/vnd.microsoft.card.adaptive"
+    title, facts = card["content"]["body"]
+    assert title["text"] == "The ISS is above Paris"
+    assert facts["facts"] == [{"title": "Time", "value": WHEN},
+                              {"title": "Place", "value": "Paris, Île-de-France"},
+                              {"title": "Country", "value": "France"},
+                              {"title": "Coordinates", "value": "48.85°, 2.35°"}]
+    ocean = format_card("0", "-30", T, {})["content"]["body"]
+    assert ocean[0]["text"] == "The ISS is over the ocean"
+    assert [fact["title"] for fact in ocean[1]["facts"]] == ["Time", "Coordinates"]
+
+
+def test_format_many_formats_each_position_once():
+    items = [("48.85", "2.35", T, PARIS), ("0", "-30", T, {}), ("48.85", "2.35", T, dict(PARIS)),
+             ("48.85", "2.35", T, None)]
+    replies = format_many(items, view="card")
+    assert replies[0] is replies[2] and replies[0] is not replies[3]
+    assert format_many(items) == [format_message(*item) for item in items]
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from geocode_cache_iss import GeoCache, geohash, grid_cell
+
+FRANCE = {"country_code": "fr", "country": "France", "city": "Paris", "road": "Rue de Rivoli"}
+
+
+def test_nearby_points_share_a_cell():
+    cache = GeoCache(cell_size=0.25)
+    cache.put(48.85, 2.35, FRANCE)
+    assert cache.get(48.80, 2.30) == {"country_code": "fr", "country": "France", "city": "Paris"}
+    assert cache.get(49.5, 2.35) is None
+
+
+def test_geohash_cells():
+    assert geohash(57.64911, 10.40744, 6) == "u4pruy"
+    cache = GeoCache(cell="geohash", precision=4)
+    cache.put(48.85, 2.35, FRANCE)
+    assert cache.key(48.86, 2.36) == cache.key(48.85, 2.35)
+    assert cache.get(48.86, 2.36)["country_code"] == "fr"
+    with pytest.raises(ValueError):
+        GeoCache(cell="hex")
+
+
+def test_grid_cell():
+    assert grid_cell(-90, -180) == (0, 0)
+    assert grid_cell(0.1, 0.1, cell_size=1.0) == (90, 180)
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = GeoCache(cell_size=1.0, max_entries=2)
+    cache.put(10, 10, {"country_code": "a"})
+    cache.put(20, 20, {"country_code": "b"})
+    assert cache.get(10, 10) is not None    # now (20, 20) is the oldest
+    cache.put(30, 30, {"country_code": "c"})
+    assert cache.get(20, 20) is None
+    assert cache.get(10, 10)["country_code"] == "a"
+    assert cache.get(30, 30)["country_code"] == "c"
+    assert cache.report()["evictions"] == 1
+
+
+def test_entries_expire_after_their_ttl():
+    cache = GeoCache(ttl=0.05, negative_ttl=10)
+    cache.put(48.85, 2.35, FRANCE)
+    cache.put(0, -30, {"ocean": "Atlantic Ocean"})
+    time.sleep(0.1)
+    assert cache.get(48.85, 2.35) is None
+    assert cache.get(0, -30) == {"ocean": "Atlantic Ocean"}
+    assert cache.report()["expired"] == 1
+
+
+def test_negative_entries_have_their_own_ttl_and_counter():
+    cache = GeoCache(ttl=10, negative_ttl=0.05)
+    cache.put(0, -30, {})
+    assert cache.get(0, -30) == {}
+    assert cache.report()["negative_hits"] == 1
+    time.sleep(0.1)
+    assert cache.get(0, -30) is None
+
+
+def test_get_returns_a_copy():
+    cache = GeoCache()
+    cache.put(48.85, 2.35, FRANCE)
+    cache.get(48.85, 2.35)["city"] = "Lyon"
+    assert cache.get(48.85, 2.35)["city"] == "Paris"
+
+
+def test_report_hit_ratio():
+    cache = GeoCache()
+    cache.get(1, 1)
+    cache.put(1, 1, FRANCE)
+    cache.get(1, 1)
+    report = cache.report()
+    assert (report["hits"], report["misses"], report["size"]) == (1, 1, 1)
+    assert report["hit_ratio"] == 0.5
+
+
+def test_print_report(capsys):
+    cache = GeoCache()
+    cache.get(1, 1)
+    cache.put(1, 1, FRANCE)
+    cache.get(1, 1)
+    cache.print_report()
+    assert capsys.readouterr().out == ("Geocode cache: 1 hits, 0 ocean hits, 0 from the store, 1 misses (50% hit), "
+                                       "1 cells, 0 evicted, 0 expired\n")
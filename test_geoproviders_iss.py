@@ -0,0 +1,141 @@
+import threading
+import time
+
+from geoproviders_iss import CircuitBreaker, GeoRouter, Provider
+
+PARIS = {"country_code": "fr", "city": "Paris"}
+
+
+class FakeProvider(Provider):
+    def __init__(self, name, answer=PARIS, delay=0.0, fallback=False):
+        super().__init__(name)
+        self.answer = answer
+        self.delay = delay
+        self.fallback = fallback
+        self.asked = 0
+
+    def fetch(self, lat, lon, api_key):
+        self.asked += 1
+        time.sleep(self.delay)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer
+
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.record(False)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.available() and not breaker.allow()
+
+
+def test_breaker_success_resets_the_count():
+    breaker = CircuitBreaker(threshold=2)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    # available() is only a look; it doesn't use up the trial.
+    assert breaker.available() and breaker.available()
+    assert breaker.allow()
+    assert not breaker.allow() and not breaker.available()
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+
+def test_router_prefers_the_faster_provider():
+    slow = FakeProvider("slow", {"country_code": "de"})
+    fast = FakeProvider("fast")
+    slow.latencies.extend([0.5] * 10)
+    fast.latencies.extend([0.01] * 10)
+    router = GeoRouter([slow, fast])
+    assert [p.name for p in router.ranked()] == ["fast", "slow"]
+    assert router.lookup(48.85, 2.35, "key") == PARIS
+    assert slow.asked == 0
+
+
+def test_router_hedges_a_slow_provider():
+    slow = FakeProvider("slow", {"country_code": "de"}, delay=0.5)
+    slow.latencies.extend([0.01] * 10)      # usually fast, so ranked first
+    backup = FakeProvider("backup")
+    backup.latencies.extend([0.2] * 10)
+    router = GeoRouter([slow, backup], first_deadline=0.05, min_hedge=0.05)
+    started = time.monotonic()
+    assert router.lookup(48.85, 2.35, "key") == PARIS
+    assert time.monotonic() - started < 0.4
+    assert router.report()["hedged"] == 1
+
+
+def test_router_fails_over_to_the_next_provider():
+    broken = FakeProvider("broken", answer=RuntimeError("down"))
+    good = FakeProvider("good")
+    good.latencies.extend([1.0] * 10)       # ranked behind broken until it fails
+    router = GeoRouter([broken, good], first_deadline=5.0)
+    started = time.monotonic()
+    assert router.lookup(1, 1, "key") == PARIS
+    assert time.monotonic() - started < 1.0
+    assert broken.asked == 1 and router.report()["failovers"] == 1
+    # Its error rate now ranks it last.
+    assert [p.name for p in router.ranked()] == ["good", "broken"]
+
+
+def test_router_skips_providers_with_an_open_breaker():
+    broken = FakeProvider("broken")
+    good = FakeProvider("good")
+    for _ in range(broken.breaker.threshold):
+        broken.breaker.record(False)
+    router = GeoRouter([broken, good])
+    assert router.ranked() == [good]
+    assert router.lookup(1, 1, "key") == PARIS
+    assert broken.asked == 0
+    assert router.report()["skipped"] >= 1
+
+
+def test_half_open_provider_gets_exactly_one_trial():
+    flaky = FakeProvider("flaky", delay=0.2)
+    flaky.breaker = CircuitBreaker(threshold=1, cooldown=0.0)
+    flaky.breaker.record(False)
+    other = FakeProvider("other", delay=0.2)
+    other.latencies.extend([1.0] * 10)
+    router = GeoRouter([flaky, other], first_deadline=5.0)
+    threads = [threading.Thread(target=router.lookup, args=(1, 1, "key")) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert flaky.asked == 1
+    assert flaky.breaker.state == "closed"
+
+
+def test_offline_fallback_when_everything_fails():
+    broken = FakeProvider("broken", answer=None)
+    offline = FakeProvider("offline", {"country_code": "fr"}, fallback=True)
+    router = GeoRouter([broken, offline])
+    assert router.ranked() == [broken]
+    assert router.lookup(1, 1, "key") == {"country_code": "fr"}
+    assert router.report()["fallbacks"] == 1
+
+
+def test_nothing_answers():
+    router = GeoRouter([FakeProvider("a", answer=None), FakeProvider("b", answer=None)])
+    assert router.lookup(1, 1, "key") is None
+    assert router.report()["failed"] == 1
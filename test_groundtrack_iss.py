@@ -0,0 +1,72 @@
+import calendar
+
+import pytest
+
+import groundtrack_iss
+from groundtrack_iss import handle_track_command, parse_when
+
+NOW = calendar.timegm((2026, 10, 18, 12, 30, 20))
+
+
+class Track:
+    """A 12 hour window that puts the ISS at (1, 2) whatever the time."""
+
+    def __init__(self, start):
+        self.start, self.end = start, start + 12 * 3600
+
+    def covers(self, unix_time):
+        return self.start <= unix_time <= self.end
+
+    def position_at(self, unix_time):
+        return {"lat": 1.0, "lon": 2.0, "timestamp": unix_time}
+
+
+@pytest.fixture
+def track(monkeypatch):
+    track = Track(groundtrack_iss.time.time() - 1)
+    monkeypatch.setattr(groundtrack_iss, "get_track", lambda: track)
+    return track
+
+
+@pytest.mark.parametrize("arg, seconds", [
+    ("90", 5400),
+    ("+5", 300),
+    ("0", 0),
+    ("-5", -300),
+    ("13:00", 29 * 60 + 40),
+    ("12:30", 0),                       # the current minute is now, not tomorrow
+    ("12:29", 86400 - 80),              # gone by today, so tomorrow
+    ("00:00", 86400 - (12 * 3600 + 30 * 60 + 20)),
+])
+def test_parse_when(arg, seconds):
+    assert parse_when(arg, NOW) - NOW == seconds
+
+
+@pytest.mark.parametrize("arg", ["24:00", "12:60", "noon", ""])
+def test_parse_when_rejects(arg):
+    with pytest.raises(ValueError):
+        parse_when(arg, NOW)
+
+
+def test_at_in_the_future(track):
+    reply = handle_track_command("/at 30", describe=lambda lat, lon, ts: f"({lat}, {lon}) at {ts - track.start:.0f}")
+    assert reply == "(1.0, 2.0) at 1801"
+
+
+def test_at_in_the_past_gets_its_own_reply(track):
+    assert handle_track_command("/at -10") == \
+        "That is in the past: /at only predicts ahead. Use /0 for where the ISS is now."
+
+
+def test_at_beyond_the_window_reports_what_is_left_of_it(track):
+    # The track started a second ago, so a little under 12 hours are left.
+    assert handle_track_command("/at 1000") == "I can only predict up to 11 h 59 min ahead."
+    track.end = groundtrack_iss.time.time() + 5 * 3600 + 30
+    assert handle_track_command("/at 330") == "I can only predict up to 5 h 0 min ahead."
+
+
+def test_usage_and_other_commands(track):
+    assert handle_track_command("/at").startswith("Use /at")
+    assert handle_track_command("/at soon").startswith("Use /at")
+    assert handle_track_command("/pass 100 0").startswith("Use /pass")
+    assert handle_track_command("/over France") is None
@@ -0,0 +1,129 @@
+import calendar
+import time
+
+import pytest
+
+import history_iss
+from history_iss import HistoryRecorder, handle_history_command, parse_window
+
+NOW = calendar.timegm((2026, 10, 18, 12, 0, 0))
+TODAY = NOW - NOW % history_iss.DAY
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = HistoryRecorder(str(tmp_path), max_gap=30)
+    # Yesterday 23:00-23:05 over Germany, today 06:00-06:10 over France, then ocean until noon.
+    for t in range(TODAY - 3600, TODAY - 3300, 10):
+        recorder.record(t, 50.0, 10.0, "de")
+    for t in range(TODAY + 6 * 3600, TODAY + 6 * 3600 + 600, 10):
+        recorder.record(t, 48.0, 2.0, "fr")
+    for t in range(TODAY + 6 * 3600 + 600, NOW, 10):
+        recorder.record(t, 0.0, -30.0, "")
+    recorder.flush()
+    return recorder
+
+
+def over(recorder, args):
+    return handle_history_command(f"/over {args}", recorder=recorder, now=NOW)
+
+
+def test_parse_window():
+    assert parse_window("today", NOW) == (TODAY, "Today")
+    assert parse_window("6h", NOW) == (NOW - 6 * 3600, "In the last 6 hours")
+    assert parse_window("1d", NOW) == (NOW - 86400, "In the last 1 day")
+    with pytest.raises(ValueError):
+        parse_window("6m", NOW)
+
+
+def test_over_today(recorder):
+    assert over(recorder, "France") == \
+        f"Today the ISS spent 10 min over France (from {60 + 2100} recorded positions)."
+    assert "0 s over Germany" in over(recorder, "Germany today")
+
+
+@pytest.mark.parametrize("window, expected", [
+    ("1h", "In the last 1 hour the ISS spent 0 s over France"),
+    ("6h", "In the last 6 hours the ISS spent 10 min over France"),
+    ("2d", "In the last 2 days the ISS spent 10 min over France"),
+])
+def test_over_windows(recorder, window, expected):
+    assert over(recorder, f"France {window}").startswith(expected)
+
+
+def test_window_reaches_into_yesterday(recorder):
+    assert "5 min over Germany" in over(recorder, "DE 2d")
+    assert "5 min over Germany" in over(recorder, "deu 24h")
+
+
+def test_country_names_and_ocean(recorder):
+    assert "over the ocean" in over(recorder, "ocean 6h")
+    assert "over United Kingdom" in over(recorder, "united kingdom")
+
+
+def test_bad_arguments_get_the_usage(recorder):
+    usage = "Use /over <country> [today|6h|7d], e.g. /over France today"
+    assert over(recorder, "Atlantis") == usage
+    assert handle_history_command("/over", recorder=recorder, now=NOW) == usage
+
+
+def test_no_fixes_in_the_window(tmp_path):
+    empty = HistoryRecorder(str(tmp_path))
+    assert over(empty, "France") == "No position history has been recorded for that period yet."
+
+
+def test_history_off(monkeypatch):
+    monkeypatch.delenv("SPACEBOT_HISTORY", raising=False)
+    assert handle_history_command("/over France", now=NOW).startswith("Position history is not being recorded")
+    assert handle_history_command("/at 5") is None
+
+
+def test_read_only_recorder_sees_the_writer(recorder):
+    reader = HistoryRecorder(recorder.directory, read_only=True)
+    assert not reader.record(NOW + 10, 0.0, 0.0, "fr")
+    recorder.record(NOW + 10, 40.0, -3.0, "es")
+    recorder.flush()
+    assert reader.query(NOW, NOW + 20) == [(NOW + 10, 40.0, -3.0, "ES")]
+
+
+def test_unknown_fixes_are_not_ocean_and_can_be_tagged_later(tmp_path):
+    recorder = HistoryRecorder(str(tmp_path), max_gap=30, flush_every=3)
+    for i in range(6):
+        recorder.record(TODAY + 60 + 10 * i, 48.0, 2.0, history_iss.UNKNOWN)
+    assert "10 s over the ocean" not in over(recorder, "ocean")
+    assert "the country is not known" in over(recorder, "France")
+    # The first three are flushed to disk already, the rest still buffered.
+    for i in range(6):
+        assert recorder.tag(TODAY + 60 + 10 * i, "fr")
+    assert not recorder.tag(TODAY + 60, "de")     # placed already
+    assert not recorder.tag(TODAY + 65, "fr")     # no such fix
+    reply = over(recorder, "France")
+    assert reply.startswith("Today the ISS spent 1 min over France") and "not known" not in reply
+
+
+def test_fetched_fixes_are_placed_by_their_reverse_geocode(tmp_path, monkeypatch):
+    import errorhandling_iss as bot
+    from fake_servers_iss import FakeLocationIQ, FakeOpenNotify
+    from geocode_cache_iss import GeoCache
+    from singleflight_iss import SingleFlight
+
+    iss, geocode = FakeOpenNotify().start(), FakeLocationIQ().start()
+    iss.position = lambda unix_time: (48.85, 2.35)     # over Paris
+    monkeypatch.setattr(bot, "ISS_API", iss.url)
+    monkeypatch.setattr(bot, "LOCATIONIQ_API", f"{geocode.url}/v1")
+    monkeypatch.setattr(bot, "geocode_cache", GeoCache())
+    monkeypatch.setattr(bot, "iss_flight", SingleFlight("ISS position"))
+    monkeypatch.setattr(history_iss, "_recorder", {"recorder": None, "sampler": None})
+    monkeypatch.setenv("SPACEBOT_HISTORY", str(tmp_path))
+    bot.geocode_fallback.clear()
+    try:
+        first = bot.sample_position("key")
+        while int(bot.sample_position("key")["timestamp"]) == int(first["timestamp"]):
+            time.sleep(0.05)
+    finally:
+        iss.stop()
+        geocode.stop()
+    # The first fix was recorded before its cell was known and placed once the geocode came back.
+    reply = handle_history_command("/over France", now=time.time())
+    assert "over France (from 2 recorded positions)" in reply and " 0 s " not in reply
+    assert handle_history_command("/over ocean", now=time.time()).startswith("Today the ISS spent 0 s")
@@ -0,0 +1,57 @@
+import pytest
+
+from fake_servers_iss import FakeOpenNotify
+from http_client_iss import DEFAULT_TIMEOUT, HttpClient
+
+
+@pytest.fixture
+def iss():
+    server = FakeOpenNotify().start()
+    yield server
+    server.stop()
+
+
+def test_connections_are_reused(iss):
+    client = HttpClient()
+    for _ in range(5):
+        assert client.get(f"{iss.url}/iss-now.json", endpoint="iss").status_code == 200
+    report = client.report()
+    assert (report["requests"], report["connections_opened"], report["connections_reused"]) == (5, 1, 4)
+    assert report["reuse_ratio"] == 0.8
+    client.close()
+    assert client.sessions == {}
+
+
+def test_one_session_per_host(iss):
+    client = HttpClient(pool_sizes={"localhost": 2})
+    client.get(f"{iss.url}/iss-now.json")
+    client.get(f"{iss.url}/iss-now.json".replace("127.0.0.1", "localhost"))
+    assert sorted(client.sessions) == ["127.0.0.1", "localhost"]
+    assert client.sessions["localhost"].get_adapter("http://localhost")._pool_maxsize == 2
+    assert client.sessions["127.0.0.1"].get_adapter("http://127.0.0.1")._pool_maxsize == client.pool_maxsize
+    client.close()
+
+
+def test_endpoint_timeouts_and_hooks(iss, monkeypatch):
+    client = HttpClient(timeouts={"iss": (1, 2)})
+    seen = []
+    client.response_hooks.append(lambda response: seen.append((response.status_code, response.endpoint)))
+    sent = []
+    session = client.session_for(iss.url)
+    original = session.request
+
+    def request(method, url, **kwargs):
+        sent.append(kwargs["timeout"])
+        return original(method, url, **kwargs)
+
+    monkeypatch.setattr(session, "request", request)
+    client.get(f"{iss.url}/iss-now.json", endpoint="iss")
+    client.get(f"{iss.url}/iss-now.json", endpoint="something else")
+    client.get(f"{iss.url}/iss-now.json", endpoint="iss", timeout=9)
+    assert sent == [(1, 2), DEFAULT_TIMEOUT, 9]
+    assert seen == [(200, "iss"), (200, "something else"), (200, "iss")]
+
+
+def test_print_report(capsys):
+    HttpClient().print_report()
+    assert capsys.readouterr().out.startswith("HTTP requests: 0, connections opened: 0, reused: 0 (0%)")
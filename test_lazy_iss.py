@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import lazy_iss
+
+
+def imported_after(code):
+    """The names of all the modules loaded after running `code` in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", f"{code}\nimport sys\nprint(' '.join(sorted(sys.modules)))"],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return set(result.stdout.split())
+
+
+def test_nothing_is_imported_until_first_use():
+    module = lazy_iss.module("json")
+    assert "not loaded yet" in repr(module)
+    assert module.dumps([1]) == "[1]"
+    assert "loaded" in repr(module) and "not" not in repr(module)
+    # Later lookups are plain attributes.
+    assert "dumps" in vars(module)
+
+
+def test_optional_modules_are_falsy_when_missing():
+    missing = lazy_iss.optional("no_such_module_for_the_test")
+    assert not missing
+    with pytest.raises(AttributeError):
+        missing.anything
+    with pytest.raises(ImportError):
+        lazy_iss.module("no_such_module_for_the_test").anything
+
+
+def test_importing_the_package_imports_nothing():
+    loaded = imported_after("import spacebot")
+    assert not {name for name in loaded if name.endswith("_iss")}
+
+
+def test_package_names_load_their_module():
+    loaded = imported_after("import spacebot\nassert spacebot.HashRing is spacebot.workers.HashRing")
+    assert "workers_iss" in loaded
+
+
+@pytest.mark.parametrize("module", ["errorhandling_iss", "workers_iss", "webhook_iss"])
+def test_heavy_modules_stay_deferred(module):
+    loaded = imported_after(f"import {module}")
+    assert not {"numpy", "http.server", "iso3166"} & loaded
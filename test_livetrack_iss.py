@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+
+import livetrack_iss
+from livetrack_iss import Tracker, describe_every, parse_every
+from store_iss import Store
+
+T = 1_800_000_000
+
+
+class Sky:
+    """locate() / geocode() for a Tracker, with a country the test can move."""
+
+    def __init__(self):
+        self.country = "fr"
+        self.calls = {"locate": 0, "geocode": 0}
+
+    def locate(self):
+        self.calls["locate"] += 1
+        return {"lat": "48.0", "lon": "2.0", "timestamp": T}
+
+    def geocode(self, lat, lon, key):
+        self.calls["geocode"] += 1
+        return {"country_code": self.country, "state": "S"} if self.country is not None else None
+
+
+@pytest.fixture
+def sky():
+    return Sky()
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def tracker(sky, sent, monkeypatch):
+    tracker = Tracker(sky.locate, sky.geocode, lambda lat, lon, ts, address: f"at {lat}, {lon}",
+                      lambda room_id, text, token: sent.append((room_id, text)))
+    # Tests drive tick() themselves instead of the background thread.
+    monkeypatch.setattr(tracker, "_start", lambda: None)
+    return tracker
+
+
+def command(tracker, text, room_id="r1"):
+    return tracker.handle_command(text, SimpleNamespace(room_id=room_id, access_token="Bearer t", maps_api_key="k"))
+
+
+@pytest.mark.parametrize("arg, seconds", [("30", 1800), ("30m", 1800), ("90s", 90), ("2h", 7200), (" 5 M ", 300)])
+def test_parse_every(arg, seconds):
+    assert parse_every(arg) == seconds
+
+
+def test_describe_every():
+    assert (describe_every(7200), describe_every(1800), describe_every(90)) == ("2 h", "30 min", "90 s")
+
+
+def test_subscribe_commands(tracker):
+    assert command(tracker, "/subscribe").startswith("Subscribed: I'll post the ISS position every 10 min.")
+    assert command(tracker, "/subscribe 2h", "r2").startswith("Subscribed: I'll post the ISS position every 2 h.")
+    assert command(tracker, "/subscribe country", "r3").startswith("Subscribed: I'll post whenever")
+    assert command(tracker, "/subscribe 30s") == "The shortest interval is 1 min."
+    assert command(tracker, "/subscribe often") == livetrack_iss.USAGE
+    assert (tracker.subscriptions["r2"].every, tracker.subscriptions["r3"].mode) == (7200, "country")
+    assert command(tracker, "/unsubscribe") == "Unsubscribed. No more ISS updates for this room."
+    assert command(tracker, "/unsubscribe") == "This room isn't subscribed."
+
+
+def test_one_fix_is_fanned_out_to_every_due_room(tracker, sky, sent):
+    for room_id in ("r1", "r2", "r3"):
+        command(tracker, "/subscribe 10m", room_id)
+    command(tracker, "/subscribe 1h", "r4")
+    # Every new subscription gets its first update right away...
+    now = max(sub.last_sent + sub.every for sub in tracker.subscriptions.values())
+    tracker.tick(now)
+    assert sorted(room for room, _ in sent) == ["r1", "r2", "r3", "r4"]
+    assert sky.calls == {"locate": 1, "geocode": 1}
+    # ...then nobody is due for a while: no upstream calls at all.
+    tracker.tick(now + 5)
+    assert sky.calls["locate"] == 1
+    del sent[:]
+    tracker.tick(now + 600)
+    assert sorted(room for room, _ in sent) == ["r1", "r2", "r3"]
+    assert sky.calls == {"locate": 2, "geocode": 2}
+
+
+def test_next_delay(tracker):
+    assert tracker.next_delay(T) is None
+    command(tracker, "/subscribe 10m")
+    sub = tracker.subscriptions["r1"]
+    assert tracker.next_delay(sub.last_sent + 100) == pytest.approx(500)
+    command(tracker, "/subscribe country", "r2")
+    assert tracker.next_delay(sub.last_sent + 100) == livetrack_iss.COUNTRY_CHECK
+
+
+def test_country_subscribers_hear_about_crossings_only(tracker, sky, sent):
+    command(tracker, "/subscribe country")
+    tracker.tick(T)
+    sky.country = None          # no address: can't tell, so no crossing
+    tracker.tick(T + 15)
+    tracker.tick(T + 30)
+    assert sent == []
+    sky.country = "de"
+    tracker.tick(T + 45)
+    assert sent == [("r1", "The ISS just crossed into Germany.\nat 48.0, 2.0")]
+    assert tracker.stats["crossings"] == 1
+
+
+def test_subscriptions_survive_a_restart(tmp_path, sky, monkeypatch):
+    store = Store(str(tmp_path / "spacebot.db"))
+    tracker = Tracker(sky.locate, sky.geocode, lambda *args: "", lambda *args: None, store=store)
+    monkeypatch.setattr(tracker, "_start", lambda: None)
+    command(tracker, "/subscribe 30m")
+    command(tracker, "/subscribe country", "r2")
+    command(tracker, "/subscribe", "r3")
+    command(tracker, "/unsubscribe", "r3")
+
+    restarted = Tracker(sky.locate, sky.geocode, lambda *args: "", lambda *args: None, store=store)
+    monkeypatch.setattr(restarted, "_start", lambda: None)
+    assert restarted.resume("r1", "Bearer t", "k") and restarted.resume("r2", "Bearer t", "k")
+    assert not restarted.resume("r3", "Bearer t", "k")
+    assert not restarted.resume("r1", "Bearer t", "k")     # already running
+    assert (restarted.subscriptions["r1"].every, restarted.subscriptions["r2"].mode) == (1800, "country")
+    store.close()
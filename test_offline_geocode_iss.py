@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+import lazy_iss
+import offline_geocode_iss
+from offline_geocode_iss import OfflineGeocoder, compile_index, ocean_name
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+COUNTRIES = {"type": "FeatureCollection", "features": [
+    # A square country with a square lake (a hole) in it.
+    {"properties": {"ISO_A2": "FR", "ADMIN": "France"},
+     "geometry": {"type": "Polygon", "coordinates": [square(-4, 43, 7, 51), square(0, 45, 1, 46)]}},
+    # Two islands.
+    {"properties": {"iso_a2": "-99", "ISO3166-1-Alpha-2": "IS", "NAME": "Iceland"},
+     "geometry": {"type": "MultiPolygon", "coordinates": [[square(-24, 63, -13, 67)], [square(-20, 62, -19, 62.5)]]}},
+    {"properties": {"name": "nowhere"}, "geometry": {"type": "Point", "coordinates": [0, 0]}},
+]}
+STATES = {"type": "FeatureCollection", "features": [
+    {"properties": {"iso_a2": "FR", "name": "Brittany", "admin": "France"},
+     "geometry": {"type": "Polygon", "coordinates": [square(-4, 47, -1, 49)]}},
+]}
+
+
+@pytest.fixture(params=["numpy", "pure python"])
+def geocoder(request, tmp_path, monkeypatch, capsys):
+    if request.param == "pure python":
+        monkeypatch.setattr(offline_geocode_iss, "np", lazy_iss.optional("no_such_module_for_the_test"))
+    elif not offline_geocode_iss.np:
+        pytest.skip("numpy is not installed")
+    paths = []
+    for name, data, layer in (("countries", COUNTRIES, "country"), ("states", STATES, "state")):
+        (tmp_path / f"{name}.geojson").write_text(json.dumps(data), encoding="utf-8")
+        paths.append(compile_index(str(tmp_path / f"{name}.geojson"), str(tmp_path / f"{name}.idx"), layer=layer))
+    assert "Compiled 2 features, 4 rings, 20 vertices" in capsys.readouterr().out
+    geocoder = OfflineGeocoder(paths)
+    yield geocoder
+    geocoder.close()
+
+
+@pytest.mark.parametrize("lat, lon, expected", [
+    (50.0, 2.0, {"country_code": "fr", "country": "France"}),
+    (48.0, -3.0, {"country_code": "fr", "country": "France", "state": "Brittany"}),
+    (65.0, -18.0, {"country_code": "is", "country": "Iceland"}),
+    (62.2, -19.5, {"country_code": "is", "country": "Iceland"}),
+    (45.5, 0.5, {"ocean": "Atlantic Ocean"}),          # in the lake
+    (40.0, -30.0, {"ocean": "Atlantic Ocean"}),
+    (-65.0, 0.0, {"ocean": "Southern Ocean"}),
+])
+def test_lookup(geocoder, lat, lon, expected):
+    assert geocoder.lookup(lat, lon) == expected
+
+
+def test_lookup_counts(geocoder):
+    geocoder.lookup("50.0", "2.0")
+    geocoder.lookup(0, -150)
+    assert geocoder.stats == {"lookups": 2, "land": 1, "ocean": 1}
+
+
+def test_ocean_names():
+    assert ocean_name(80, 0) == "Arctic Ocean"
+    assert ocean_name(-10, 80) == "Indian Ocean"
+    assert ocean_name(0, -150) == "Pacific Ocean"
+    assert ocean_name(0, 160) == "Pacific Ocean"
+
+
+def test_address_adds_the_city_on_land_only(geocoder):
+    asked = []
+
+    def remote(lat, lon):
+        asked.append((lat, lon))
+        return {"city": "Paris", "country_code": "xx"}
+
+    geocoder.enrich_city = True
+    assert geocoder.address(50.0, 2.0, remote) == {"country_code": "fr", "country": "France", "city": "Paris"}
+    assert geocoder.address(40.0, -30.0, remote) == {"ocean": "Atlantic Ocean"}
+    assert asked == [(50.0, 2.0)]
+    assert geocoder.address(50.0, 2.0, lambda lat, lon: None) == {"country_code": "fr", "country": "France"}
+
+
+def test_not_an_index(tmp_path):
+    (tmp_path / "bad.idx").write_bytes(b"not an index at all")
+    with pytest.raises(ValueError):
+        OfflineGeocoder([str(tmp_path / "bad.idx")])
+
+
+def test_bad_layer(tmp_path):
+    with pytest.raises(ValueError):
+        compile_index("unused.geojson", str(tmp_path / "x.idx"), layer="city")
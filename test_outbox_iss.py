@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from outbox_iss import Outbox
+
+
+class Recorder:
+    """A send() that records (time, room, text) and answers with scripted statuses."""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, room_id, text, access_token):
+        time.sleep(self.delay)
+        with self.lock:
+            self.sent.append((time.monotonic(), room_id, text))
+            return self.statuses.pop(0) if self.statuses else 200
+
+
+def rate_limited(method="POST", url="https://webexapis.com/v1/messages", retry_after="0.3"):
+    return SimpleNamespace(status_code=429, request=SimpleNamespace(method=method), url=url,
+                           headers={"Retry-After": retry_after})
+
+
+def test_replies_keep_their_order_per_room():
+    send = Recorder(delay=0.005)
+    outbox = Outbox(send, workers=4, merge=False)
+    for i in range(20):
+        for room in ("a", "b", "c"):
+            outbox.submit(room, f"{room}{i}", "token")
+    assert outbox.flush(timeout=10)
+    for room in ("a", "b", "c"):
+        assert [text for _, r, text in send.sent if r == room] == [f"{room}{i}" for i in range(20)]
+    assert outbox.metrics()["sent"] == 60
+
+
+def test_retries_then_reports_the_final_status():
+    statuses = []
+    send = Recorder(statuses=[500, 503])
+    outbox = Outbox(send, workers=1, base_delay=0.01)
+    outbox.submit("a", "hello", "token", on_done=statuses.append)
+    assert outbox.flush(timeout=5)
+    assert statuses == [200]
+    assert len(send.sent) == 3 and outbox.metrics()["retries"] == 2
+
+
+def test_gives_up_after_max_attempts():
+    statuses = []
+    outbox = Outbox(Recorder(statuses=[500] * 10), workers=1, max_attempts=3, base_delay=0.01)
+    outbox.submit("a", "hello", "token", on_done=statuses.append)
+    assert outbox.flush(timeout=5)
+    assert statuses == [500] and outbox.metrics()["failed"] == 1
+
+
+def test_a_429_on_a_message_post_pauses_every_room():
+    send = Recorder()
+    outbox = Outbox(send, workers=4, merge=False)
+    outbox.observe(rate_limited(retry_after="0.3"))
+    paused_at = time.monotonic()
+    outbox.submit("a", "one", "token")
+    outbox.submit("b", "two", "token")
+    assert outbox.flush(timeout=5)
+    assert all(sent_at - paused_at >= 0.25 for sent_at, _, _ in send.sent)
+
+
+def test_other_429s_do_not_pause():
+    outbox = Outbox(Recorder())
+    outbox.observe(rate_limited(method="GET"))
+    outbox.observe(rate_limited(url="https://webexapis.com/v1/rooms"))
+    assert outbox.paused_until == 0.0 and not outbox.throttled()
+
+
+def test_waiting_replies_are_merged_while_throttled():
+    send = Recorder(delay=0.05)
+    outbox = Outbox(send, workers=1, max_merge=3)
+    outbox.observe(rate_limited(retry_after="0"))
+    for i in range(4):
+        outbox.submit("a", f"m{i}", "token")
+    assert outbox.flush(timeout=5)
+    texts = [text for _, _, text in send.sent]
+    # Four replies, at most three to a message: two POSTs, in order.
+    assert len(texts) == 2 and "\n\n".join(texts) == "m0\n\nm1\n\nm2\n\nm3"
+    assert outbox.metrics()["merged"] == 2
+
+
+def test_attach_adds_the_hook_once():
+    outbox = Outbox(Recorder())
+    http_client = SimpleNamespace(response_hooks=[])
+    outbox.attach(http_client)
+    outbox.attach(http_client)
+    assert http_client.response_hooks == [outbox.observe]
+
+
+def test_a_sender_that_raises_is_a_failed_attempt(capsys):
+    attempts = []
+
+    def send(room_id, text, access_token):
+        attempts.append(text)
+        if len(attempts) == 1 or text == "never":
+            raise RuntimeError("sender broke")
+        return 200
+
+    statuses = []
+    outbox = Outbox(send, workers=1, max_attempts=2, base_delay=0.01)
+    outbox.submit("a", "retried", "token", on_done=statuses.append)
+    outbox.submit("a", "never", "token", on_done=statuses.append)
+    outbox.submit("a", "after", "token", on_done=statuses.append)
+    assert outbox.flush(timeout=5)
+    assert statuses == [200, None, 200]
+    assert outbox.rooms == {} and outbox.busy == set()
+    assert "sender broke" in capsys.readouterr().out
@@ -0,0 +1,84 @@
+import calendar
+import math
+import os
+
+import pytest
+
+import lazy_iss
+import propagator_iss
+from propagator_iss import Propagator, get_propagator, load_tle, parse_tle
+
+LINE1 = "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927"
+LINE2 = "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"
+EPOCH = calendar.timegm((2008, 1, 1, 0, 0, 0)) + 263.51782528 * 86400
+
+
+def ground_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+def test_parse_tle():
+    el = parse_tle(LINE1, LINE2)
+    assert el["epoch"] == pytest.approx(EPOCH)
+    assert math.degrees(el["inclination"]) == pytest.approx(51.6416)
+    assert el["eccentricity"] == pytest.approx(0.0006703)
+    assert el["mean_motion"] == pytest.approx(15.72125391)
+    assert el["bstar"] == pytest.approx(-0.11606e-4)
+    assert el["ndot"] == pytest.approx(-0.00002182)
+
+
+def test_the_orbit_looks_like_the_iss():
+    propagator = Propagator(LINE1, LINE2)
+    assert math.sqrt(sum(c * c for c in propagator._eci(EPOCH))) == pytest.approx(6720, abs=50)
+    points = [propagator.lat_lon(EPOCH + 60 * k) for k in range(100)]
+    assert all(abs(lat) <= 52 for lat, _ in points)
+    assert max(lat for lat, _ in points) > 50
+    # About 7.7 km/s over the ground, a little less at ground level.
+    assert all(400 < ground_km(a, b) < 500 for a, b in zip(points, points[1:]))
+
+
+def test_position_dict():
+    position = Propagator(LINE1, LINE2).position(EPOCH + 0.7)
+    assert position["timestamp"] == int(EPOCH + 0.7)
+    assert set(position) == {"lat", "lon", "timestamp"} and round(position["lat"], 4) == position["lat"]
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_batch_matches_single_positions(numpy, monkeypatch):
+    if not numpy:
+        monkeypatch.setattr(propagator_iss, "np", lazy_iss.optional("no_such_module_for_the_test"))
+    elif not propagator_iss.np:
+        pytest.skip("numpy is not installed")
+    propagator = Propagator(LINE1, LINE2)
+    timestamps = [EPOCH + 90 * k for k in range(50)]
+    batch = propagator.positions(timestamps)
+    for k, t in enumerate(timestamps):
+        lat, lon = propagator.lat_lon(t)
+        assert float(batch["lat"][k]) == pytest.approx(lat, abs=1e-6)
+        assert float(batch["lon"][k]) == pytest.approx(lon, abs=1e-6)
+
+
+def test_age():
+    assert Propagator(LINE1, LINE2).age(EPOCH + 86400 * 2) == pytest.approx(2)
+
+
+def test_load_and_reload(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(propagator_iss, "_cached", {"path": None, "mtime": None, "propagator": None})
+    path = str(tmp_path / "iss.tle")
+    assert get_propagator(path) is None
+    with open(path, "w", encoding="ascii") as f:
+        f.write(f"ISS (ZARYA)\n{LINE1}\n{LINE2}\n")
+    assert load_tle(path).name == "ISS (ZARYA)"
+    first = get_propagator(path)
+    assert get_propagator(path) is first
+    with open(path, "w", encoding="ascii") as f:
+        f.write(f"{LINE1}\n{LINE2}\n")
+    os.utime(path, (EPOCH, EPOCH))
+    assert get_propagator(path) is not first
+    with open(path, "w", encoding="ascii") as f:
+        f.write("not a TLE\n")
+    os.utime(path, (EPOCH + 1, EPOCH + 1))
+    assert get_propagator(path) is None
+    assert "Could not load TLE" in capsys.readouterr().out
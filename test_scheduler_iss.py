@@ -0,0 +1,83 @@
+import calendar
+from email.utils import formatdate
+
+import pytest
+
+import scheduler_iss
+from scheduler_iss import PollScheduler, RoomPoller, TokenBucket, backoff_delay, parse_retry_after
+
+
+class Response:
+    def __init__(self, status_code, endpoint, retry_after=None, url="https://webexapis.com/v1/messages"):
+        self.status_code = status_code
+        self.endpoint = endpoint
+        self.headers = {} if retry_after is None else {"Retry-After": retry_after}
+        self.url = url
+
+
+def test_parse_retry_after(monkeypatch):
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) == 5.0
+    assert parse_retry_after("soon", default=2.0) == 2.0
+    now = calendar.timegm((2026, 10, 18, 12, 0, 0))
+    monkeypatch.setattr(scheduler_iss.time, "time", lambda: now)
+    assert parse_retry_after(formatdate(now + 30, usegmt=True)) == pytest.approx(30)
+
+
+def test_backoff_grows_and_is_capped():
+    for attempt in range(1, 10):
+        assert 0 <= backoff_delay(attempt, base=1.0, cap=8.0) <= min(8.0, 2 ** (attempt - 1))
+
+
+def test_token_bucket_spends_its_burst_then_waits():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_room_poller_adapts_to_activity():
+    poller = RoomPoller(min_interval=1.0, max_interval=2.0, idle_growth=1.5)
+    poller.on_idle()
+    assert poller.next_delay() == 1.5
+    poller.on_idle()
+    assert poller.next_delay() == 2.0
+    poller.on_activity()
+    assert poller.next_delay() == 1.0
+    for _ in range(4):
+        poller.on_error()
+    # Jittered backoff, but never quicker than the room's own interval.
+    assert 1.0 <= poller.next_delay() <= 8.0
+
+
+@pytest.mark.parametrize("endpoint", scheduler_iss.WEBEX_ENDPOINTS)
+def test_a_webex_429_pauses_every_poller(endpoint):
+    scheduler = PollScheduler(rate=100, burst=100)
+    scheduler.observe(Response(429, endpoint, retry_after="3"))
+    assert scheduler.bucket.reserve() == pytest.approx(3, abs=0.1)
+    assert scheduler.metrics()["rate_limited"] == 1
+
+
+@pytest.mark.parametrize("endpoint", ["iss", "geocode", None])
+def test_other_429s_are_only_counted(endpoint):
+    scheduler = PollScheduler(rate=100, burst=100)
+    scheduler.observe(Response(429, endpoint, retry_after="30", url="https://us1.locationiq.com/v1/reverse"))
+    assert scheduler.bucket.reserve() == 0.0
+    stats = scheduler.metrics()
+    assert (stats["rate_limited"], stats["other_rate_limited"]) == (0, 1)
+
+
+def test_server_errors_are_counted():
+    scheduler = PollScheduler()
+    scheduler.observe(Response(503, "messages"))
+    scheduler.observe(Response(200, "messages"))
+    assert scheduler.metrics()["errors"] == 1
+
+
+def test_requests_and_throttled_time_are_counted():
+    scheduler = PollScheduler(rate=1000, burst=2)
+    for _ in range(3):
+        scheduler.acquire()
+    stats = scheduler.metrics()
+    assert stats["requests"] == 3 and stats["throttled_seconds"] > 0
+    assert stats["request_rate"] > 0
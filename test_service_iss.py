@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from service_iss import Service, parse_config
+
+
+def tenant(**fields):
+    return dict({"name": "iss-team", "token": "abc", "rooms": ["Space Bot"]}, **fields)
+
+
+def test_parse_config(monkeypatch):
+    monkeypatch.setenv("ISS_TEAM_TOKEN", "secret")
+    monkeypatch.setenv("LOCATIONIQ_KEY", "pk.123")
+    poll_interval, tenants = parse_config({"poll_interval": 2, "tenants": [
+        tenant(token="$ISS_TEAM_TOKEN", locationiq_key="$LOCATIONIQ_KEY", rooms=["Space Bot", "Y2lz"])]})
+    assert poll_interval == 2.0
+    assert tenants == {"iss-team": {"name": "iss-team", "token": "Bearer secret", "key": "pk.123",
+                                    "rooms": ["Space Bot", "Y2lz"]}}
+
+
+def test_defaults_and_comma_separated_rooms():
+    poll_interval, tenants = parse_config({"tenants": [{"token": "abc", "rooms": "Space Bot,ISS Team,"}]})
+    assert poll_interval == 1.0
+    assert tenants["tenant-1"]["rooms"] == ["Space Bot", "ISS Team"]
+    assert tenants["tenant-1"]["key"] == ""
+
+
+@pytest.mark.parametrize("config", [
+    None,
+    [],
+    {},
+    {"tenants": {}},
+    {"tenants": ["iss-team"]},
+    {"tenants": [None]},
+    {"tenants": [tenant(token="")]},
+    {"tenants": [tenant(token="$UNSET_SPACEBOT_TOKEN")]},
+    {"tenants": [tenant(token=123)]},
+    {"tenants": [tenant(rooms=[])]},
+    {"tenants": [tenant(rooms=42)]},
+    {"tenants": [tenant(rooms=["Space Bot", None])]},
+    {"tenants": [tenant(name=["x"])]},
+    {"tenants": [tenant(locationiq_key=1)]},
+    {"tenants": [tenant(), tenant()]},
+    {"poll_interval": None, "tenants": [tenant()]},
+    {"poll_interval": "fast", "tenants": [tenant()]},
+    {"poll_interval": 0, "tenants": [tenant()]},
+    {"poll_interval": -1, "tenants": [tenant()]},
+    {"poll_interval": True, "tenants": [tenant()]},
+])
+def test_bad_config_raises_value_error(config):
+    with pytest.raises(ValueError):
+        parse_config(config)
+
+
+def test_reload_keeps_the_config_when_the_new_one_is_bad(tmp_path, capsys):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"tenants": [tenant()]}))
+    service = Service(str(path))
+    applied = []
+
+    async def apply(poll_interval, tenants):
+        applied.append(tenants)
+
+    service.apply = apply
+    for bad in ('{"tenants": [null]}', '{"poll_interval": null, "tenants": []}', "{not json"):
+        path.write_text(bad)
+        asyncio.run(service.reload())
+    assert applied == []
+    assert capsys.readouterr().out.count("keeping the current one") == 3
+    path.write_text(json.dumps({"tenants": [tenant()]}))
+    asyncio.run(service.reload())
+    assert list(applied[0]) == ["iss-team"]
+
+
+def test_failed_room_listing_keeps_the_watched_rooms(monkeypatch):
+    import async_monitor_iss as monitor
+    import errorhandling_iss as bot
+
+    listings = [[{"id": "r1", "title": "Space Bot"}, {"id": "r2", "title": "ISS Team"}], [],
+                [{"id": "r1", "title": "Space Bot"}]]
+    monkeypatch.setattr(bot, "fetch_rooms", lambda token: listings.pop(0))
+
+    async def watch_room(room_id, token, key, stats, poll_interval, cursors, stop):
+        await stop.wait()
+
+    monkeypatch.setattr(monitor, "watch_room", watch_room)
+
+    async def main():
+        service = Service()
+        _, tenants = parse_config({"tenants": [tenant(rooms=["Space Bot", "ISS Team"])]})
+        await service.apply(1.0, tenants)
+        assert sorted(service.tasks) == [("iss-team", "r1"), ("iss-team", "r2")]
+        # Reload with a new room; listing the rooms fails.
+        _, tenants = parse_config({"tenants": [tenant(rooms=["Space Bot", "ISS Team", "New Room"])]})
+        await service.apply(1.0, tenants)
+        assert sorted(service.tasks) == [("iss-team", "r1"), ("iss-team", "r2")]
+        assert not any(stop.is_set() for stop in service.stops.values())
+        # Once listing works again, a room that is gone is stopped.
+        _, tenants = parse_config({"tenants": [tenant(rooms=["Space Bot"])]})
+        stop_r2 = service.stops[("iss-team", "r2")]
+        await service.apply(1.0, tenants)
+        assert sorted(service.tasks) == [("iss-team", "r1")]
+        assert stop_r2.is_set()
+        for stop in service.stops.values():
+            stop.set()
+        await asyncio.gather(*service.tasks.values())
+
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from singleflight_iss import SingleFlight
+
+
+def run_together(n, target):
+    results = [None] * n
+    errors = [None] * n
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"lat": "1.0"}
+
+    results, errors = run_together(8, lambda: flight.do("iss", fetch))
+    assert len(calls) == 1
+    assert results == [{"lat": "1.0"}] * 8 and errors == [None] * 8
+    # Everyone got their own copy.
+    assert len({id(r) for r in results}) == 8
+    report = flight.report()
+    assert report["upstream"] == 1 and report["collapsed"] == 7
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.report()["upstream"] == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight("test", fresh_for=10)
+
+    def fail():
+        time.sleep(0.2)
+        raise RuntimeError("down")
+
+    results, errors = run_together(4, lambda: flight.do("iss", fail))
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.do("iss", lambda: "back") == "back"
+
+
+def test_fresh_results_are_reused():
+    flight = SingleFlight("test", fresh_for=0.1)
+    assert flight.do("iss", lambda: "first") == "first"
+    assert flight.do("iss", lambda: "second") == "first"
+    assert flight.report()["fresh"] == 1
+    time.sleep(0.15)
+    assert flight.do("iss", lambda: "third") == "third"
+
+
+def test_none_is_not_reused():
+    flight = SingleFlight("test", fresh_for=10)
+    assert flight.do("iss", lambda: None) is None
+    assert flight.do("iss", lambda: "ok") == "ok"
+
+
+def test_leader_exception_propagates():
+    flight = SingleFlight("test")
+    with pytest.raises(KeyError):
+        flight.do("iss", lambda: {}["missing"])
+    assert flight.calls == {}
@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+import store_iss
+from geocode_cache_iss import GeoCache
+from store_iss import Store, account_key
+
+FRANCE = {"country_code": "fr", "country": "France", "city": "Paris"}
+ROOMS = [{"id": "r1", "title": "Space Bot", "type": "group"}, {"id": "r2", "title": "ISS Team", "type": "group"}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = Store(str(tmp_path / "spacebot.db"))
+    yield store
+    store.close()
+
+
+def test_nothing_is_opened_until_first_use(store, tmp_path):
+    assert store.db is None and not (tmp_path / "spacebot.db").exists()
+    store.stats()
+    assert (tmp_path / "spacebot.db").exists()
+
+
+def test_geocode_round_trip_and_expiry(store):
+    store.put_geocode("g:u09t", FRANCE, ttl=60)
+    address, expires = store.get_geocode("g:u09t")
+    assert address == FRANCE and expires > time.time()
+    store.put_geocode("g:u09w", {}, ttl=-1)
+    assert store.get_geocode("g:u09w") is None
+    assert store.get_geocode("g:none") is None
+
+
+def test_geocode_rows_are_capped_least_recently_used_first(store):
+    store.max_geocode_rows, store.trim_every = 2, 3
+    store.put_geocode("a", FRANCE, 60)
+    store.put_geocode("b", FRANCE, 60)
+    time.sleep(0.01)
+    store.get_geocode("a")      # now "b" is the least recently used
+    store.put_geocode("c", FRANCE, 60)
+    assert store.get_geocode("b") is None
+    assert store.get_geocode("a") and store.get_geocode("c")
+
+
+def test_rooms_are_kept_per_account(store):
+    store.save_rooms("Bearer one", ROOMS)
+    assert store.load_rooms("Bearer one") == ROOMS
+    assert store.load_rooms("Bearer two") is None
+    store.save_rooms("Bearer one", ROOMS[1:])
+    assert store.load_rooms("Bearer one") == ROOMS[1:]
+    assert account_key("Bearer one") != account_key("Bearer two")
+
+
+def test_selection_and_subscription_round_trip(store):
+    assert store.last_selection("Bearer one") == []
+    store.save_selection("Bearer one", [("r1", "Space Bot")])
+    assert store.last_selection("Bearer one") == [("r1", "Space Bot")]
+    store.save_subscription("r1", {"mode": "country", "every": 60})
+    assert store.get_subscription("r1") == {"mode": "country", "every": 60}
+    store.save_subscription("r1", None)
+    assert store.get_subscription("r1") is None
+
+
+def test_cursors_round_trip(store):
+    store.save_cursors({"r1": {"id": "m1", "created": "2026-10-18T12:00:00.000Z"}, "r2": None})
+    store.save_cursor("r3", {"id": "m3"})
+    assert store.load_cursors(["r1", "r2", "r3"]) == {"r1": {"id": "m1", "created": "2026-10-18T12:00:00.000Z"},
+                                                     "r3": {"id": "m3", "created": ""}}
+
+
+def test_a_new_process_starts_warm(store):
+    store.put_geocode("g:u09t", FRANCE, ttl=60)
+    store.save_cursor("r1", {"id": "m1"})
+    store.close()
+    again = Store(store.path)
+    assert again.get_geocode("g:u09t")[0] == FRANCE
+    assert again.get_cursor("r1") == {"id": "m1", "created": ""}
+    assert again.stats()["geocode"] == 1
+    again.close()
+
+
+def test_geocode_cache_falls_back_to_the_store(store):
+    writer = GeoCache()
+    writer.use_store(store)
+    writer.put(48.85, 2.35, FRANCE)
+    reader = GeoCache()
+    reader.use_store(store)
+    assert reader.get(48.85, 2.35)["country_code"] == "fr"
+    assert reader.report()["store_hits"] == 1
+
+
+def test_compact_shrinks_to_the_size_limit(store):
+    for i in range(2000):
+        store.put_geocode(f"cell-{i}", dict(FRANCE, road="x" * 200), 60)
+    store.max_bytes = 64 * 1024
+    stats = store.compact()
+    assert stats["bytes"] <= store.max_bytes and 0 < stats["geocode"] < 2000
+
+
+def test_get_store_from_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setattr(store_iss, "_store", {"instance": None})
+    monkeypatch.setenv("SPACEBOT_STORE", "off")
+    assert store_iss.get_store() is None
+    monkeypatch.setenv("SPACEBOT_STORE", str(tmp_path / "a.db"))
+    assert store_iss.get_store() is store_iss.get_store()
+    assert store_iss.get_store().path == str(tmp_path / "a.db")
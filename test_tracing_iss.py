@@ -0,0 +1,74 @@
+import pytest
+
+import commands_iss
+import errorhandling_iss as bot
+import tracing_iss
+from fake_servers_iss import FakeWebex
+from tracing_iss import Registry, Trace
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    """Finished traces, recorded into a fresh registry."""
+    registry = Registry()
+    finished = []
+    record = registry.record
+    monkeypatch.setattr(registry, "record", lambda trace: finished.append(trace) or record(trace))
+    monkeypatch.setattr(tracing_iss, "registry", registry)
+    return finished
+
+
+def test_spans_go_to_the_current_trace(traces):
+    trace = Trace("command")
+
+    @tracing_iss.traced("iss")
+    def lookup():
+        return 1
+
+    lookup()    # no trace: nothing recorded anywhere
+    with tracing_iss.use(trace):
+        lookup()
+        with tracing_iss.span("format"):
+            pass
+    trace.add_span("poll", 0.25)
+    trace.finish()
+    assert [s["stage"] for s in trace.spans] == ["iss", "format", "poll"]
+    assert traces == [trace] and trace.attrs["outcome"] == "ok"
+    assert tracing_iss.registry.summary()["poll"]["count"] == 1
+
+
+def test_render_has_histograms_and_counters(traces):
+    trace = Trace("command")
+    trace.add_span("post", 0.02)
+    trace.finish()
+    tracing_iss.registry.count_response("webexapis.com", 429)
+    tracing_iss.registry.count_retry()
+    text = tracing_iss.registry.render()
+    assert 'spacebot_stage_seconds_bucket{stage="post",le="0.025"} 1' in text
+    assert 'spacebot_upstream_responses_total{host="webexapis.com",status="429"} 1' in text
+    assert "spacebot_upstream_retries_total 1" in text
+    assert "spacebot_command_seconds_count 1" in text
+
+
+def test_handle_commands_traces_up_to_the_post(traces, monkeypatch):
+    webex = FakeWebex().start()
+    room = webex.add_room("Space Bot")
+    registry = commands_iss.Registry()
+
+    @tracing_iss.traced("format")
+    def hello(args, context):
+        return f"hello {args}"
+
+    registry.register("/hello", hello)
+    monkeypatch.setattr(bot, "WEBEX_API", webex.url)
+    monkeypatch.setattr(bot, "command_registry", registry)
+    try:
+        bot.handle_commands(room, ["/hello world"], "Bearer fake", "key", poll_seconds=0.1)
+        # The trace is finished when the outbox reports the reply as sent.
+        assert bot.outbox.flush(timeout=5)
+    finally:
+        webex.stop()
+    trace, = traces
+    assert [s["stage"] for s in trace.spans] == ["poll", "format", "post"]
+    assert trace.attrs["outcome"] == "ok"
+    assert webex.posted[0][2] == "hello world"
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from webhook_iss import WebhookReceiver
+
+CREATED = {"resource": "messages", "event": "created", "data": {"id": "msg-1", "roomId": "room-1"}}
+
+
+def body(event):
+    return json.dumps(event).encode("utf-8")
+
+
+def test_accepts_message_created_events():
+    events = []
+    receiver = WebhookReceiver(events.append)
+    assert receiver.handle(body(CREATED), None) == 200
+    assert events == [CREATED["data"]]
+    assert receiver.stats["accepted"] == 1
+
+
+def test_ignores_other_events():
+    events = []
+    receiver = WebhookReceiver(events.append)
+    assert receiver.handle(body(dict(CREATED, event="deleted")), None) == 200
+    assert events == [] and receiver.stats["ignored"] == 1
+
+
+def test_checks_the_signature():
+    receiver = WebhookReceiver(lambda data: None, secret="s3cret")
+    data = body(CREATED)
+    good = hmac.new(b"s3cret", data, hashlib.sha1).hexdigest()
+    assert receiver.handle(data, good) == 200
+    assert receiver.handle(data, "0" * 40) == 403
+    assert receiver.handle(data, None) == 403
+
+
+@pytest.mark.parametrize("data", [b"{not json", b"[1, 2]", b'"created"', b"null", b"7",
+                                  body(dict(CREATED, data=["msg-1"]))])
+def test_malformed_bodies_are_a_400(data):
+    events = []
+    receiver = WebhookReceiver(events.append)
+    assert receiver.handle(data, None) == 400
+    assert events == [] and receiver.stats["rejected"] == 1
+
+
+def test_a_bad_content_length_is_a_400():
+    import http.client
+
+    events = []
+    receiver = WebhookReceiver(events.append, host="127.0.0.1", port=0).start()
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", receiver.port, timeout=5)
+        conn.putrequest("POST", "/webhook")
+        conn.putheader("Content-Length", "lots")
+        conn.endheaders()
+        assert conn.getresponse().status == 400
+        conn.close()
+    finally:
+        receiver.stop()
+    assert events == [] and receiver.stats["rejected"] == 1
+
+
+def test_webex_calls_have_their_own_endpoint_labels(monkeypatch):
+    import webhook_iss
+
+    class Response:
+        status_code = 200
+        text = ""
+
+        def json(self):
+            return {"id": "x"}
+
+    endpoints = []
+
+    class Client:
+        def request(self, method, url, endpoint=None, **kwargs):
+            endpoints.append((method, url.rsplit("/v1", 1)[-1], endpoint))
+            return Response()
+
+        def get(self, url, endpoint=None, **kwargs):
+            return self.request("GET", url, endpoint, **kwargs)
+
+        def post(self, url, endpoint=None, **kwargs):
+            return self.request("POST", url, endpoint, **kwargs)
+
+    monkeypatch.setattr(webhook_iss, "client", Client())
+    monkeypatch.setattr(webhook_iss, "WEBEX_API", "https://webex.test/v1")
+    webhook_iss.get_my_person_id("Bearer t")
+    webhook_iss.delete_webhooks(webhook_iss.register_webhooks(["r1"], "Bearer t", "https://me/webhook"), "Bearer t")
+    assert endpoints == [("GET", "/people/me", "people"), ("POST", "/webhooks", "webhooks"),
+                         ("DELETE", "/webhooks/x", "webhooks")]
@@ -0,0 +1,85 @@
+import pytest
+
+from workers_iss import HashRing
+
+ROOMS = [f"room-{i}" for i in range(2000)]
+
+
+def test_same_key_same_node():
+    ring = HashRing(range(4))
+    again = HashRing([3, 1, 0, 2])
+    assert all(ring.node_for(room) == again.node_for(room) for room in ROOMS)
+
+
+def test_rooms_are_spread_over_every_node():
+    shards = HashRing(range(4)).assign(ROOMS)
+    assert sorted(shards) == [0, 1, 2, 3]
+    assert sum(len(rooms) for rooms in shards.values()) == len(ROOMS)
+    assert all(len(rooms) > len(ROOMS) / 4 * 0.5 for rooms in shards.values())
+
+
+def test_adding_a_node_only_moves_rooms_onto_it():
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+    moved = [room for room in ROOMS if before.node_for(room) != after.node_for(room)]
+    assert all(after.node_for(room) == 4 for room in moved)
+    # About 1/5 of the rooms, nowhere near all of them.
+    assert len(moved) < len(ROOMS) * 0.35
+
+
+def test_removing_a_node_only_moves_its_rooms():
+    ring = HashRing(range(4))
+    owners = {room: ring.node_for(room) for room in ROOMS}
+    ring.remove(2)
+    for room in ROOMS:
+        if owners[room] != 2:
+            assert ring.node_for(room) == owners[room]
+        else:
+            assert ring.node_for(room) != 2
+
+
+def test_empty_ring():
+    with pytest.raises(ValueError):
+        HashRing().node_for("room-1")
+
+
+class DeadProcess:
+    exitcode = 1
+
+    def is_alive(self):
+        return False
+
+
+def test_a_crash_looping_worker_backs_off_and_is_given_up_on(monkeypatch, capsys):
+    from workers_iss import Supervisor
+
+    supervisor = Supervisor(ROOMS[:10], "Bearer t", "", workers=1)
+    clock = [1000.0]
+    spawned = []
+
+    def spawn(index):
+        spawned.append(clock[0])
+        supervisor.processes[index] = DeadProcess()
+        supervisor.started[index] = clock[0]
+
+    monkeypatch.setattr(supervisor, "_spawn", spawn)
+    spawn(0)
+    while supervisor.check(now=clock[0]):
+        clock[0] += 0.5
+    # Restarted 1, 2, 4 and 8 s after each fast failure, then left alone.
+    assert [t - 1000.0 for t in spawned] == [0.0, 1.0, 3.5, 8.0, 16.5]
+    assert supervisor.given_up == [0] and supervisor.restarts == 4
+    assert "giving up on it" in capsys.readouterr().out
+
+
+def test_a_worker_that_ran_for_a_while_restarts_straight_away(monkeypatch):
+    from workers_iss import FAST_FAILURE, Supervisor
+
+    supervisor = Supervisor(ROOMS[:10], "Bearer t", "", workers=1)
+    spawned = []
+    monkeypatch.setattr(supervisor, "_spawn", spawned.append)
+    supervisor.processes[0] = DeadProcess()
+    supervisor.started[0] = 0.0
+    supervisor.fast_failures[0] = 3
+    assert supervisor.check(now=FAST_FAILURE + 1) == 0
+    assert spawned == [0] and supervisor.fast_failures[0] == 0
@@ -0,0 +1,304 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+# -------------------------------------------------------------------
+# Command tracing and metrics
+# Every command gets a trace, from the poll that saw the message to
+# the reply being posted. Each stage (poll, wait, iss, geocode, format,
+# post) is a timed span that also notes the HTTP status codes and
+# retries seen while it ran. Finished traces feed per-stage histograms
+# (with p50/p90/p99) that can be scraped in Prometheus text format from
+# a small /metrics endpoint, and can be written to a JSON-lines log.
+#
+#   SPACEBOT_TRACE_LOG=traces.jsonl     write one JSON object per command
+#   SPACEBOT_METRICS_PORT=9100          serve http://host:9100/metrics
+#                                       (in worker mode, worker i serves on 9100 + i)
+# -------------------------------------------------------------------
+
+# Histogram bucket upper bounds in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+_current_trace = contextvars.ContextVar("spacebot_trace", default=None)
+_current_span = contextvars.ContextVar("spacebot_span", default=None)
+
+
+class Histogram:
+    """Prometheus-style bucket counts plus recent samples for percentiles."""
+
+    def __init__(self, samples=2048):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Registry:
+    """Holds the histograms and counters for everything that has been traced."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.commands = Histogram()
+        self.responses = {}
+        self.retries = 0
+        self.log_path = os.environ.get("SPACEBOT_TRACE_LOG")
+
+    def record(self, trace):
+        with self.lock:
+            self.commands.observe(trace.duration)
+            for span in trace.spans:
+                self.stages.setdefault(span["stage"], Histogram()).observe(span["duration_ms"] / 1000)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_dict()) + "\n")
+
+    def count_response(self, host, status):
+        with self.lock:
+            key = (host, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def count_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def render(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            lines.append("# HELP spacebot_command_seconds Time from message seen to reply posted.")
+            lines.append("# TYPE spacebot_command_seconds histogram")
+            lines.extend(_histogram_lines("spacebot_command_seconds", "", self.commands))
+
+            lines.append("# HELP spacebot_stage_seconds Time spent in each stage of a command.")
+            lines.append("# TYPE spacebot_stage_seconds histogram")
+            for stage, hist in sorted(self.stages.items()):
+                lines.extend(_histogram_lines("spacebot_stage_seconds", f'stage="{stage}",', hist))
+
+            lines.append("# HELP spacebot_stage_quantile_seconds Recent percentiles per stage.")
+            lines.append("# TYPE spacebot_stage_quantile_seconds gauge")
+            for stage, hist in sorted(self.stages.items()):
+                for q in QUANTILES:
+                    lines.append(f'spacebot_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} '
+                                 f'{hist.percentile(q):.6f}')
+
+            lines.append("# HELP spacebot_upstream_responses_total Upstream HTTP responses by host and status.")
+            lines.append("# TYPE spacebot_upstream_responses_total counter")
+            for (host, status), n in sorted(self.responses.items()):
+                lines.append(f'spacebot_upstream_responses_total{{host="{host}",status="{status}"}} {n}')
+
+            lines.append("# HELP spacebot_upstream_retries_total Upstream requests that were retried.")
+            lines.append("# TYPE spacebot_upstream_retries_total counter")
+            lines.append(f"spacebot_upstream_retries_total {self.retries}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Stage name -> {count, p50, p90, p99} in milliseconds."""
+        with self.lock:
+            hists = dict(self.stages, total=self.commands)
+            return {stage: {"count": h.count, **{f"p{int(q * 100)}": round(h.percentile(q) * 1000, 1)
+                                                 for q in QUANTILES}}
+                    for stage, h in hists.items()}
+
+    def print_summary(self):
+        for stage, s in self.summary().items():
+            print(f"{stage:>8}: {s['count']:5d} calls, p50 {s['p50']} ms, p90 {s['p90']} ms, p99 {s['p99']} ms")
+
+
+def _histogram_lines(name, labels, hist):
+    lines = []
+    cumulative = 0
+    for bound, n in zip(BUCKETS, hist.counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {hist.count}')
+    label_block = "{" + labels.rstrip(",") + "}" if labels else ""
+    lines.append(f"{name}_sum{label_block} {hist.sum:.6f}")
+    lines.append(f"{name}_count{label_block} {hist.count}")
+    return lines
+
+
+registry = Registry()
+
+
+class Trace:
+    """Timing spans for one command."""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.duration = 0.0
+
+    def add_span(self, stage, seconds, **fields):
+        """Record a stage that was timed somewhere else (e.g. the poll that found the command)."""
+        self.spans.append({"stage": stage, "duration_ms": round(seconds * 1000, 3),
+                           "status": [], "retries": 0, **fields})
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        span = {"stage": stage, "start_ms": round((time.perf_counter() - self.t0) * 1000, 3),
+                "duration_ms": 0.0, "status": [], "retries": 0}
+        self.spans.append(span)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            _current_span.reset(token)
+
+    def include(self, other):
+        """Copy in the spans of a shared lookup this command used."""
+        if other is not None:
+            self.spans.extend(other.spans)
+
+    def finish(self, outcome="ok"):
+        self.duration = time.perf_counter() - self.t0
+        self.attrs["outcome"] = outcome
+        registry.record(self)
+        return self
+
+    def to_dict(self):
+        return {"trace": self.name, "time": self.started, "total_ms": round(self.duration * 1000, 3),
+                **self.attrs, "spans": self.spans}
+
+
+@contextlib.contextmanager
+def use(trace):
+    """Make `trace` the current trace for code running inside the block."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time a stage of the current trace (does nothing when there is no trace)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(stage) as s:
+        yield s
+
+
+def traced(stage):
+    """Decorator: run the function inside span(stage)."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def note_retry():
+    """Count a retry against the current span and the global counter."""
+    registry.count_retry()
+    current = _current_span.get()
+    if current is not None:
+        current["retries"] += 1
+
+
+def observe_response(response):
+    """HttpClient response hook: count the status and attach it to the current span."""
+    registry.count_response(urlsplit(response.url).hostname, response.status_code)
+    current = _current_span.get()
+    if current is not None:
+        current["status"].append(response.status_code)
+
+
+def attach(http_client):
+    if observe_response not in http_client.response_hooks:
+        http_client.response_hooks.append(observe_response)
+
+
+class MetricsServer:
+    """Serves registry.render() at /metrics."""
+
+    def __init__(self, port=9100, host="0.0.0.0"):
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        # http.server is only imported here, so bots without metrics don't pay for it at startup.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# One /metrics server per process, however many monitors call start_from_env().
+_metrics = {"server": None}
+_metrics_lock = threading.Lock()
+
+
+def start_from_env(http_client):
+    """Hook tracing into the client and start /metrics (once) if SPACEBOT_METRICS_PORT is set."""
+    attach(http_client)
+    port = os.environ.get("SPACEBOT_METRICS_PORT")
+    if not port:
+        return None
+    with _metrics_lock:
+        if _metrics["server"] is None:
+            try:
+                _metrics["server"] = MetricsServer(int(port)).start()
+            except OSError as e:
+                # Not worth stopping the bot for: it keeps running without /metrics (and doesn't retry).
+                print(f"Could not serve metrics on port {port}: {e}")
+                _metrics["server"] = False
+        return _metrics["server"] or None
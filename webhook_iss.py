@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+import sys
+import threading
+
+from requests.exceptions import RequestException
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+from http_client_iss import client, WEBEX_API
+
+# -------------------------------------------------------------------
+# Webhook receiver mode
+# Instead of polling GET /messages every second for every room, Webex
+# tells us about each new message with a "messages created" webhook.
+# A small local HTTP server accepts those events, checks their
+# signature, queues them and the queue feeds the same handle_command()
+# the polling monitor uses. Every message id arrives once, so bursts of
+# commands and repeated identical commands are no longer lost.
+#
+#   python webhook_iss.py https://my-public-host.example/webhook 8080
+#
+# The public URL must reach this machine's port (e.g. via a tunnel).
+# -------------------------------------------------------------------
+
+WEBHOOK_PATH = "/webhook"
+
+
+class WebhookReceiver:
+    """Tiny HTTP server that hands verified Webex webhook events to a callback."""
+
+    def __init__(self, on_event, host="0.0.0.0", port=8080, secret=None, path=WEBHOOK_PATH):
+        self.on_event = on_event
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.path = path
+        self.stats = {"received": 0, "accepted": 0, "rejected": 0, "ignored": 0}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def verify(self, body, signature):
+        """Check the X-Spark-Signature header (HMAC-SHA1 of the body with our secret)."""
+        if not self.secret:
+            return True
+        expected = hmac.new(self.secret.encode(), body, hashlib.sha1).hexdigest()
+        return hmac.compare_digest(expected, signature or "")
+
+    def handle(self, body, signature):
+        """Validate one webhook delivery and pass it on. Returns the HTTP status to send."""
+        self._count("received")
+        if not self.verify(body, signature):
+            self._count("rejected")
+            return 403
+        try:
+            event = json.loads(body)
+        except ValueError:
+            self._count("rejected")
+            return 400
+        if not isinstance(event, dict) or not isinstance(event.get("data", {}), dict):
+            self._count("rejected")
+            return 400
+        if event.get("resource") != "messages" or event.get("event") != "created":
+            self._count("ignored")
+            return 200
+        self._count("accepted")
+        self.on_event(event.get("data", {}))
+        return 200
+
+    def start(self):
+        # http.server is only imported here, so importing this module (e.g. from a worker) doesn't pay for it.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # No way to tell where the body ends: refuse it and drop the connection.
+                    receiver._count("received")
+                    receiver._count("rejected")
+                    self.close_connection = True
+                    status = 400
+                elif self.path.split("?")[0] != receiver.path:
+                    self.rfile.read(length)
+                    status = 404
+                else:
+                    body = self.rfile.read(length)
+                    status = receiver.handle(body, self.headers.get("X-Spark-Signature"))
+                # Answer straight away; the work happens off the queue.
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Webhook receiver listening on {self.host}:{self.port}{self.path}")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def get_my_person_id(access_token):
+    """Return the bot's own person id so it can ignore its own replies."""
+    try:
+        response = client.get(f"{WEBEX_API}/people/me", endpoint="people",
+                              headers={"Authorization": access_token})
+        if response.status_code == 200:
+            return response.json().get("id")
+        print(f"Could not look up the bot's identity (status {response.status_code}).")
+    except (RequestException, ValueError) as e:
+        print(f"Error looking up the bot's identity: {e}")
+    return None
+
+
+def register_webhooks(room_ids, access_token, target_url, secret=None):
+    """Create a 'messages created' webhook for each room. Returns the webhook ids."""
+    headers = {"Authorization": access_token, "Content-Type": "application/json"}
+    hook_ids = []
+    for room_id in room_ids:
+        data = {"name": "ISS bot", "targetUrl": target_url, "resource": "messages",
+                "event": "created", "filter": f"roomId={room_id}"}
+        if secret:
+            data["secret"] = secret
+        try:
+            response = client.post(f"{WEBEX_API}/webhooks", endpoint="webhooks", json=data, headers=headers)
+            if response.status_code == 200:
+                hook_ids.append(response.json()["id"])
+            else:
+                print(f"Failed to register webhook for {room_id}: {response.status_code} {response.text}")
+        except (RequestException, ValueError, KeyError) as e:
+            print(f"Error registering webhook: {e}")
+    return hook_ids
+
+
+def delete_webhooks(hook_ids, access_token):
+    """Remove the webhooks we created."""
+    for hook_id in hook_ids:
+        try:
+            client.request("DELETE", f"{WEBEX_API}/webhooks/{hook_id}", endpoint="webhooks",
+                           headers={"Authorization": access_token})
+        except RequestException as e:
+            print(f"Error deleting webhook {hook_id}: {e}")
+
+
+async def handle_event(data, access_token, maps_api_key, stats):
+    """Fetch the text of a webhook's message and run it through the command handler."""
+    message = await monitor.run_blocking(bot.get_message, data.get("id"), access_token)
+    if not message:
+        return
+    text = message.get("text", "")
+    print(f"New message: {text}")
+    if text.startswith("/"):
+        await monitor.handle_command(data.get("roomId"), text, access_token, maps_api_key, stats)
+
+
+async def monitor_webhooks(room_ids, access_token, maps_api_key, target_url, port=8080,
+                           secret=None, duration=None, stats=None, max_workers=None):
+    """Serve commands for the rooms from webhook events instead of polling."""
+    if stats is None:
+        stats = monitor.new_stats()
+    if secret is None:
+        secret = secrets.token_hex(16)
+
+    loop = asyncio.get_running_loop()
+    executor = monitor.use_thread_pool(max_workers or max(8, len(room_ids) * 2))
+    events = asyncio.Queue()
+
+    def on_event(data):
+        # Called on the receiver's thread; hop over to the event loop.
+        loop.call_soon_threadsafe(events.put_nowait, data)
+
+    receiver = WebhookReceiver(on_event, port=port, secret=secret).start()
+    me = await monitor.run_blocking(get_my_person_id, access_token)
+    hook_ids = await monitor.run_blocking(register_webhooks, room_ids, access_token, target_url, secret)
+    print(f"\nListening for commands in {len(hook_ids)} room(s) via webhooks...\n")
+
+    pending = set()
+
+    async def consume():
+        while True:
+            data = await events.get()
+            if me and data.get("personId") == me:
+                continue
+            task = asyncio.create_task(handle_event(data, access_token, maps_api_key, stats))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    consumer = asyncio.create_task(consume())
+    try:
+        if duration is None:
+            await consumer
+        else:
+            await asyncio.sleep(duration)
+    finally:
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        await monitor.run_blocking(delete_webhooks, hook_ids, access_token)
+        receiver.stop()
+        stats["webhooks"] = dict(receiver.stats)
+        executor.shutdown(wait=False, cancel_futures=True)
+    return stats
+
+
+def main(argv):
+    """Main program flow for webhook mode."""
+    if not argv:
+        print("Usage: python webhook_iss.py <public webhook URL> [port]")
+        return
+    target_url = argv[0]
+    port = int(argv[1]) if len(argv) > 1 else 8080
+
+    token = bot.get_access_token()
+    if not token:
+        print("No access token. Exiting.")
+        return
+
+    rooms = bot.get_rooms(token)
+    room_ids = monitor.select_rooms(rooms)
+    if not room_ids:
+        print("No rooms selected. Exiting.")
+        return
+
+    api_key = input("\nEnter your LocationIQ API key: ").strip()
+    if not api_key:
+        print("No API key provided. Exiting.")
+        return
+
+    try:
+        asyncio.run(monitor_webhooks(room_ids, token, api_key, target_url, port=port))
+    except KeyboardInterrupt:
+        print("\nStopped listening.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
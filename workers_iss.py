@@ -0,0 +1,286 @@
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import async_monitor_iss as monitor
+import errorhandling_iss as bot
+import scheduler_iss
+import store_iss
+
+# -------------------------------------------------------------------
+# Worker processes
+# One process (one event loop, one GIL) can only poll so many rooms.
+# In worker mode a supervisor splits the rooms across several processes,
+# each running the async monitor for its share:
+#   * rooms are assigned with consistent hashing on the room id, so a
+#     room always lands on the same worker, and changing the number of
+#     workers only moves about 1/N of the rooms,
+#   * workers share geocode results and message cursors through the
+#     local SQLite store (SPACEBOT_STORE); cursors are saved every
+#     second, so a worker that dies is restarted and carries on from
+#     where it was instead of answering old commands again,
+#   * the Webex request budget is split evenly between the workers,
+#   * with SPACEBOT_METRICS_PORT set, worker i serves /metrics on that
+#     port + i,
+#   * only worker 0 writes the position history (SPACEBOT_HISTORY); the
+#     others read it to answer /over,
+#   * a worker that keeps dying right after it starts is restarted after
+#     1 s, 2 s, 4 s... and given up on after MAX_FAST_FAILURES in a row.
+#
+#   WEBEX_TOKEN=... SPACEBOT_ROOMS="Space Bot,ISS Team" SPACEBOT_WORKERS=4 python workers_iss.py
+# -------------------------------------------------------------------
+
+CURSOR_SAVE_INTERVAL = 1.0
+CHECK_INTERVAL = 0.5
+FAST_FAILURE = 10.0         # a worker that dies sooner than this after starting failed "fast"
+RESTART_BACKOFF = 1.0       # first restart delay after a fast failure, doubled for each one after
+MAX_RESTART_BACKOFF = 60.0
+MAX_FAST_FAILURES = 5
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing: every node owns `replicas` points on a ring of 64-bit hashes."""
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self.points = []    # sorted hashes
+        self.owners = {}    # hash -> node
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point not in self.owners:
+                self.owners[point] = node
+                bisect.insort(self.points, point)
+
+    def remove(self, node):
+        self.points = [p for p in self.points if self.owners[p] != node]
+        self.owners = {p: n for p, n in self.owners.items() if n != node}
+
+    def node_for(self, key):
+        if not self.points:
+            raise ValueError("the ring has no nodes")
+        i = bisect.bisect(self.points, _hash(key)) % len(self.points)
+        return self.owners[self.points[i]]
+
+    def assign(self, keys):
+        """{node: [keys]} for every node that owns at least one key."""
+        shards = {}
+        for key in keys:
+            shards.setdefault(self.node_for(key), []).append(key)
+        return shards
+
+
+async def save_cursors_every(store, cursors, interval=CURSOR_SAVE_INTERVAL):
+    """Write cursors that moved to the store every `interval` seconds."""
+    saved = {}
+    while True:
+        await asyncio.sleep(interval)
+        changed = {room_id: cursor for room_id, cursor in cursors.items() if saved.get(room_id) != cursor}
+        if changed:
+            await monitor.run_blocking(store.save_cursors, changed)
+            saved.update(changed)
+
+
+async def _serve(room_ids, access_token, maps_api_key, poll_interval, rate, stop, stats):
+    store = store_iss.get_store()
+    bot.geocode_cache.use_store(store)
+    bot.tracker.use_store(store)
+    cursors = store.load_cursors(room_ids) if store is not None else {}
+    scheduler = scheduler_iss.PollScheduler(rate=rate, burst=max(1, int(rate * 2)))
+    task = asyncio.create_task(monitor.monitor_rooms(room_ids, access_token, maps_api_key, poll_interval,
+                                                     stats=stats, cursors=cursors, scheduler=scheduler))
+    saver = asyncio.create_task(save_cursors_every(store, cursors)) if store is not None else None
+    try:
+        while not stop.is_set() and not task.done():
+            await asyncio.sleep(CHECK_INTERVAL)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if saver is not None:
+            saver.cancel()
+            store.save_cursors(cursors)
+    if not stop.is_set():
+        # The monitor stopped on its own: re-raise its error (or fail) so the worker exits
+        # nonzero and the supervisor restarts it instead of leaving its rooms unserved.
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+        raise RuntimeError("the room monitor stopped unexpectedly")
+
+
+def run_worker(index, room_ids, access_token, maps_api_key, poll_interval, rate, stop, results, quiet=False):
+    """Worker process entry point: monitor `room_ids` until `stop` is set, then report stats."""
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    port = os.environ.get("SPACEBOT_METRICS_PORT")
+    if port:
+        # Each worker has its own metrics, so each gets its own port: worker i serves on port + i.
+        os.environ["SPACEBOT_METRICS_PORT"] = str(int(port) + index)
+    if index != 0:
+        # One writer for the position history: worker 0 records, the others only answer /over from it.
+        os.environ["SPACEBOT_HISTORY_READONLY"] = "1"
+    stats = monitor.new_stats()
+    try:
+        asyncio.run(_serve(room_ids, access_token, maps_api_key, poll_interval, rate, stop, stats))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Worker {index} failed: {e!r}", file=sys.__stderr__)
+        sys.exit(1)
+    results.put((index, stats))
+
+
+class Supervisor:
+    """Starts a worker process per shard of rooms and restarts any that die."""
+
+    def __init__(self, room_ids, access_token, maps_api_key, workers=None, poll_interval=1.0, rate=5.0,
+                 quiet=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.access_token = access_token
+        self.maps_api_key = maps_api_key
+        self.poll_interval = poll_interval
+        self.quiet = quiet      # hide the workers' print() output
+        # The Webex budget is for the whole bot, so each worker gets its share.
+        self.rate = rate / self.workers
+        self.ring = HashRing(range(self.workers))
+        self.shards = self.ring.assign(room_ids)
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.results = self.context.Queue()
+        self.processes = {}     # worker index -> Process
+        self.started = {}       # worker index -> time.monotonic() of its last start
+        self.fast_failures = {}     # worker index -> fast failures in a row
+        self.waiting = {}       # worker index -> time.monotonic() it is restarted at
+        self.given_up = []      # worker indexes that kept failing
+        self.restarts = 0
+        self.finished = 0       # workers that exited cleanly before stop()
+
+    def _spawn(self, index):
+        process = self.context.Process(
+            target=run_worker, name=f"spacebot-worker-{index}", daemon=True,
+            args=(index, self.shards[index], self.access_token, self.maps_api_key, self.poll_interval,
+                  self.rate, self.stop_event, self.results, self.quiet))
+        process.start()
+        self.processes[index] = process
+        self.started[index] = time.monotonic()
+
+    def start(self):
+        for index in sorted(self.shards):
+            self._spawn(index)
+        print(f"Started {len(self.processes)} worker(s) for "
+              f"{sum(len(rooms) for rooms in self.shards.values())} room(s).")
+        return self
+
+    def check(self, now=None):
+        """Restart workers that exited with an error. Returns how many are running or about to restart."""
+        if self.stop_event.is_set():
+            return len(self.processes)
+        now = time.monotonic() if now is None else now
+        for index, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            del self.processes[index]
+            if process.exitcode == 0:
+                self.finished += 1
+                continue
+            if now - self.started[index] < FAST_FAILURE:
+                self.fast_failures[index] = self.fast_failures.get(index, 0) + 1
+            else:
+                self.fast_failures[index] = 0
+            failures = self.fast_failures[index]
+            if failures >= MAX_FAST_FAILURES:
+                print(f"Worker {index} exited with code {process.exitcode} within {FAST_FAILURE:.0f} s of "
+                      f"starting {failures} times in a row; giving up on it. Its "
+                      f"{len(self.shards[index])} room(s) are no longer polled.")
+                self.given_up.append(index)
+                continue
+            delay = min(MAX_RESTART_BACKOFF, RESTART_BACKOFF * 2 ** (failures - 1)) if failures else 0.0
+            print(f"Worker {index} exited with code {process.exitcode}, restarting it"
+                  + (f" in {delay:.0f} s." if delay else "."))
+            self.waiting[index] = now + delay
+        for index, due in list(self.waiting.items()):
+            if now >= due:
+                del self.waiting[index]
+                self.restarts += 1
+                self._spawn(index)
+        return len(self.processes) + len(self.waiting)
+
+    def run(self, duration=None):
+        deadline = None if duration is None else time.monotonic() + duration
+        while self.check() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(CHECK_INTERVAL)
+
+    def stop(self, timeout=15.0):
+        """Ask every worker to finish, wait for them and return their combined stats."""
+        self.stop_event.set()
+        stats = monitor.new_stats()
+        deadline = time.monotonic() + timeout
+        reported = 0
+        while reported < len(self.processes) + self.finished and time.monotonic() < deadline:
+            try:
+                _, worker_stats = self.results.get(timeout=max(0.1, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            reported += 1
+            for key, value in worker_stats.items():
+                stats[key] += value
+        for process in self.processes.values():
+            process.join(max(0.1, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        stats["restarts"] = self.restarts
+        stats["given_up"] = len(self.given_up)
+        return stats
+
+
+def resolve_room_ids(access_token, names):
+    """Room ids for the given names or ids (fetched from Webex, or from the store if it has them)."""
+    store = store_iss.get_store()
+    rooms = bot.get_rooms_cached(access_token, store) or []
+    room_ids = []
+    for name in names:
+        room = bot.find_room(rooms, name)
+        if room is None:
+            print(f"No room matches {name!r}, skipping it.")
+        elif room["id"] not in room_ids:
+            room_ids.append(room["id"])
+    return room_ids
+
+
+def main():
+    token = bot.get_access_token()
+    names = [n.strip() for n in (os.environ.get("SPACEBOT_ROOMS") or os.environ.get("SPACEBOT_ROOM", "")).split(",")
+             if n.strip()]
+    if not token or not names:
+        print("Set WEBEX_TOKEN and SPACEBOT_ROOMS to run in worker mode.")
+        return
+    room_ids = resolve_room_ids(token, names)
+    if not room_ids:
+        print("No rooms to monitor. Exiting.")
+        return
+
+    supervisor = Supervisor(room_ids, token, os.environ.get("LOCATIONIQ_KEY", ""),
+                            workers=int(os.environ.get("SPACEBOT_WORKERS") or 0) or None)
+    supervisor.start()
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        print("\nStopping the workers...")
+    stats = supervisor.stop()
+    print(f"polls: {stats['polls']}, commands: {stats['commands']}, replies: {stats['replies']}, "
+          f"errors: {stats['errors']}, worker restarts: {stats['restarts']}, workers given up on: {stats['given_up']}")
+
+
+if __name__ == "__main__":
+    main()